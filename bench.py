@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Philips TV Remote server.
+
+Starts local stand-in TVs that speak JointSpace (v1 over HTTP on 1925,
+v6 over HTTPS with Digest Auth on 1926) with a configurable latency and
+failure profile, runs server.py in-process against them, and drives it
+with concurrent clients. Reports p50/p99 latency and throughput for key
+presses, volume polls, cached /system reads and /probe, plus
+scan_network() against a simulated subnet of stand-ins on 127.0.0.x.
+Stand-in LG (SSAP on 3000) and Samsung (8001) WebSocket TVs check that
+key presses from every client share the server's one session per TV.
+
+Results are written as JSON (--json) so runs can be compared
+(--compare baseline.json).
+
+Usage:
+  python3 bench.py
+  python3 bench.py --engine asyncio --latency-ms 20 --jitter-ms 10 --fail-rate 0.01
+  python3 bench.py --json after.json --compare before.json
+
+The simulated subnet needs the whole 127.0.0.0/8 routed to loopback
+(Linux default; on macOS add aliases with `ifconfig lo0 alias 127.0.0.N`).
+HTTPS stand-ins need the `openssl` command to create a throwaway certificate.
+"""
+
+import argparse
+import hashlib
+import http.client
+import http.server
+import json
+import os
+import platform
+import random
+import re
+import secrets
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import server
+
+V1_PORT = server.JOINTSPACE_PORT
+V6_PORT = 1926
+DIGEST_REALM = 'XTV'
+DIGEST_USER = 'bench'
+DIGEST_PASS = 'bench-secret'
+LG_PORT = server.TV_BRAND_PORTS['lg']
+SAMSUNG_PORT = server.TV_BRAND_PORTS['samsung']
+
+
+# ----------------------------------------------------------------------
+# Stand-in TV
+# ----------------------------------------------------------------------
+
+class FakeTVProfile:
+    """Latency and failure behaviour shared by every stand-in TV."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 fail_rate: float = 0.0, drop_rate: float = 0.0) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms  = jitter_ms
+        self.fail_rate  = fail_rate   # fraction of requests answered with 503
+        self.drop_rate  = drop_rate   # fraction of requests whose connection is dropped
+
+    def delay(self) -> None:
+        ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def as_dict(self) -> dict:
+        return {'latencyMs': self.latency_ms, 'jitterMs': self.jitter_ms,
+                'failRate': self.fail_rate, 'dropRate': self.drop_rate}
+
+
+class FakeTVHandler(http.server.BaseHTTPRequestHandler):
+    """Minimal JointSpace endpoint: system, sources, audio/volume, powerstate, input/key."""
+
+    protocol_version = 'HTTP/1.1'
+    api_version = 1
+    tls_context: ssl.SSLContext | None = None
+    profile = FakeTVProfile()
+    nonce = ''
+    state: dict = {}
+
+    def setup(self) -> None:
+        if self.tls_context is not None:
+            # Handshake here, on the connection's own thread, not in accept()
+            self.request = self.tls_context.wrap_socket(self.request, server_side=True)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, data: dict | None = None,
+              headers: tuple[tuple[str, str], ...] = ()) -> None:
+        body = json.dumps(data).encode() if data is not None else b''
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if data is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        """Check a Digest (qop=auth) Authorization header, as v6 TVs do."""
+        header = self.headers.get('Authorization', '')
+        if not header.startswith('Digest '):
+            return False
+        fields = dict(re.findall(r'(\w+)="?([^",]*)"?', header[len('Digest '):]))
+        if fields.get('nonce') != self.nonce or fields.get('username') != DIGEST_USER:
+            return False
+        ha1 = hashlib.md5(f"{DIGEST_USER}:{DIGEST_REALM}:{DIGEST_PASS}".encode()).hexdigest()
+        ha2 = hashlib.md5(f"{self.command}:{fields.get('uri', '')}".encode()).hexdigest()
+        expected = hashlib.md5(
+            f"{ha1}:{self.nonce}:{fields.get('nc', '')}:{fields.get('cnonce', '')}:"
+            f"{fields.get('qop', '')}:{ha2}".encode()).hexdigest()
+        return secrets.compare_digest(expected, fields.get('response', ''))
+
+    def _handle(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        self.profile.delay()
+
+        roll = random.random()
+        if roll < self.profile.drop_rate:
+            self.close_connection = True
+            self.request.close()
+            return
+        if roll < self.profile.drop_rate + self.profile.fail_rate:
+            self._send(503, {'error': 'busy'})
+            return
+
+        prefix = f"/{self.api_version}/"
+        if not self.path.startswith(prefix):
+            self._send(404, {'error': 'Not found'})
+            return
+        path = self.path[len(prefix):]
+
+        # /system is readable without pairing, like on a real TV
+        if self.api_version >= 6 and path != 'system' and not self._authorized():
+            self._send(401, headers=(('WWW-Authenticate',
+                                      f'Digest realm="{DIGEST_REALM}", nonce="{self.nonce}", '
+                                      f'qop="auth", algorithm=MD5'),))
+            return
+
+        if path == 'system':
+            self._send(200, {'name': f'Bench TV v{self.api_version}',
+                             'model': 'BENCH-1', 'api_version': {'Major': self.api_version}})
+        elif path == 'audio/volume' and self.command == 'GET':
+            self._send(200, {'muted': self.state['muted'], 'current': self.state['volume'],
+                             'min': 0, 'max': 60})
+        elif path == 'audio/volume' and self.command == 'POST':
+            try:
+                data = json.loads(raw or b'{}')
+                self.state['volume'] = int(data.get('current', self.state['volume']))
+                self.state['muted'] = bool(data.get('muted', self.state['muted']))
+            except (ValueError, TypeError):
+                self._send(400, {'error': 'Invalid JSON'})
+                return
+            self._send(200)
+        elif path == 'sources' and self.command == 'GET':
+            self._send(200, {'hdmi1': {'name': 'HDMI 1'}, 'hdmi2': {'name': 'HDMI 2'},
+                             'tv': {'name': 'Watch TV'}})
+        elif path == 'sources/current':
+            self._send(200, {'id': 'tv'} if self.command == 'GET' else None)
+        elif path == 'powerstate':
+            self._send(200, {'powerstate': 'On'})
+        elif path == 'input/key' and self.command == 'POST':
+            self._send(200)
+        else:
+            self._send(404, {'error': 'Not found'})
+
+    do_GET = do_POST = _handle
+
+
+class _FakeTVServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address) -> None:
+        pass  # scan prefilter connects and dropped connections end handshakes early
+
+
+class FakeTV:
+    """One stand-in TV listening on (host, port)."""
+
+    def __init__(self, host: str, api_version: int, profile: FakeTVProfile,
+                 tls_context: ssl.SSLContext | None = None) -> None:
+        port = V6_PORT if api_version >= 6 else V1_PORT
+        handler = type('BoundFakeTVHandler', (FakeTVHandler,), {
+            'api_version': api_version,
+            'tls_context': tls_context,
+            'profile':     profile,
+            'nonce':       secrets.token_hex(16),
+            'state':       {'volume': 12, 'muted': False},
+        })
+        self.address = (host, port)
+        self.httpd = _FakeTVServer(self.address, handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _FakeSocketServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class FakeSocketTV:
+    """Stand-in LG webOS (SSAP plus pointer socket) or Samsung Tizen TV.
+
+    Accepts WebSocket upgrades, pairs every client at once and counts the
+    connections and the key presses it receives, so a run can check that
+    all clients' commands went over the server's shared session.
+    """
+
+    def __init__(self, host: str, brand: str, profile: FakeTVProfile) -> None:
+        self.brand = brand
+        self.profile = profile
+        self.connections = 0
+        self.keys = 0
+        self._lock = threading.Lock()
+        self.address = (host, LG_PORT if brand == 'lg' else SAMSUNG_PORT)
+        tv = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                tv._serve(self.request)
+
+        self.tcpd = _FakeSocketServer(self.address, Handler)
+        threading.Thread(target=self.tcpd.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.tcpd.shutdown()
+        self.tcpd.server_close()
+
+    def _serve(self, sock: socket.socket) -> None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        rfile, wfile = sock.makefile('rb'), sock.makefile('wb')
+        path = rfile.readline().split()[1].decode()
+        key = ''
+        while (line := rfile.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'sec-websocket-key':
+                key = value.strip()
+        wfile.write(('HTTP/1.1 101 Switching Protocols\r\n'
+                     'Upgrade: websocket\r\n'
+                     'Connection: Upgrade\r\n'
+                     f'Sec-WebSocket-Accept: {server._ws_accept_key(key)}\r\n\r\n').encode())
+        wfile.flush()
+        with self._lock:
+            self.connections += 1
+        ws = server._WebSocket(rfile, wfile)
+        try:
+            if self.brand == 'samsung':
+                ws.send_text(json.dumps({'event': 'ms.channel.connect',
+                                         'data': {'token': 'bench-token'}}))
+            while True:
+                text = ws.receive()
+                if path == '/pointer':
+                    self._count_key(text.startswith('type:button'))
+                    continue
+                msg = json.loads(text)
+                if self.brand == 'samsung':
+                    self._count_key(msg.get('method') == 'ms.remote.control')
+                elif msg.get('type') == 'register':
+                    ws.send_text(json.dumps({'type': 'registered', 'id': msg['id'],
+                                             'payload': {'client-key': 'bench-key'}}))
+                elif msg.get('type') == 'request':
+                    self.profile.delay()
+                    if msg['uri'].endswith('/getPointerInputSocket'):
+                        payload = {'socketPath': f'ws://{self.address[0]}:{self.address[1]}/pointer'}
+                    elif msg['uri'] == 'ssap://audio/getVolume':
+                        payload = {'volume': 12, 'muted': False}
+                    else:
+                        payload = {'returnValue': True}
+                    ws.send_text(json.dumps({'type': 'response', 'id': msg['id'],
+                                             'payload': payload}))
+        except (server._WebSocketClosed, OSError, ValueError):
+            pass
+
+    def _count_key(self, is_key: bool) -> None:
+        if is_key:
+            with self._lock:
+                self.keys += 1
+
+
+def make_tls_context(workdir: str) -> ssl.SSLContext | None:
+    """Self-signed server context for v6 stand-ins, or None without openssl."""
+    if not shutil.which('openssl'):
+        return None
+    cert = os.path.join(workdir, 'tv.pem')
+    key = os.path.join(workdir, 'tv.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                    '-keyout', key, '-out', cert, '-days', '1', '-subj', '/CN=bench-tv'],
+                   check=True, capture_output=True)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    return ctx
+
+
+# ----------------------------------------------------------------------
+# Server under test
+# ----------------------------------------------------------------------
+
+class _QuietHandler(server.ProxyHandler):
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(engine: str) -> tuple[object, int]:
+    """Run the proxy in this process on a free loopback port."""
+    # Stand-ins live on loopback, which the SSRF guard rejects for real TVs
+    guard = server.is_valid_tv_ip
+    server.is_valid_tv_ip = lambda ip: ip.startswith('127.') or guard(ip)
+
+    # Access records and other log events would mix into the report
+    server._log.put = lambda record: None
+    port = _free_port()
+    if engine == 'asyncio':
+        httpd = server.AsyncioHTTPServer(('127.0.0.1', port), _QuietHandler)
+    else:
+        httpd = server.ThreadingProxyServer(('127.0.0.1', port), _QuietHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    server._static_cache.preload()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return httpd, port
+
+
+def _client_headers() -> dict[str, str]:
+    headers = {'Content-Type': 'application/json'}
+    if server.API_TOKEN:
+        headers['X-API-Token'] = server.API_TOKEN
+    return headers
+
+
+def _request(port: int, method: str, path: str, body: dict | None = None) -> tuple[int, bytes]:
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request(method, path, json.dumps(body).encode() if body is not None else None,
+                     _client_headers())
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def configure_target(port: int, ip: str, api_version: int) -> None:
+    body = {'ip': ip, 'port': V6_PORT if api_version >= 6 else V1_PORT,
+            'apiVersion': api_version, 'brand': 'philips'}
+    if api_version >= 6:
+        body.update(tvUser=DIGEST_USER, tvPass=DIGEST_PASS)
+    status, data = _request(port, 'POST', '/config', body)
+    if status != 200:
+        raise RuntimeError(f"/config rejected the stand-in TV: {status} {data!r}")
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load(port: int, method: str, path: str, body: dict | None,
+             requests: int, concurrency: int) -> dict:
+    """Send `requests` calls from `concurrency` clients; return latency stats."""
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    lock = threading.Lock()
+    remaining = [requests]
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = _client_headers()
+
+    def worker() -> None:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local: list[float] = []
+        local_status: dict[str, int] = {}
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, payload, headers)
+                response = conn.getresponse()
+                response.read()
+                key = str(response.status)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                key = 'error'
+            local.append(time.perf_counter() - started)
+            local_status[key] = local_status.get(key, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            for key, count in local_status.items():
+                statuses[key] = statuses.get(key, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(count for key, count in statuses.items() if key.startswith('2'))
+    return {
+        'requests':   len(latencies),
+        'ok':         ok,
+        'statuses':   statuses,
+        'seconds':    round(elapsed, 4),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50Ms':      round(percentile(latencies, 50) * 1000, 3),
+        'p99Ms':      round(percentile(latencies, 99) * 1000, 3),
+        'maxMs':      round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+def run_scan(hosts: int, profile: FakeTVProfile, tls_context: ssl.SSLContext | None,
+             rounds: int) -> dict:
+    """Time scan_network() over 127.0.0.0/24 with `hosts` extra stand-ins."""
+    stand_ins = []
+    for i in range(hosts):
+        ip = f"127.0.0.{i + 2}"
+        api_version = 6 if tls_context is not None and i % 2 else 1
+        try:
+            stand_ins.append(FakeTV(ip, api_version, profile,
+                                    tls_context if api_version >= 6 else None))
+        except OSError as exc:
+            print(f"[bench] cannot bind stand-in on {ip}: {exc}", file=sys.stderr)
+            break
+    expected = len(stand_ins) + 1  # plus the main stand-in on 127.0.0.1
+    durations: list[float] = []
+    found = 0
+    try:
+        for _ in range(rounds):
+            stats: dict = {}
+            started = time.perf_counter()
+            found = len(server.scan_network('127.0.0', V1_PORT, stats=stats))
+            durations.append(time.perf_counter() - started)
+    finally:
+        for tv in stand_ins:
+            tv.close()
+    durations.sort()
+    return {
+        'rounds':      rounds,
+        'expected':    expected,
+        'found':       found,
+        'hostsOpen':   stats.get('hostsOpen', 0),
+        'p50Ms':       round(percentile(durations, 50) * 1000, 1),
+        'maxMs':       round(durations[-1] * 1000, 1) if durations else 0.0,
+    }
+
+
+def run_sessions(port: int, profile: FakeTVProfile, requests: int, concurrency: int,
+                 workloads: dict) -> dict:
+    """Drive LG and Samsung stand-ins through /api; return what each TV saw."""
+    sessions = {}
+    # The SSAP socket plus LG's pointer socket; Samsung takes keys on its one channel
+    for brand, key, expected in (('lg', 'ENTER', 2), ('samsung', 'KEY_ENTER', 1)):
+        try:
+            tv = FakeSocketTV('127.0.0.1', brand, profile)
+        except OSError as exc:
+            print(f"[bench] cannot bind {brand} stand-in: {exc}", file=sys.stderr)
+            continue
+        try:
+            status, data = _request(port, 'POST', '/config', {'ip': '127.0.0.1', 'brand': brand})
+            if status != 200:
+                raise RuntimeError(f"/config rejected the {brand} stand-in: {status} {data!r}")
+            result = run_load(port, 'POST', f"{server.API_PREFIX}/input/key", {'key': key},
+                              requests, concurrency)
+            workloads[f"{brand}.key"] = result
+            if brand == 'lg':
+                workloads['lg.volume'] = run_load(port, 'GET', f"{server.API_PREFIX}/audio/volume",
+                                                  None, requests, concurrency)
+            time.sleep(0.1)  # the last frames may still be in flight to the stand-in
+            sessions[brand] = {'connections': tv.connections, 'expected': expected,
+                               'keys': tv.keys, 'sent': result['ok']}
+        finally:
+            tv.close()
+    return sessions
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=server.SCRIPT_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def print_report(report: dict, baseline: dict | None) -> None:
+    base = (baseline or {}).get('workloads', {})
+    print(f"{'workload':<16} {'ok/total':>11} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}"
+          + ('   vs baseline (p50 / p99 / req/s)' if baseline else ''))
+    for name, r in report['workloads'].items():
+        line = (f"{name:<16} {r['ok']:>5}/{r['requests']:<5} {r['throughput']:>9.1f} "
+                f"{r['p50Ms']:>9.2f} {r['p99Ms']:>9.2f}")
+        if name in base:
+            line += '   ' + ' / '.join(_delta(r[key], base[name].get(key))
+                                       for key in ('p50Ms', 'p99Ms', 'throughput'))
+        print(line)
+    for brand, tv in (report.get('sessions') or {}).items():
+        print(f"{brand + ' session':<16} {tv['keys']} keys received over "
+              f"{tv['connections']} connection(s), {tv['expected']} expected")
+    scan = report.get('scan')
+    if scan:
+        line = (f"{'scan':<16} {scan['found']:>5}/{scan['expected']:<5} {'':>9} "
+                f"{scan['p50Ms']:>9.1f} {scan['maxMs']:>9.1f}")
+        if baseline and baseline.get('scan'):
+            line += '   ' + _delta(scan['p50Ms'], baseline['scan'].get('p50Ms'))
+        print(line)
+
+
+def _delta(now: float, before: float | None) -> str:
+    if not before:
+        return 'n/a'
+    return f"{(now - before) / before * 100:+.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--engine', choices=('threading', 'asyncio'), default=server.SERVER_ENGINE)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per workload')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='stand-in TV response latency')
+    parser.add_argument('--jitter-ms', type=float, default=2.0, help='± random latency added')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction answered with 503')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='fraction of dropped connections')
+    parser.add_argument('--scan-hosts', type=int, default=20, help='stand-ins in the scanned subnet')
+    parser.add_argument('--scan-rounds', type=int, default=5)
+    parser.add_argument('--skip', action='append', default=[],
+                        choices=('v1', 'v6', 'probe', 'sessions', 'scan'),
+                        help='leave out a workload group')
+    parser.add_argument('--json', metavar='PATH', help='write results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON from an earlier run')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    profile = FakeTVProfile(args.latency_ms, args.jitter_ms, args.fail_rate, args.drop_rate)
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    tls_context = make_tls_context(workdir)
+    if tls_context is None and 'v6' not in args.skip:
+        print("[bench] openssl not found; skipping v6 (HTTPS + Digest) workloads", file=sys.stderr)
+        args.skip.append('v6')
+
+    stand_ins = [FakeTV('127.0.0.1', 1, profile)]
+    if tls_context is not None:
+        stand_ins.append(FakeTV('127.0.0.1', 6, profile, tls_context))
+    httpd, port = start_server(args.engine)
+
+    workloads: dict[str, dict] = {}
+    sessions: dict[str, dict] = {}
+    try:
+        for api_version in (1, 6):
+            if f"v{api_version}" in args.skip:
+                continue
+            configure_target(port, '127.0.0.1', api_version)
+            api = f"{server.API_PREFIX}/{api_version}"
+            workloads[f"v{api_version}.key"] = run_load(
+                port, 'POST', f"{api}/input/key", {'key': 'Confirm'},
+                args.requests, args.concurrency)
+            workloads[f"v{api_version}.volume"] = run_load(
+                port, 'GET', f"{api}/audio/volume", None, args.requests, args.concurrency)
+            workloads[f"v{api_version}.system"] = run_load(
+                port, 'GET', f"{api}/system", None, args.requests, args.concurrency)
+        if 'probe' not in args.skip:
+            # Each /probe runs a full check_tv(), so use fewer requests
+            workloads['probe'] = run_load(port, 'GET', '/probe?ip=127.0.0.1', None,
+                                          max(1, args.requests // 10), args.concurrency)
+        if 'sessions' not in args.skip:
+            sessions = run_sessions(port, profile, args.requests, args.concurrency, workloads)
+        scan = None
+        if 'scan' not in args.skip:
+            scan = run_scan(args.scan_hosts, profile, tls_context, args.scan_rounds)
+    finally:
+        httpd.shutdown()
+        for tv in stand_ins:
+            tv.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision':  _git_revision(),
+        'python':    platform.python_version(),
+        'platform':  platform.platform(),
+        'engine':    args.engine,
+        'params':    {'requests': args.requests, 'concurrency': args.concurrency,
+                      'profile': profile.as_dict()},
+        'workloads': workloads,
+        'sessions':  sessions,
+        'scan':      scan,
+    }
+    print_report(report, baseline)
+    mismatched = [brand for brand, tv in sessions.items()
+                  if tv['connections'] != tv['expected'] or tv['keys'] != tv['sent']]
+    if mismatched:
+        print(f"[bench] {', '.join(mismatched)}: keys did not share one session per TV",
+              file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
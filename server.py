@@ -6,29 +6,103 @@ Supports auto-discovery of Philips TVs on the local network.
 Supports JointSpace API versions 1 (HTTP) and 6 (HTTPS, Android TV).
 """
 
+import abc
+import asyncio
+import base64
+import concurrent.futures
+import email.utils
+import errno
+import gzip
 import hashlib
+import heapq
 import hmac
+import http.client
 import http.server
+import io
 import ipaddress
 import json
+import mimetypes
 import os
+import posixpath
+import queue
 import re
 import secrets
+import select
+import selectors
 import socket
 import ssl
+import struct
 import sys
 import threading
 import time
 import urllib.parse
 import urllib.request
 import urllib.error
+from typing import Callable
+
+try:
+    import brotli  # optional: pip install brotli for br-encoded static assets
+except ImportError:
+    brotli = None
 
 # Constants
 API_PREFIX = '/api'
 JOINTSPACE_PORT = 1925
 TV_REQUEST_TIMEOUT = 5  # seconds
 SCAN_TIMEOUT = 1         # seconds per host during network scan
+SCAN_CONNECT_TIMEOUT = 0.4  # seconds for the TCP-connect prefilter during a scan
+SCAN_PROBE_THREADS = 16     # threads running HTTP/TLS probes on hosts that passed the prefilter
+SCAN_BLOCK_HOSTS = 1024     # hosts swept before their probes run, so large scans report progressively
+SCAN_MIN_PREFIX = 16        # largest network /discover will sweep (a /16 is 65534 hosts)
+DISCOVERY_MAX_NETWORK_SETS = 16  # distinct ?cidr= combinations with their own discovery cache
+DISCOVERY_MAX_HOSTS = 2 ** (32 - SCAN_MIN_PREFIX)  # addresses one request's cidr values may cover together
+DISCOVERY_TTL = 30          # seconds a cached /discover result counts as fresh
+DISCOVERY_WAIT = SCAN_TIMEOUT * 4 + 2  # max seconds /discover blocks waiting for a scan
+SSDP_ADDR = ('239.255.255.250', 1900)  # SSDP multicast group
+MDNS_ADDR = ('224.0.0.251', 5353)      # mDNS multicast group
+SSDP_MX = 1                 # seconds devices may wait before answering an M-SEARCH
+SSDP_DEFAULT_MAX_AGE = 1800 # seconds a NOTIFY without CACHE-CONTROL stays valid
+SSDP_MAX_DEVICES = 256      # SSDP/mDNS responders remembered; the least recently heard is dropped first
+STATE_POLL_INTERVAL = 3     # seconds between server-side volume/power polls of a TV
+STATE_IDLE_TIMEOUT = 60     # a state poller stops after this long without readers
+SSE_KEEPALIVE = 15          # seconds between keep-alive comments on event streams
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC11B85'  # RFC 6455 handshake constant
+WS_MAX_MESSAGE = 4096       # max bytes in one message from a /ws client
+WS_AUTH_TIMEOUT = 10        # seconds a /ws client has to send its token
+WS_IDLE_TIMEOUT = 3 * SSE_KEEPALIVE  # seconds without a frame (pongs count) before a /ws client is dropped
+BATCH_MAX_CALLS = 50        # max JointSpace calls in one /api/batch request
+BATCH_MAX_DELAY_MS = 2000   # max inter-call delay accepted by /api/batch
+BROADCAST_MAX_PARALLEL = 32 # TVs contacted at once by /broadcast
+STATIC_RECHECK_INTERVAL = 1 # seconds between mtime checks of a cached static file
+TV_QUEUE_MAX = 32           # requests waiting for one TV before new ones get 429
+KEY_DEADLINE = 2            # seconds a queued command stays worth sending
+CIRCUIT_FAILURE_THRESHOLD = 3  # consecutive unreachable calls that open a TV's circuit
+CIRCUIT_RETRY_MIN = 2       # seconds before the first probe of an open circuit
+CIRCUIT_RETRY_MAX = 30      # cap for the doubling delay between failed probes
+METRICS_MAX_SERIES = 200    # label sets kept per metric; extra ones are folded into 'other'
 MAX_BODY_SIZE = 65536    # max request body size (64 KB)
+STREAM_CHUNK_SIZE = 65536  # bytes of a TV response relayed to the client at a time
+RESPONSE_CACHE_MAX_BYTES = 4 * 1024 * 1024  # cached TV response bodies, least recently used evicted first
+POOL_IDLE_TIMEOUT = 30   # seconds an idle keep-alive TV connection is kept open
+POOL_MAX_IDLE = 4        # max idle connections kept per (scheme, ip, port)
+REQUEST_HEAD_TIMEOUT = 10  # seconds a client may take to send headers (asyncio engine)
+SERVER_BACKLOG = 1024      # connections the listening socket queues before accept (both engines)
+ASYNC_MAX_PENDING = 256    # requests queued for a worker before 503 (asyncio engine)
+ASYNC_MAX_STREAMS = 256    # open /ws and event streams, each on its own thread, before 503 (asyncio engine)
+TV_BRAND_PORTS = {'philips': JOINTSPACE_PORT, 'lg': 3000, 'samsung': 8001}  # default control port per brand
+TV_TLS_PORTS = (3001, 8002)  # LG / Samsung control ports that speak wss://
+TV_PAIRING_TIMEOUT = 60    # seconds to accept the pairing prompt on an LG/Samsung TV
+TV_SESSION_IDLE_TIMEOUT = 600  # an LG/Samsung session closes after this long without commands
+TV_WS_MAX_MESSAGE = 1024 * 1024  # max message accepted from an LG/Samsung TV
+SAMSUNG_REMOTE_NAME = 'ClassicRemote'  # name shown on the Samsung pairing prompt
+STATE_SCHEMA_VERSION = 1   # layout of STATE_FILE; files with another version are ignored
+STATE_SAVE_DELAY = 1       # seconds changes are batched before STATE_FILE is rewritten
+WAKE_TIMEOUT = 30          # seconds a power-on waits for the TV to answer before giving up
+WAKE_PROBE_MIN = 0.25      # first readiness probe interval; doubles up to WAKE_PROBE_MAX
+WAKE_PROBE_MAX = 2         # cap for the interval between readiness probes of a waking TV
+WAKE_RESEND_INTERVAL = 3   # seconds between magic packets while the TV is still asleep
+WAKE_HOLD_TIMEOUT = 15     # seconds a call made during a wake is held for it before 503
+LOG_QUEUE_MAX = 10000      # log records waiting for the writer before new ones are dropped
 
 # Configuration via environment variables
 try:
@@ -39,15 +113,130 @@ except ValueError:
     print("ERROR: SERVER_PORT must be an integer between 1 and 65535")
     sys.exit(1)
 
+# Serving engine: 'threading' (one OS thread per connection, the default) or
+# 'asyncio' (event loop for connections, bounded worker pool for requests).
+SERVER_ENGINE = os.environ.get('SERVER_ENGINE', 'threading').lower()
+if SERVER_ENGINE not in ('threading', 'asyncio'):
+    print("ERROR: SERVER_ENGINE must be 'threading' or 'asyncio'")
+    sys.exit(1)
+
+try:
+    ASYNC_MAX_WORKERS = int(os.environ.get('ASYNC_MAX_WORKERS', '16'))
+    if ASYNC_MAX_WORKERS < 1:
+        raise ValueError
+except ValueError:
+    print("ERROR: ASYNC_MAX_WORKERS must be a positive integer")
+    sys.exit(1)
+
+try:
+    # Concurrent requests sent to one TV; cheap sets misbehave above 1-2
+    TV_MAX_IN_FLIGHT = int(os.environ.get('TV_MAX_IN_FLIGHT', '2'))
+    if TV_MAX_IN_FLIGHT < 1:
+        raise ValueError
+except ValueError:
+    print("ERROR: TV_MAX_IN_FLIGHT must be a positive integer")
+    sys.exit(1)
+
+try:
+    # Global cap on scan connection attempts (TCP SYNs) per second
+    SCAN_MAX_PPS = int(os.environ.get('SCAN_MAX_PPS', '2000'))
+    if SCAN_MAX_PPS < 1:
+        raise ValueError
+except ValueError:
+    print("ERROR: SCAN_MAX_PPS must be a positive integer")
+    sys.exit(1)
+
+# Read-only JointSpace resources the proxy caches, as path=TTL seconds. A
+# path covers everything below it (channeldb = channeldb/tv/...). Entries in
+# RESPONSE_CACHE_TTLS (e.g. 'sources=30,ambilight/topology=3600') are added
+# to or override these defaults; a TTL of 0 turns caching off for that path.
+def _parse_cache_ttls(spec: str) -> dict[str, int]:
+    ttls = {}
+    for item in filter(str.strip, spec.split(',')):
+        path, sep, ttl = item.partition('=')
+        if not sep or not path.strip('/ ') or int(ttl) < 0:
+            raise ValueError
+        ttls[path.strip('/ ')] = int(ttl)
+    return ttls
+
+
+RESPONSE_CACHE_TTLS = {'system': 300, 'sources': 300, 'applications': 600, 'channeldb': 600}
+try:
+    RESPONSE_CACHE_TTLS.update(_parse_cache_ttls(os.environ.get('RESPONSE_CACHE_TTLS', '')))
+except ValueError:
+    print("ERROR: RESPONSE_CACHE_TTLS must look like 'system=300,channeldb=600'")
+    sys.exit(1)
+
+# Discovery backend: 'auto' (SSDP/mDNS, falling back to a /24 sweep when
+# nothing answers), 'ssdp' (multicast only) or 'sweep' (probe every address).
+DISCOVERY_MODE = os.environ.get('DISCOVERY_MODE', 'auto').lower()
+if DISCOVERY_MODE not in ('auto', 'ssdp', 'sweep'):
+    print("ERROR: DISCOVERY_MODE must be 'auto', 'ssdp' or 'sweep'")
+    sys.exit(1)
+
+try:
+    # Max sockets open at once during the scan prefilter
+    SCAN_CONCURRENCY = int(os.environ.get('SCAN_CONCURRENCY', '256'))
+    if SCAN_CONCURRENCY < 1:
+        raise ValueError
+except ValueError:
+    print("ERROR: SCAN_CONCURRENCY must be a positive integer")
+    sys.exit(1)
+
+# Optional state file: configured TVs, digest credentials, learned protocols
+# and the last discovery result survive restarts. Empty keeps them in memory only.
+STATE_FILE = os.environ.get('STATE_FILE', '')
+if STATE_FILE and not os.path.isdir(os.path.dirname(os.path.abspath(STATE_FILE))):
+    print("ERROR: STATE_FILE must be in an existing directory")
+    sys.exit(1)
+
+# Optional log file for the JSON-lines log (access records with per-request
+# traces, plus server events), rotated at LOG_MAX_BYTES keeping LOG_BACKUPS
+# old files. Empty writes the same lines to stdout.
+LOG_FILE = os.environ.get('LOG_FILE', '')
+if LOG_FILE and not os.path.isdir(os.path.dirname(os.path.abspath(LOG_FILE))):
+    print("ERROR: LOG_FILE must be in an existing directory")
+    sys.exit(1)
+
+try:
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    if LOG_MAX_BYTES < 1:
+        raise ValueError
+except ValueError:
+    print("ERROR: LOG_MAX_BYTES must be a positive integer")
+    sys.exit(1)
+
+try:
+    LOG_BACKUPS = int(os.environ.get('LOG_BACKUPS', '3'))
+    if LOG_BACKUPS < 0:
+        raise ValueError
+except ValueError:
+    print("ERROR: LOG_BACKUPS must be a non-negative integer")
+    sys.exit(1)
+
+# Wake-on-LAN: magic packets go to WOL_BROADCAST (and straight to the TV's
+# last known IP) on UDP port WOL_PORT.
+WOL_BROADCAST = os.environ.get('WOL_BROADCAST', '255.255.255.255')
+try:
+    ipaddress.IPv4Address(WOL_BROADCAST)
+except ValueError:
+    print("ERROR: WOL_BROADCAST must be an IPv4 address")
+    sys.exit(1)
+
+try:
+    WOL_PORT = int(os.environ.get('WOL_PORT', '9'))
+    if not (1 <= WOL_PORT <= 65535):
+        raise ValueError
+except ValueError:
+    print("ERROR: WOL_PORT must be an integer between 1 and 65535")
+    sys.exit(1)
+
 # Optional API token for authentication. If not set, server runs without auth
 # (backward compatible) but prints a warning at startup.
 API_TOKEN: str = os.environ.get('API_TOKEN', '')
 
 # Mutable TV config (can be changed at runtime via /config endpoint)
-_env_tv_ip = os.environ.get('TV_IP', '')
-if _env_tv_ip and not is_valid_tv_ip(_env_tv_ip):
-    print(f"WARNING: TV_IP '{_env_tv_ip}' is not a valid RFC-1918 address — ignoring")
-    _env_tv_ip = ''
+_env_tv_ip = os.environ.get('TV_IP', '')  # validated below, after is_valid_tv_ip
 
 try:
     _env_tv_port = int(os.environ.get('TV_PORT', str(JOINTSPACE_PORT)))
@@ -66,21 +255,34 @@ tv_config = {
     'ip':         _env_tv_ip,
     'port':       _env_tv_port,
     'apiVersion': _env_tv_api,
+    'brand':      'philips',
 }
 
-# Lock for thread-safe access to tv_config and _tv_credentials
+# Named TVs addressed as /tv/{id}/…: { id: {id, ip, port, apiVersion, name} }
+# tv_config above stays the default TV for plain /api/… requests.
+_tv_registry: dict[str, dict] = {}
+
+# Lock for thread-safe access to tv_config, _tv_registry and the per-TV dicts below
 _config_lock = threading.Lock()
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 WWW_DIR    = os.path.join(SCRIPT_DIR, 'www')
 
-# Rate-limiting lock for /discover: only one scan at a time
-_discover_lock = threading.Lock()
-
 # In-memory store of TV digest credentials: { ip: {user, pass} }
 # Set via /config endpoint; used by the proxy when apiVersion >= 6.
 _tv_credentials: dict[str, dict[str, str]] = {}
 
+# Pairing keys of LG (client-key) and Samsung (token) TVs: { ip: key }
+_tv_pairing_keys: dict[str, str] = {}
+
+# Protocol each TV last answered on: { ip: {port, apiVersion, scheme, name, model} }
+# Learned by probes and scans; check_tv tries it before the full candidate list.
+_tv_protocols: dict[str, dict] = {}
+
+# MAC addresses of TVs for Wake-on-LAN: { ip: 'aa:bb:cc:dd:ee:ff' }
+# Learned from the neighbour table or the TV itself, or set via /config and /tvs.
+_tv_macs: dict[str, str] = {}
+
 # Private RFC-1918 networks allowed as TV IP targets (SSRF mitigation)
 _PRIVATE_NETWORKS = [
     ipaddress.IPv4Network('10.0.0.0/8'),
@@ -113,6 +315,37 @@ def is_valid_tv_ip(ip: str) -> bool:
     return any(addr in net for net in _PRIVATE_NETWORKS)
 
 
+if _env_tv_ip and not is_valid_tv_ip(_env_tv_ip):
+    print(f"WARNING: TV_IP '{_env_tv_ip}' is not a valid RFC-1918 address — ignoring")
+    _env_tv_ip = tv_config['ip'] = ''
+
+
+def parse_scan_cidr(text: str) -> ipaddress.IPv4Network:
+    """Parse a network to sweep for TVs, e.g. '10.20.0.0/22'.
+
+    Like is_valid_tv_ip, only RFC-1918 networks are accepted, and none
+    larger than /SCAN_MIN_PREFIX. Raises ValueError with a message.
+    """
+    try:
+        network = ipaddress.IPv4Network(text.strip(), strict=False)
+    except ValueError:
+        raise ValueError(f'Invalid CIDR: {text.strip()}') from None
+    if network.prefixlen < SCAN_MIN_PREFIX:
+        raise ValueError(f'CIDR larger than /{SCAN_MIN_PREFIX}: {network}')
+    if not any(network.subnet_of(net) for net in _PRIVATE_NETWORKS):
+        raise ValueError(f'CIDR is not a private (RFC-1918) network: {network}')
+    return network
+
+
+# Networks /discover sweeps when a request names none; default: the local /24
+try:
+    SCAN_CIDRS = [parse_scan_cidr(c) for c in os.environ.get('SCAN_CIDRS', '').split(',')
+                  if c.strip()]
+except ValueError as e:
+    print(f"ERROR: SCAN_CIDRS: {e}")
+    sys.exit(1)
+
+
 def _ssl_context() -> ssl.SSLContext:
     """Return an SSL context that skips certificate verification.
 
@@ -130,6 +363,562 @@ def _ssl_context() -> ssl.SSLContext:
 _SHARED_SSL_CTX = _ssl_context()
 
 
+class _Metrics:
+    """Minimal thread-safe metrics registry rendered in Prometheus text format.
+
+    Supports counters, gauges (set directly or computed at scrape time) and
+    histograms with fixed buckets. Each metric keeps at most
+    METRICS_MAX_SERIES label sets so client-chosen paths cannot grow it
+    without bound.
+    """
+
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._meta: dict[str, tuple[str, str, tuple]] = {}  # name -> (type, help, buckets)
+        self._values: dict[str, dict[tuple, float | list]] = {}
+        self._callbacks: dict[str, Callable[[], float]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str,
+                 buckets: tuple = LATENCY_BUCKETS) -> None:
+        self._meta[name] = (kind, help_text, buckets)
+        self._values[name] = {}
+
+    def gauge_callback(self, name: str, help_text: str, fn: Callable[[], float]) -> None:
+        self.describe(name, 'gauge', help_text)
+        self._callbacks[name] = fn
+
+    def _series(self, name: str, labels: dict[str, str] | None, default) -> tuple:
+        key = tuple(sorted((labels or {}).items()))
+        series = self._values[name]
+        if key not in series and len(series) >= METRICS_MAX_SERIES:
+            key = tuple((k, 'other') for k, _ in key)
+        if key not in series:
+            series[key] = default()
+        return key
+
+    def inc(self, name: str, labels: dict[str, str] | None = None, value: float = 1) -> None:
+        with self._lock:
+            key = self._series(name, labels, float)
+            self._values[name][key] += value
+
+    def set(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        with self._lock:
+            key = self._series(name, labels, float)
+            self._values[name][key] = value
+
+    def observe(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        buckets = self._meta[name][2]
+        with self._lock:
+            # [bucket counts..., sum, count]
+            key  = self._series(name, labels, lambda: [0] * len(buckets) + [0.0, 0])
+            hist = self._values[name][key]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    @staticmethod
+    def _labels(pairs: tuple, extra: tuple = ()) -> str:
+        pairs = pairs + extra
+        if not pairs:
+            return ''
+        def _esc(v: str) -> str:
+            return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{k}="{_esc(v)}"' for k, v in pairs) + '}'
+
+    def render(self) -> str:
+        for name, fn in self._callbacks.items():
+            self.set(name, fn())
+        lines: list[str] = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._meta.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, value in sorted(self._values[name].items()):
+                    if kind != 'histogram':
+                        lines.append(f'{name}{self._labels(key)} {value:g}')
+                        continue
+                    for bound, count in zip(buckets, value):
+                        lines.append(f'{name}_bucket{self._labels(key, (("le", f"{bound:g}"),))} {count}')
+                    lines.append(f'{name}_bucket{self._labels(key, (("le", "+Inf"),))} {value[-1]}')
+                    lines.append(f'{name}_sum{self._labels(key)} {value[-2]:g}')
+                    lines.append(f'{name}_count{self._labels(key)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+_metrics = _Metrics()
+_metrics.describe('philips_remote_request_duration_seconds', 'histogram',
+                  'Total time to serve a client request, by route family.')
+_metrics.describe('philips_remote_upstream_duration_seconds', 'histogram',
+                  'Time spent waiting on the TV per JointSpace call, by path family.')
+_metrics.describe('philips_remote_upstream_errors_total', 'counter',
+                  'Failed TV calls by error class (timeout, tls, connection, 401, 4xx, 5xx).')
+_metrics.describe('philips_remote_digest_challenges_total', 'counter',
+                  'Digest Auth challenge round trips (401 then signed retry).')
+_metrics.describe('philips_remote_scheduler_wait_seconds', 'histogram',
+                  'Time TV calls spent queued behind others for the same TV.')
+_metrics.describe('philips_remote_scheduler_rejected_total', 'counter',
+                  'TV calls refused by the per-TV scheduler (queue_full, evicted, deadline).')
+_metrics.describe('philips_remote_circuit_transitions_total', 'counter',
+                  'TV circuit breaker state changes, by new state.')
+_metrics.describe('philips_remote_response_cache_total', 'counter',
+                  'Cacheable TV GETs by outcome (hit, miss, collapsed).')
+_metrics.describe('philips_remote_scan_duration_seconds', 'histogram',
+                  'Duration of network scans for TVs.', (0.25, 0.5, 1, 2, 4, 8, 16))
+_metrics.describe('philips_remote_scan_hosts_probed_total', 'counter',
+                  'Addresses swept by network scans.')
+_metrics.describe('philips_remote_scan_hosts_open_total', 'counter',
+                  'Addresses that passed the TCP prefilter during network scans.')
+_metrics.describe('philips_remote_requests_in_flight', 'gauge',
+                  'Client requests currently being handled.')
+_metrics.describe('philips_remote_tv_session_connects_total', 'counter',
+                  'Connection attempts of LG/Samsung TV sessions, by brand and result.')
+_metrics.describe('philips_remote_ws_sessions', 'gauge',
+                  'Open /ws control channel sessions.')
+_metrics.describe('philips_remote_ws_messages_total', 'counter',
+                  'Commands received over /ws, by type (key, volume).')
+_metrics.describe('philips_remote_wakes_total', 'counter',
+                  'Wake-on-LAN power-on attempts, by result (ready, timeout, no_mac).')
+_metrics.describe('philips_remote_wake_seconds', 'histogram',
+                  'Time from the first magic packet until a TV answered.', (1, 2, 4, 8, 15, 30))
+_metrics.describe('philips_remote_log_dropped_total', 'counter',
+                  'Log records dropped because the log writer fell behind.')
+_metrics.gauge_callback('philips_remote_threads', 'Live threads in the server process.',
+                        threading.active_count)
+
+
+class _AsyncLog:
+    """JSON-lines log written by a background thread.
+
+    Callers only put a dict on a bounded queue; the writer formats and
+    writes records in batches, so a slow stdout pipe, journald or disk never
+    adds latency to a request or serializes handler threads. While
+    LOG_QUEUE_MAX records are waiting, new ones are dropped and counted, and
+    the writer notes each gap in the log. With a path, the file is rotated
+    once it would grow past max_bytes, keeping `backups` old files (.1 is
+    the newest).
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int,
+                 max_queue: int = LOG_QUEUE_MAX) -> None:
+        self.path       = path
+        self._max_bytes = max_bytes
+        self._backups   = backups
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._lock      = threading.Lock()
+        self._dropped   = 0  # since the writer last reported a gap
+        self._thread: threading.Thread | None = None
+        self._file      = None
+        self._size      = 0
+
+    def write(self, component: str, message: str, **fields) -> None:
+        """Log one event, e.g. write('state', 'Cannot write state file', error=str(e))."""
+        self.put({'ts': time.time(), 'component': component, 'msg': message, **fields})
+
+    def put(self, record: dict) -> None:
+        """Queue a prepared record; its ts is wall-clock seconds, formatted by the writer."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            _metrics.inc('philips_remote_log_dropped_total')
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Wait (up to timeout) until every queued record has been written."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self) -> None:
+        while True:
+            records = [self._queue.get()]
+            while len(records) < 256:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            taken = len(records)
+            with self._lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                records.append({'ts': time.time(), 'component': 'log',
+                                'msg': 'Log writer fell behind; records dropped', 'dropped': dropped})
+            try:
+                self._emit([self._format(r) for r in records])
+            except (OSError, ValueError):
+                pass  # nowhere left to report it; keep serving
+            for _ in range(taken):
+                self._queue.task_done()
+
+    @staticmethod
+    def _format(record: dict) -> str:
+        ts = record['ts']
+        record['ts'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(ts)) + f'.{int(ts % 1 * 1000):03d}Z'
+        return json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str) + '\n'
+
+    def _emit(self, lines: list[str]) -> None:
+        if not self.path:
+            sys.stdout.write(''.join(lines))
+            sys.stdout.flush()
+            return
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+            self._size = self._file.tell()
+        chunk = bytearray()
+        for line in lines:
+            data = line.encode()
+            if self._size + len(chunk) and self._size + len(chunk) + len(data) > self._max_bytes:
+                self._file.write(chunk)
+                self._rotate()
+                chunk.clear()
+            chunk += data
+        self._file.write(chunk)
+        self._file.flush()
+        self._size += len(chunk)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for n in range(self._backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{n}'):
+                os.replace(f'{self.path}.{n}', f'{self.path}.{n + 1}')
+        if self._backups:
+            os.replace(self.path, f'{self.path}.1')
+        self._file = open(self.path, 'wb')
+        self._size = 0
+
+
+_log = _AsyncLog(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUPS)
+_metrics.gauge_callback('philips_remote_log_queue', 'Log records waiting for the log writer.',
+                        _log.pending)
+
+# Stage timestamps of the request the current handler thread is serving:
+# { stage: monotonic time }, None outside a request. See _trace().
+_trace_local = threading.local()
+
+
+def _trace(stage: str) -> None:
+    """Note that the current request reached stage; the first time counts.
+
+    Stages: auth, config, scheduled (TV slot granted), reused / connect /
+    tls (upstream connection), digest_challenge, upstream_headers,
+    upstream_body and respond (status line sent). A no-op on threads that
+    are not serving a request, such as pollers and prewarms.
+    """
+    marks = getattr(_trace_local, 'marks', None)
+    if marks is not None and stage not in marks:
+        marks[stage] = time.monotonic()
+
+
+def _api_family(tv_path: str) -> str:
+    """Label for a JointSpace path: '/6/audio/volume?x' -> 'audio/volume'."""
+    parts = [p for p in urllib.parse.urlparse(tv_path).path.split('/') if p]
+    if parts and parts[0].isdigit():
+        parts = parts[1:]
+    return '/'.join(parts[:2]) or '/'
+
+
+def _classify_upstream_error(exc: BaseException) -> str:
+    if isinstance(exc, urllib.error.HTTPError):
+        if exc.code == 401:
+            return '401'
+        return '5xx' if exc.code >= 500 else '4xx'
+    if isinstance(exc, TimeoutError):
+        return 'timeout'
+    if isinstance(exc, ssl.SSLError):
+        return 'tls'
+    return 'connection'
+
+
+class _TvHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection that resumes a cached TLS session when one is available.
+
+    The TV's CPU makes full handshakes expensive, so the pool hands each new
+    connection the last session negotiated with the same (ip, port).
+    """
+
+    def __init__(self, host: str, port: int, timeout: float,
+                 session: ssl.SSLSession | None) -> None:
+        super().__init__(host, port, timeout=timeout, context=_SHARED_SSL_CTX)
+        self._resume_session = session
+
+    def connect(self) -> None:
+        http.client.HTTPConnection.connect(self)
+        _trace('connect')
+        try:
+            self.sock = self._context.wrap_socket(
+                self.sock, server_hostname=self.host, session=self._resume_session)
+            _trace('tls')
+        except ssl.SSLError:
+            if self._resume_session is None:
+                raise
+            # Session rejected (e.g. TV rebooted) — fall back to a full handshake
+            self.sock.close()
+            self._resume_session = None
+            self.connect()
+
+
+class _UpstreamPool:
+    """Pool of persistent HTTP/HTTPS connections to TVs.
+
+    Connections are keyed by (scheme, ip, port). Idle connections older than
+    POOL_IDLE_TIMEOUT are closed by a background reaper, and every connection
+    is health-checked before reuse so a socket the TV has already closed is
+    never handed out.
+    """
+
+    def __init__(self, idle_timeout: float = POOL_IDLE_TIMEOUT,
+                 max_idle: int = POOL_MAX_IDLE) -> None:
+        self._idle_timeout = idle_timeout
+        self._max_idle     = max_idle
+        self._lock         = threading.Lock()
+        # key -> list of (connection, time it was returned to the pool)
+        self._idle: dict[tuple[str, str, int], list[tuple[http.client.HTTPConnection, float]]] = {}
+        # key -> last TLS session negotiated with that TV
+        self._sessions: dict[tuple[str, str, int], ssl.SSLSession] = {}
+        self._reaper: threading.Thread | None = None
+
+    def _new_connection(self, key: tuple[str, str, int],
+                        timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == 'https':
+            with self._lock:
+                session = self._sessions.get(key)
+            conn = _TvHTTPSConnection(host, port, timeout, session)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.connect()
+        _trace('connect')
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: http.client.HTTPConnection) -> bool:
+        """Return False if the TV closed the connection or sent unsolicited data."""
+        sock = conn.sock
+        if sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        if not readable:
+            return True
+        # Readable while idle: either EOF, garbage, or (TLS 1.3) a session
+        # ticket record that carries no application data.
+        sock.setblocking(False)
+        try:
+            if isinstance(sock, ssl.SSLSocket):
+                data = sock.recv(1)
+            else:
+                data = sock.recv(1, socket.MSG_PEEK)
+            # b'' is EOF; any application data here is unexpected
+            return False
+        except (ssl.SSLWantReadError, BlockingIOError):
+            return True
+        except (OSError, ssl.SSLError):
+            return False
+        finally:
+            try:
+                sock.setblocking(True)
+            except OSError:
+                pass
+
+    def acquire(self, scheme: str, host: str, port: int,
+                timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused) for the given TV endpoint."""
+        key = (scheme, host, port)
+        while True:
+            with self._lock:
+                bucket = self._idle.get(key)
+                entry  = bucket.pop() if bucket else None
+            if entry is None:
+                return self._new_connection(key, timeout), False
+            conn, returned_at = entry
+            if time.monotonic() - returned_at < self._idle_timeout and self._is_healthy(conn):
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+                _trace('reused')
+                return conn, True
+            conn.close()
+
+    def release(self, scheme: str, host: str, port: int,
+                conn: http.client.HTTPConnection) -> None:
+        """Return a connection whose response has been fully read."""
+        key = (scheme, host, port)
+        if conn.sock is None:
+            return
+        session = getattr(conn.sock, 'session', None)
+        with self._lock:
+            if session is not None:
+                self._sessions[key] = session
+            bucket = self._idle.setdefault(key, [])
+            if len(bucket) >= self._max_idle:
+                conn.close()
+                return
+            bucket.append((conn, time.monotonic()))
+            self._start_reaper()
+
+    def prewarm(self, scheme: str, host: str, port: int) -> None:
+        """Open (and TLS-handshake) one connection in the background."""
+        def _warm() -> None:
+            try:
+                conn = self._new_connection((scheme, host, port), TV_REQUEST_TIMEOUT)
+            except (OSError, http.client.HTTPException):
+                return
+            self.release(scheme, host, port, conn)
+        threading.Thread(target=_warm, daemon=True).start()
+
+    def _start_reaper(self) -> None:
+        # Caller holds self._lock
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap_forever, daemon=True)
+            self._reaper.start()
+
+    def _reap_forever(self) -> None:
+        while True:
+            time.sleep(self._idle_timeout / 2)
+            cutoff = time.monotonic() - self._idle_timeout
+            expired = []
+            with self._lock:
+                for key, bucket in self._idle.items():
+                    expired.extend(c for c, t in bucket if t < cutoff)
+                    bucket[:] = [(c, t) for c, t in bucket if t >= cutoff]
+            for conn in expired:
+                conn.close()
+
+
+_UPSTREAM_POOL = _UpstreamPool()
+
+# Errors that mean a reused keep-alive connection went stale before the TV
+# produced a response; the request is retried once on a fresh connection.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError,
+                            ConnectionAbortedError, BrokenPipeError)
+
+
+class _UpstreamStream:
+    """A TV response whose body has not been read yet.
+
+    The pooled connection stays checked out until the body has been read to
+    the end, when it goes back to the pool, or until close(), which drops it
+    if unread data remains. Also serves as the fp of a streamed HTTPError.
+    """
+
+    def __init__(self, resp: http.client.HTTPResponse, release: Callable[[], None],
+                 discard: Callable[[], None]) -> None:
+        self.status  = resp.status
+        self.headers = resp.headers
+        self.length  = resp.length  # None when the TV sends chunked or close-delimited
+        self._resp    = resp
+        self._release = release
+        self._discard = discard
+        self._done    = False
+
+    def read(self, amt: int | None = None) -> bytes:
+        """Up to amt bytes as soon as any arrive (everything when amt is None); b'' at the end."""
+        if self._done:
+            return b''
+        try:
+            data = self._resp.read() if amt is None else self._resp.read1(amt)
+        except BaseException:
+            self._finish(False)
+            raise
+        if not data or self._resp.isclosed():
+            self._finish(True)
+        return data
+
+    def close(self) -> None:
+        if not self._done:
+            # A short leftover (say, a 401 body) is cheaper to drain than a new handshake
+            if self.length is not None and self.length <= STREAM_CHUNK_SIZE:
+                try:
+                    self._resp.read()
+                    self._finish(True)
+                    return
+                except (OSError, http.client.HTTPException):
+                    pass
+            self._finish(False)
+
+    def _finish(self, complete: bool) -> None:
+        self._done = True
+        if complete and not self._resp.will_close:
+            self._resp.close()  # read1() leaves a drained response open; the pool needs it closed
+            self._release()
+        else:
+            self._discard()
+
+    def __enter__(self) -> '_UpstreamStream':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _tv_urlopen(url: str, method: str = 'GET', body: bytes | None = None,
+                headers: dict[str, str] | None = None,
+                timeout: float = TV_REQUEST_TIMEOUT,
+                stream: bool = False) -> bytes | _UpstreamStream:
+    """Send a request to the TV over a pooled keep-alive connection.
+
+    Drop-in replacement for urllib.request.urlopen(...).read(): returns the
+    response body, and raises urllib.error.HTTPError for status >= 400 so
+    callers can keep their existing error handling. With stream=True it
+    returns once the headers are in, with an _UpstreamStream for the body;
+    an HTTPError then reads its body from the stream too.
+    """
+    parsed = urllib.parse.urlparse(url)
+    scheme = parsed.scheme
+    host   = parsed.hostname or ''
+    port   = parsed.port or (443 if scheme == 'https' else 80)
+    path   = parsed.path + (('?' + parsed.query) if parsed.query else '')
+    hdrs   = {'Content-Type': 'application/json'}
+    hdrs.update(headers or {})
+
+    for attempt in range(2):
+        conn, reused = _UPSTREAM_POOL.acquire(scheme, host, port, timeout)
+        try:
+            conn.request(method, path, body=body, headers=hdrs)
+            resp = conn.getresponse()
+            _trace('upstream_headers')
+            data = b'' if stream else resp.read()
+        except _STALE_CONNECTION_ERRORS:
+            conn.close()
+            if reused and attempt == 0:
+                continue
+            raise
+        except BaseException:
+            conn.close()
+            raise
+        if stream:
+            upstream = _UpstreamStream(
+                resp, lambda c=conn: _UPSTREAM_POOL.release(scheme, host, port, c), conn.close)
+            if upstream.status >= 400:
+                raise urllib.error.HTTPError(url, resp.status, resp.reason,
+                                             resp.headers, upstream)
+            return upstream
+        _trace('upstream_body')
+        if resp.will_close:
+            conn.close()
+        else:
+            _UPSTREAM_POOL.release(scheme, host, port, conn)
+        if resp.status >= 400:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason,
+                                         resp.headers, io.BytesIO(data))
+        return data
+    raise AssertionError('unreachable')
+
+
 def get_local_subnet() -> tuple[str | None, str | None]:
     """Detect the local network subnet by connecting to an external address."""
     try:
@@ -144,171 +933,2971 @@ def get_local_subnet() -> tuple[str | None, str | None]:
         return None, None
 
 
-def check_tv(ip: str, port: int, timeout: int = SCAN_TIMEOUT) -> dict | None:
-    """Check if a Philips TV responds at the given IP.
+class _RateLimiter:
+    """Process-wide pacing of events to at most `rate` per second."""
 
-    Tries in order:
-      - port 1925: API v1 HTTP, v6 HTTPS, v5 HTTP
-      - port 1926: API v6 HTTPS  (Android TV)
+    def __init__(self, rate: float) -> None:
+        self._interval = 1 / rate
+        self._lock = threading.Lock()
+        self._next = 0.0
 
-    Returns device info dict with apiVersion/port fields, or None.
+    def reserve(self) -> float:
+        """Claim the next slot; return the monotonic time it starts."""
+        with self._lock:
+            at = max(time.monotonic(), self._next)
+            self._next = at + self._interval
+            return at
+
+
+# Shared by every scan and probe, so concurrent scans together stay under SCAN_MAX_PPS
+_SCAN_RATE = _RateLimiter(SCAN_MAX_PPS)
+
+
+def _tcp_prefilter(targets: list[tuple[str, int]], timeout: float,
+                   max_sockets: int = SCAN_CONCURRENCY) -> set[tuple[str, int]]:
+    """Return the (ip, port) pairs that accept a TCP connection.
+
+    Uses non-blocking connects multiplexed on one selector, so a whole
+    subnet is swept from the calling thread with at most max_sockets open.
+    Connects are paced by the global SCAN_MAX_PPS limit. Hosts that do not
+    answer within timeout are abandoned.
+    """
+    pending = list(reversed(targets))
+    open_pairs: set[tuple[str, int]] = set()
+    sel = selectors.DefaultSelector()
+    deadlines: dict[socket.socket, float] = {}
+    slot: float | None = None  # reserved start time of the next connect
+
+    def _close(sock: socket.socket) -> None:
+        sel.unregister(sock)
+        del deadlines[sock]
+        sock.close()
+
+    try:
+        while pending or deadlines:
+            while pending and len(deadlines) < max_sockets:
+                if slot is None:
+                    slot = _SCAN_RATE.reserve()
+                if slot > time.monotonic():
+                    break
+                slot = None
+                target = pending.pop()
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                err = sock.connect_ex(target)
+                if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    sock.close()
+                    continue
+                sel.register(sock, selectors.EVENT_WRITE, target)
+                deadlines[sock] = time.monotonic() + timeout
+
+            wake = list(deadlines.values())
+            if pending and slot is not None and len(deadlines) < max_sockets:
+                wake.append(slot)
+            if not wake:
+                continue
+            wait = max(0.0, min(wake) - time.monotonic())
+            if deadlines:
+                events = sel.select(wait)
+            else:
+                time.sleep(wait)
+                events = []
+            for key, _ in events:
+                if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    open_pairs.add(key.data)
+                _close(key.fileobj)
+
+            now = time.monotonic()
+            for sock in [s for s, d in deadlines.items() if d <= now]:
+                _close(sock)
+    finally:
+        for sock in list(deadlines):
+            _close(sock)
+        sel.close()
+    return open_pairs
+
+
+def _arp_table() -> dict[str, str]:
+    """{ip: mac} for IPv4 addresses with a complete entry in the kernel neighbour table.
+
+    Linux only (/proc/net/arp); elsewhere the table is empty, so scans simply
+    run in address order and MAC addresses are only learned from the TV.
     """
-    candidates = [
+    try:
+        with open('/proc/net/arp', encoding='ascii') as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return {}
+    table = {}
+    for line in lines:
+        fields = line.split()
+        # IP address, HW type, Flags, HW address, Mask, Device; flags 0x0 = incomplete
+        if len(fields) >= 4 and fields[2] != '0x0' and fields[3] != '00:00:00:00:00:00':
+            table[fields[0]] = fields[3].lower()
+    return table
+
+
+def _arp_neighbours() -> set[str]:
+    """IPv4 addresses with a complete entry in the kernel neighbour table."""
+    return set(_arp_table())
+
+
+def _probe_system(ip: str, port: int, api_version: int, scheme: str,
+                  timeout: float) -> dict | None:
+    """Fetch /{v}/system from one candidate endpoint; None if it does not answer."""
+    url = f"{scheme}://{ip}:{port}/{api_version}/system"
+    req = urllib.request.Request(url)
+    ctx = _SHARED_SSL_CTX if scheme == 'https' else None
+    try:
+        with urllib.request.urlopen(req, timeout=timeout, context=ctx) as response:
+            data = json.loads(response.read())
+    except Exception:
+        return None
+    return {
+        'ip':         ip,
+        'port':       port,
+        'apiVersion': api_version,
+        'name':       data.get('name', 'Philips TV'),
+        'model':      data.get('model', ''),
+    }
+
+
+def _tv_candidates(port: int) -> list[tuple[int, int, str]]:
+    """(port, apiVersion, scheme) probes in order of preference."""
+    return [
         (port, 1, 'http'),
         (port, 6, 'https'),
         (port, 5, 'http'),
         (1926, 6, 'https'),   # Android TV uses port 1926
     ]
-    for probe_port, api_version, scheme in candidates:
-        try:
-            url = f"{scheme}://{ip}:{probe_port}/{api_version}/system"
-            req = urllib.request.Request(url)
-            ctx = _SHARED_SSL_CTX if scheme == 'https' else None
-            with urllib.request.urlopen(req, timeout=timeout, context=ctx) as response:
-                data = json.loads(response.read())
-                return {
-                    'ip':         ip,
-                    'port':       probe_port,
-                    'apiVersion': api_version,
-                    'name':       data.get('name', 'Philips TV'),
-                    'model':      data.get('model', ''),
-                }
-        except Exception:
-            continue
-    return None
 
 
-def scan_network(subnet: str, port: int = JOINTSPACE_PORT) -> list[dict]:
-    """Scan /24 subnet for Philips TVs. Returns list of found devices."""
-    found: list[dict] = []
-    lock  = threading.Lock()
+# Shared pool for HTTP/TLS probes; bounded so a scan never spikes threads
+_PROBE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    SCAN_PROBE_THREADS, thread_name_prefix='probe')
 
-    def scan_ip(ip: str) -> None:
-        result = check_tv(ip, port)
-        if result:
-            with lock:
-                found.append(result)
 
-    threads = []
-    for i in range(1, 255):
-        ip = f"{subnet}.{i}"
-        t  = threading.Thread(target=scan_ip, args=(ip,), daemon=True)
-        threads.append(t)
-        t.start()
+def _probe_hosts(open_pairs: set[tuple[str, int]], port: int, timeout: float,
+                 on_found: Callable[[dict], None] | None = None) -> list[dict]:
+    """Probe every candidate protocol of every reachable host in parallel.
 
-    for t in threads:
-        t.join(timeout=SCAN_TIMEOUT * 4 + 2)
+    Only candidates whose port passed the TCP prefilter are tried. For each
+    host the most-preferred candidate that answers wins; as soon as it is
+    known, the host's remaining probes are cancelled and on_found (if
+    given) is called with the device.
+    """
+    per_host: dict[str, list[concurrent.futures.Future]] = {}
+    owner: dict[concurrent.futures.Future, str] = {}
+    for ip in sorted({ip for ip, _ in open_pairs}):
+        futures = []
+        for probe_port, api_version, scheme in _tv_candidates(port):
+            if (ip, probe_port) not in open_pairs:
+                continue
+            fut = _PROBE_EXECUTOR.submit(_probe_system, ip, probe_port,
+                                         api_version, scheme, timeout)
+            owner[fut] = ip
+            futures.append(fut)
+        per_host[ip] = futures
 
+    found: list[dict] = []
+    waiting = set(owner)
+    while waiting:
+        done, waiting = concurrent.futures.wait(
+            waiting, return_when=concurrent.futures.FIRST_COMPLETED)
+        for ip in {owner[f] for f in done}:
+            futures = per_host.get(ip)
+            if futures is None:
+                continue  # host already resolved
+            result = None
+            for fut in futures:  # preference order
+                if not fut.done():
+                    break        # a better candidate is still running
+                result = fut.result()
+                if result:
+                    break
+            else:
+                del per_host[ip]  # every candidate failed
+                continue
+            if result:
+                found.append(result)
+                _remember_protocol(result)
+                if on_found:
+                    on_found(result)
+                del per_host[ip]
+                for fut in futures:
+                    fut.cancel()
+                    waiting.discard(fut)
+    found.sort(key=lambda tv: ipaddress.IPv4Address(tv['ip']))
     return found
 
 
-def _build_digest_header(method: str, uri: str, user: str, password: str,
-                         www_auth: str, nc: int, cnonce: str) -> str:
-    """Build an Authorization: Digest header value from a WWW-Authenticate challenge.
+def check_tv(ip: str, port: int, timeout: int = SCAN_TIMEOUT) -> dict | None:
+    """Check if a Philips TV responds at the given IP.
 
-    Args:
-        method:    HTTP method ('GET', 'POST', …)
-        uri:       Request path+query (e.g. '/6/input/key')
-        user:      Digest username
-        password:  Digest password
-        www_auth:  Value of the WWW-Authenticate header from the 401 response
-        nc:        Nonce count (integer, e.g. 1)
-        cnonce:    Client nonce (random hex string)
+    Candidates, in order of preference:
+      - port 1925: API v1 HTTP, v6 HTTPS, v5 HTTP
+      - port 1926: API v6 HTTPS  (Android TV)
 
-    Returns:
-        Full value for the Authorization header (without 'Authorization: ' prefix).
+    The protocol the TV last answered on is tried first. Otherwise ports
+    that refuse a TCP connection are skipped, and the remaining candidates
+    are probed in parallel.
+
+    Returns device info dict with apiVersion/port fields, or None.
     """
-    def _extract(field: str) -> str:
-        m = re.search(rf'{field}="([^"]*)"', www_auth)
-        return m.group(1) if m else ''
+    with _config_lock:
+        known = _tv_protocols.get(ip)
+    if known:
+        tv = _probe_system(ip, known['port'], known['apiVersion'], known['scheme'], timeout)
+        if tv:
+            return tv
+    targets = sorted({(ip, p) for p, _, _ in _tv_candidates(port)})
+    found = _probe_hosts(_tcp_prefilter(targets, timeout), port, timeout)
+    return found[0] if found else None
 
-    realm  = _extract('realm')
-    nonce  = _extract('nonce')
-    opaque = _extract('opaque')
 
-    # qop may appear without quotes: qop=auth or qop="auth"
-    qop_m = re.search(r'qop="?([^",\s]*)"?', www_auth)
-    qop   = qop_m.group(1) if qop_m else ''
+def scan_network(subnet: str, port: int = JOINTSPACE_PORT,
+                 on_found: Callable[[dict], None] | None = None,
+                 stats: dict | None = None) -> list[dict]:
+    """Scan a subnet for Philips TVs. Returns list of found devices.
 
-    ha1 = hashlib.md5(f"{user}:{realm}:{password}".encode()).hexdigest()
-    ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
-    nc_hex = format(nc, '08x')
+    subnet is a CIDR ('10.20.0.0/22') or the first three octets of a /24
+    ('192.168.1'). A TCP-connect sweep of the JointSpace ports (at most
+    SCAN_CONCURRENCY sockets open, SCAN_MAX_PPS connects per second) finds
+    live hosts; only those are probed over HTTP/TLS. Hosts in the kernel
+    neighbour table go first, so TVs this machine has talked to are
+    confirmed within the first few hundred milliseconds even on a /16; the
+    rest follow in blocks of SCAN_BLOCK_HOSTS.
 
-    if qop:
-        response = hashlib.md5(
-            f"{ha1}:{nonce}:{nc_hex}:{cnonce}:{qop}:{ha2}".encode()
-        ).hexdigest()
-    else:
-        response = hashlib.md5(f"{ha1}:{nonce}:{ha2}".encode()).hexdigest()
+    on_found is called for each TV as soon as it is confirmed. If stats is
+    given, its hostsProbed / hostsOpen counts are increased.
+    """
+    started = time.monotonic()
+    if '/' not in subnet:
+        subnet = f"{subnet}.0/24"
+    hosts = [str(ip) for ip in ipaddress.IPv4Network(subnet, strict=False).hosts()]
+    neighbours = _arp_neighbours()
+    known = [ip for ip in hosts if ip in neighbours]
+    rest  = [ip for ip in hosts if ip not in neighbours]
+    blocks = [known] + [rest[i:i + SCAN_BLOCK_HOSTS] for i in range(0, len(rest), SCAN_BLOCK_HOSTS)]
 
-    header = (
-        f'Digest username="{user}", realm="{realm}", nonce="{nonce}", '
-        f'uri="{uri}", response="{response}"'
-    )
-    if qop:
-        header += f', qop={qop}, nc={nc_hex}, cnonce="{cnonce}"'
-    if opaque:
-        header += f', opaque="{opaque}"'
-    return header
+    ports = sorted({p for p, _, _ in _tv_candidates(port)})
+    found: list[dict] = []
+    hosts_open = 0
+    for block in blocks:
+        if not block:
+            continue
+        open_pairs = _tcp_prefilter([(ip, p) for ip in block for p in ports],
+                                    SCAN_CONNECT_TIMEOUT)
+        hosts_open += len({ip for ip, _ in open_pairs})
+        found += _probe_hosts(open_pairs, port, SCAN_TIMEOUT, on_found)
+    if stats is not None:
+        stats['hostsProbed'] = stats.get('hostsProbed', 0) + len(hosts)
+        stats['hostsOpen']   = stats.get('hostsOpen', 0) + hosts_open
+    _metrics.inc('philips_remote_scan_hosts_probed_total', value=len(hosts))
+    _metrics.inc('philips_remote_scan_hosts_open_total', value=hosts_open)
+    _metrics.observe('philips_remote_scan_duration_seconds', time.monotonic() - started)
+    found.sort(key=lambda tv: ipaddress.IPv4Address(tv['ip']))
+    return found
 
 
-def _proxy_with_digest(url: str, method: str, body: bytes | None,
+# SSDP search targets: (brand, ST). JointSpace has no URN of its own, so
+# Philips sets are found through the DLNA renderer and DIAL services they
+# announce; the other URNs are from the multi-brand design spec.
+SSDP_SEARCH_TARGETS = [
+    (None,      'urn:schemas-upnp-org:device:MediaRenderer:1'),
+    (None,      'urn:dial-multiscreen-org:service:dial:1'),
+    ('lg',      'urn:lge-com:service:webOSSecondScreen:1'),
+    ('samsung', 'urn:samsung.com:device:RemoteControlReceiver:1'),
+    ('sony',    'urn:schemas-sony-com:service:IRCC:1'),
+    ('roku',    'roku:ecp'),
+]
+
+# mDNS service queried alongside SSDP (Android TV sets, incl. Philips)
+MDNS_SERVICE = '_androidtvremote2._tcp.local'
+
+# Responder brands that may be a Philips TV and are worth a check_tv()
+_PHILIPS_CANDIDATE_BRANDS = (None, 'philips', 'androidtv')
+
+
+def _ssdp_brand(headers: dict[str, str]) -> str | None:
+    """Brand of an SSDP responder from its ST/NT, SERVER and USN headers."""
+    target = headers.get('st') or headers.get('nt', '')
+    for brand, st in SSDP_SEARCH_TARGETS:
+        if brand and target == st:
+            return brand
+    if 'philips' in (headers.get('server', '') + headers.get('usn', '')).lower():
+        return 'philips'
+    return None
+
+
+def _parse_ssdp(data: bytes) -> tuple[str, dict[str, str]] | None:
+    """Split an SSDP datagram into (start line, lower-cased headers)."""
+    try:
+        lines = data.decode('utf-8', 'replace').split('\r\n')
+    except Exception:
+        return None
+    if not lines or not (lines[0].startswith('HTTP/') or lines[0].startswith('NOTIFY')):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def _mdns_query(service: str) -> bytes:
+    """A one-question PTR query asking for a unicast reply (RFC 6762 §5.4)."""
+    name = b''.join(bytes([len(label)]) + label.encode() for label in service.split('.'))
+    return (b'\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00'
+            + name + b'\x00' + b'\x00\x0c' + b'\x80\x01')
+
+
+class _SsdpListener:
+    """SSDP/mDNS view of the devices on the LAN.
+
+    A background thread joins the SSDP group and records NOTIFY alive and
+    byebye announcements. search() additionally sends one M-SEARCH per
+    SSDP_SEARCH_TARGETS entry plus an mDNS query and collects the unicast
+    replies. Either way only a few multicast packets go out, instead of a
+    connection attempt to every address in the subnet. Only RFC-1918
+    senders are recorded, at most SSDP_MAX_DEVICES of them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._devices: dict[str, dict] = {}  # ip -> {brand, st, location, server, expires}
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the NOTIFY listener once; without multicast, search() still works."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._listen, daemon=True)
+            self._thread.start()
+
+    def devices(self) -> dict[str, dict]:
+        """Responders whose announcement has not expired, by IP."""
+        now = time.monotonic()
+        with self._lock:
+            self._devices = {ip: d for ip, d in self._devices.items() if d['expires'] > now}
+            return {ip: dict(d) for ip, d in self._devices.items()}
+
+    def search(self, timeout: float) -> dict[str, dict]:
+        """Send M-SEARCH and mDNS queries, wait up to timeout for replies."""
+        self.start()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+            sock.bind(('', 0))
+            for _brand, st in SSDP_SEARCH_TARGETS:
+                msg = ('M-SEARCH * HTTP/1.1\r\n'
+                       f'HOST: {SSDP_ADDR[0]}:{SSDP_ADDR[1]}\r\n'
+                       'MAN: "ssdp:discover"\r\n'
+                       f'MX: {SSDP_MX}\r\n'
+                       f'ST: {st}\r\n\r\n')
+                sock.sendto(msg.encode(), SSDP_ADDR)
+            sock.sendto(_mdns_query(MDNS_SERVICE), MDNS_ADDR)
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    data, (ip, port) = sock.recvfrom(4096)
+                except socket.timeout:
+                    break
+                if port == MDNS_ADDR[1] and not data.startswith(b'HTTP/'):
+                    self._record(ip, {'st': MDNS_SERVICE}, 'androidtv')
+                    continue
+                parsed = _parse_ssdp(data)
+                if parsed:
+                    self._record(ip, parsed[1])
+        except OSError as e:
+            _log.write('discovery', 'SSDP search failed', error=str(e))
+        finally:
+            sock.close()
+        return self.devices()
+
+    def _record(self, ip: str, headers: dict[str, str], brand: str | None = None) -> None:
+        if not is_valid_tv_ip(ip):
+            return  # never let a multicast packet point discovery outside the LAN
+        max_age = SSDP_DEFAULT_MAX_AGE
+        m = re.search(r'max-age\s*=\s*(\d+)', headers.get('cache-control', ''), re.IGNORECASE)
+        if m:
+            max_age = int(m.group(1))
+        brand = brand or _ssdp_brand(headers)
+        with self._lock:
+            previous = self._devices.pop(ip, None)  # re-inserted below as most recent
+            if previous and previous['brand'] and not brand:
+                # Keep the brand-specific entry over a generic renderer reply
+                previous['expires'] = max(previous['expires'], time.monotonic() + max_age)
+                self._devices[ip] = previous
+                return
+            if len(self._devices) >= SSDP_MAX_DEVICES:
+                del self._devices[next(iter(self._devices))]
+            self._devices[ip] = {
+                'ip':       ip,
+                'brand':    brand,
+                'st':       headers.get('st') or headers.get('nt', ''),
+                'location': headers.get('location', ''),
+                'server':   headers.get('server', ''),
+                'expires':  time.monotonic() + max_age,
+            }
+
+    def _listen(self) -> None:
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind(('', SSDP_ADDR[1]))
+            mreq = socket.inet_aton(SSDP_ADDR[0]) + socket.inet_aton('0.0.0.0')
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError as e:
+            _log.write('discovery', 'Not listening for SSDP announcements', error=str(e))
+            return
+        while True:
+            try:
+                data, (ip, _port) = sock.recvfrom(4096)
+            except OSError:
+                return
+            parsed = _parse_ssdp(data)
+            if not parsed or not parsed[0].startswith('NOTIFY'):
+                continue
+            if parsed[1].get('nts', '').lower() == 'ssdp:byebye':
+                with self._lock:
+                    self._devices.pop(ip, None)
+            else:
+                self._record(ip, parsed[1])
+
+
+_ssdp = _SsdpListener()
+
+
+class _DiscoveryRegistry:
+    """Discovered TVs, kept fresh by a shared background scan.
+
+    Readers get the cached list instantly. At most one scan runs at a time;
+    every caller that needs fresh results waits on the same scan instead of
+    starting (or being refused) another. A refresh re-checks the TVs already
+    known, then (per DISCOVERY_MODE) runs check_tv on SSDP/mDNS responders
+    and falls back to sweeping the subnet when none of them is a Philips
+    TV. Streaming subscribers get each TV as soon as the running scan
+    confirms it, then a summary.
+
+    cidrs limits discovery to those networks; without them it covers
+    SCAN_CIDRS, or the local /24 when that is empty.
+    """
+
+    def __init__(self, cidrs: tuple[ipaddress.IPv4Network, ...] = ()) -> None:
+        self._cidrs = cidrs
+        self._lock = threading.Lock()
+        self._tvs: dict[str, dict] = {}           # ip -> device info
+        self._updated: float | None = None        # monotonic time of last full scan
+        self._error = ''
+        self._scan_done: threading.Event | None = None  # set when the running scan ends
+        self._current: dict[str, dict] = {}       # TVs confirmed by the running scan
+        self._devices: list[dict] = []            # other-brand SSDP/mDNS responders
+        self._subscribers: list[queue.Queue] = []
+
+    def snapshot(self) -> dict:
+        """Return {'tvs', 'found', 'devices', 'age', 'scanning', 'error'}.
+
+        age is None before the first scan; found lists the TVs the running
+        scan has confirmed so far.
+        """
+        with self._lock:
+            age = None if self._updated is None else time.monotonic() - self._updated
+            return {
+                'tvs':      list(self._tvs.values()),
+                'found':    list(self._current.values()),
+                'devices':  list(self._devices),
+                'age':      age,
+                'scanning': self._scan_done is not None,
+                'error':    self._error,
+            }
+
+    def restore(self, tvs: list[dict], age: float) -> None:
+        """Seed the cache with a saved result that is age seconds old."""
+        with self._lock:
+            if self._updated is None:
+                self._tvs     = {tv['ip']: tv for tv in tvs}
+                self._updated = time.monotonic() - age
+
+    def refresh(self) -> threading.Event:
+        """Start a scan unless one is running; return an Event set when it ends."""
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> threading.Event:
+        if self._scan_done is None:
+            self._scan_done = threading.Event()
+            self._current   = {}
+            threading.Thread(target=self._scan, args=(self._scan_done,),
+                             daemon=True).start()
+        return self._scan_done
+
+    def scanning(self) -> bool:
+        with self._lock:
+            return self._scan_done is not None
+
+    def subscribe(self) -> queue.Queue:
+        """Join (or start) a scan and return a queue of its events.
+
+        The queue yields ('tv', device) for every TV the scan confirms —
+        including ones found before subscribing — and finally
+        ('done', summary). Call unsubscribe() when finished.
+        """
+        q: queue.Queue = queue.Queue()
+        with self._lock:
+            self._refresh_locked()
+            for tv in self._current.values():
+                q.put(('tv', tv))
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def _publish(self, tv: dict) -> None:
+        with self._lock:
+            if tv['ip'] in self._current:
+                return
+            self._current[tv['ip']] = tv
+            for q in self._subscribers:
+                q.put(('tv', tv))
+
+    def _check_hosts(self, ips: list[str], stats: dict | None = None) -> list[dict]:
+        """check_tv() the given hosts in parallel, publishing each TV found."""
+        ports   = sorted({p for p, _, _ in _tv_candidates(JOINTSPACE_PORT)})
+        targets = [(ip, p) for ip in ips for p in ports]
+        open_pairs = _tcp_prefilter(targets, SCAN_CONNECT_TIMEOUT)
+        if stats is not None:
+            stats['hostsProbed'] = stats.get('hostsProbed', 0) + len(ips)
+            stats['hostsOpen']   = stats.get('hostsOpen', 0) + len({ip for ip, _ in open_pairs})
+        return _probe_hosts(open_pairs, JOINTSPACE_PORT, SCAN_TIMEOUT, self._publish)
+
+    def _scan(self, done: threading.Event) -> None:
+        started = time.monotonic()
+        stats: dict = {}
+        method = 'sweep'
+        try:
+            with self._lock:
+                known = list(self._tvs)
+            alive = self._check_hosts(known) if known else []
+            with self._lock:
+                self._tvs = {tv['ip']: tv for tv in alive}
+
+            networks = list(self._cidrs or SCAN_CIDRS)
+
+            def _in_scope(ip: str) -> bool:
+                if not is_valid_tv_ip(ip):
+                    return False
+                return not networks or any(ipaddress.IPv4Address(ip) in n for n in networks)
+
+            found: list[dict] = []
+            if DISCOVERY_MODE != 'sweep':
+                method    = 'ssdp'
+                responders = {ip: d for ip, d in _ssdp.search(SSDP_MX + 0.5).items()
+                              if _in_scope(ip)}
+                candidates = sorted(ip for ip, d in responders.items()
+                                    if d['brand'] in _PHILIPS_CANDIDATE_BRANDS)
+                found = self._check_hosts(candidates, stats) if candidates else []
+                philips_ips = {tv['ip'] for tv in found}
+                with self._lock:
+                    self._devices = [{k: d[k] for k in ('ip', 'brand', 'st', 'location')}
+                                     for ip, d in sorted(responders.items())
+                                     if d['brand'] and ip not in philips_ips]
+                stats['responders'] = len(responders)
+
+            if DISCOVERY_MODE == 'sweep' or (DISCOVERY_MODE == 'auto' and not found):
+                if not networks:
+                    subnet, _local_ip = get_local_subnet()
+                    if not subnet:
+                        with self._lock:
+                            self._error = 'Cannot determine local network'
+                        return
+                    networks = [ipaddress.IPv4Network(f"{subnet}.0/24")]
+                method = 'sweep'
+                found  = []
+                for network in networks:
+                    found += scan_network(str(network), on_found=self._publish, stats=stats)
+
+            tvs = {tv['ip']: tv for tv in alive}
+            tvs.update((tv['ip'], tv) for tv in found)
+            with self._lock:
+                self._tvs     = tvs
+                self._updated = time.monotonic()
+                self._error   = ''
+            if not self._cidrs:
+                _state_store.save()  # the default network's result is kept in STATE_FILE
+        finally:
+            with self._lock:
+                summary = {
+                    'tvs':         len(self._current),
+                    'durationMs':  round((time.monotonic() - started) * 1000),
+                    'method':      method,
+                    'responders':  stats.get('responders', 0),
+                    'hostsProbed': stats.get('hostsProbed', 0),
+                    'hostsOpen':   stats.get('hostsOpen', 0),
+                }
+                if self._error:
+                    summary['error'] = self._error
+                for q in self._subscribers:
+                    q.put(('done', summary))
+                self._subscribers = []
+                self._scan_done   = None
+            done.set()
+
+
+_discovery = _DiscoveryRegistry()
+
+# Registries for explicitly requested networks: { sorted cidrs: _DiscoveryRegistry }
+_cidr_discoveries: dict[tuple[ipaddress.IPv4Network, ...], _DiscoveryRegistry] = {}
+_cidr_discoveries_lock = threading.Lock()
+
+
+def _get_discovery(cidrs: list[ipaddress.IPv4Network]) -> _DiscoveryRegistry | None:
+    """Discovery registry for the given networks (the default one if none).
+
+    Only idle registries are evicted, least recently used first, so a scan
+    never outlives its cache entry. None when a new set of networks would
+    need a slot while DISCOVERY_MAX_NETWORK_SETS scans are all running.
+    """
+    if not cidrs:
+        return _discovery
+    key = tuple(sorted(set(cidrs)))
+    with _cidr_discoveries_lock:
+        registry = _cidr_discoveries.pop(key, None)
+        if registry is None:
+            if len(_cidr_discoveries) >= DISCOVERY_MAX_NETWORK_SETS:
+                idle = next((k for k, r in _cidr_discoveries.items() if not r.scanning()), None)
+                if idle is None:
+                    return None
+                del _cidr_discoveries[idle]
+            registry = _DiscoveryRegistry(key)
+        _cidr_discoveries[key] = registry  # re-insert: dict order is least recently used first
+        return registry
+
+
+def _normalize_mac(value) -> str | None:
+    """'AA-BB-CC-DD-EE-FF', 'aabb.ccdd.eeff' etc. as 'aa:bb:cc:dd:ee:ff'; None if not a MAC."""
+    digits = re.sub(r'[:\-.]', '', str(value)).lower()
+    if not re.fullmatch(r'[0-9a-f]{12}', digits) or digits in ('0' * 12, 'f' * 12):
+        return None
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def _store_tv_mac(ip: str, mac: str) -> None:
+    with _config_lock:
+        changed = _tv_macs.get(ip) != mac
+        _tv_macs[ip] = mac
+    if changed:
+        _log.write('power', 'Learned MAC address', ip=ip, mac=mac)
+        _state_store.save()
+
+
+# IPs already asked for their MAC via network/devices, so a TV without one is asked once
+_mac_queried: set[str] = set()
+
+
+def _learn_mac(cfg: dict, creds: dict[str, str] | None = None, ask_tv: bool = False) -> None:
+    """Remember the MAC address of a TV that just answered, if it is not known yet.
+
+    Looks in the neighbour table first: the TV was reached a moment ago, so
+    its entry is fresh. With ask_tv, a v6 TV is then asked once for its
+    network/devices (JointSpace /system carries no MAC address).
+    """
+    ip = cfg['ip']
+    with _config_lock:
+        if ip in _tv_macs:
+            return
+    mac = _normalize_mac(_arp_table().get(ip, ''))
+    if mac is None and ask_tv and cfg['apiVersion'] >= 6 and ip not in _mac_queried:
+        _mac_queried.add(ip)
+        try:
+            devices = json.loads(_tv_call(cfg, creds, 'GET', '/6/network/devices',
+                                          priority=PRIORITY_BACKGROUND))
+            candidates = [d for d in devices if isinstance(d, dict)]
+            candidates.sort(key=lambda d: d.get('ip') != ip)  # the interface we reach it on first
+            mac = next(filter(None, (_normalize_mac(d.get('mac', '')) for d in candidates)), None)
+        except Exception:
+            pass
+    if mac:
+        _store_tv_mac(ip, mac)
+
+
+def _remember_protocol(tv: dict) -> None:
+    """Record the endpoint a TV answered on; persist it if it changed."""
+    entry = {
+        'port':       tv['port'],
+        'apiVersion': tv['apiVersion'],
+        'scheme':     _tv_scheme(tv['apiVersion']),
+        'name':       tv.get('name', ''),
+        'model':      tv.get('model', ''),
+    }
+    with _config_lock:
+        changed = _tv_protocols.get(tv['ip']) != entry
+        _tv_protocols[tv['ip']] = entry
+    if changed:
+        _state_store.save()
+    _learn_mac(tv)
+
+
+def _state_snapshot() -> dict:
+    """Everything STATE_FILE holds, as one JSON-serializable dict."""
+    with _config_lock:
+        state = {
+            'schema':      STATE_SCHEMA_VERSION,
+            'savedAt':     time.time(),
+            'config':      dict(tv_config),
+            'tvs':         [dict(tv) for tv in _tv_registry.values()],
+            'credentials': {ip: dict(creds) for ip, creds in _tv_credentials.items()},
+            'protocols':   {ip: dict(proto) for ip, proto in _tv_protocols.items()},
+            'pairingKeys': dict(_tv_pairing_keys),
+            'macs':        dict(_tv_macs),
+        }
+    snap = _discovery.snapshot()
+    state['discovery'] = None if snap['age'] is None else {
+        'tvs':       snap['tvs'],
+        'scannedAt': time.time() - snap['age'],
+    }
+    return state
+
+
+class _StateStore:
+    """Write-behind persistence of server state to STATE_FILE.
+
+    save() marks the state dirty and a background thread rewrites the file
+    at most every STATE_SAVE_DELAY seconds. Each write goes to a new
+    owner-only (0600) temporary file that atomically replaces the old one,
+    so a crash leaves the previous or the new state, never a torn file.
+    Without a path every method is a no-op.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._dirty = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self._dirty.set()
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._dirty.wait()
+            time.sleep(STATE_SAVE_DELAY)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the state now if it changed since the last write."""
+        if not self.path or not self._dirty.is_set():
+            return
+        with self._write_lock:
+            self._dirty.clear()
+            try:
+                self._write(json.dumps(_state_snapshot(), indent=1).encode())
+            except OSError as e:
+                _log.write('state', 'Cannot write state file', path=self.path, error=str(e))
+
+    def _write(self, data: bytes) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.unlink(tmp)  # never reuse a leftover file and its permissions
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        try:
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return  # e.g. Windows: directories cannot be opened for fsync
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def load(self) -> dict | None:
+        """Return the saved state, or None if there is none or it is unusable."""
+        if not self.path:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                mode = os.fstat(f.fileno()).st_mode
+                state = json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            _log.write('state', 'Ignoring unreadable state file', path=self.path, error=str(e))
+            return None
+        if mode & 0o077:
+            _log.write('state', 'State file was readable by other users; restricting it to the owner',
+                       path=self.path)
+            try:
+                os.chmod(self.path, 0o600)
+            except OSError:
+                pass
+        if not isinstance(state, dict) or state.get('schema') != STATE_SCHEMA_VERSION:
+            _log.write('state', 'Ignoring state file with another schema version', path=self.path,
+                       schema=STATE_SCHEMA_VERSION)
+            return None
+        return state
+
+
+_state_store = _StateStore(STATE_FILE)
+
+
+def _restore_state() -> None:
+    """Load STATE_FILE into memory, skipping entries that no longer validate.
+
+    TV_IP from the environment takes precedence over the saved default TV.
+    """
+    state = _state_store.load()
+    if state is None:
+        return
+    blank = {'ip': '', 'port': JOINTSPACE_PORT, 'apiVersion': 1}
+
+    def _valid(entry, current: dict) -> dict | None:
+        if not isinstance(entry, dict):
+            return None
+        updated, error = _parse_tv_fields(entry, current)
+        return None if error or not updated['ip'] else updated
+
+    def _section(parent: dict, key: str, kind: type):
+        """parent[key] if it has the expected JSON type, else an empty one."""
+        value = parent.get(key)
+        return value if isinstance(value, kind) else kind()
+
+    with _config_lock:
+        config = _valid(state.get('config'), tv_config)
+        if config and not _env_tv_ip:
+            tv_config.update(config)
+        for tv in _section(state, 'tvs', list):
+            tv_id = str(tv.get('id', '')) if isinstance(tv, dict) else ''
+            entry = _valid(tv, dict(blank, id=tv_id)) if re.fullmatch(r'[A-Za-z0-9_-]{1,64}', tv_id) else None
+            if entry:
+                entry['name'] = str(tv.get('name', tv_id))[:64]
+                _tv_registry[tv_id] = entry
+        for ip, creds in _section(state, 'credentials', dict).items():
+            if is_valid_tv_ip(ip) and isinstance(creds, dict) and creds.get('user') and creds.get('pass'):
+                _tv_credentials[ip] = {'user': str(creds['user']), 'pass': str(creds['pass'])}
+        for ip, key in _section(state, 'pairingKeys', dict).items():
+            if is_valid_tv_ip(ip) and isinstance(key, str) and key:
+                _tv_pairing_keys[ip] = key
+        for ip, mac in _section(state, 'macs', dict).items():
+            if is_valid_tv_ip(ip) and _normalize_mac(mac):
+                _tv_macs[ip] = _normalize_mac(mac)
+        for ip, proto in _section(state, 'protocols', dict).items():
+            entry = _valid(dict(proto, ip=ip) if isinstance(proto, dict) else None, blank)
+            if entry:
+                _tv_protocols[ip] = {
+                    'port': entry['port'], 'apiVersion': entry['apiVersion'],
+                    'scheme': _tv_scheme(entry['apiVersion']),
+                    'name': str(proto.get('name', '')), 'model': str(proto.get('model', '')),
+                }
+        counts = (len(_tv_registry), len(_tv_credentials) + len(_tv_pairing_keys), len(_tv_protocols))
+
+    discovery = state.get('discovery')
+    if isinstance(discovery, dict) and isinstance(discovery.get('scannedAt'), (int, float)):
+        tvs = []
+        for tv in _section(discovery, 'tvs', list):
+            entry = _valid(tv, blank)
+            if entry:
+                tvs.append(dict(entry, name=str(tv.get('name', 'Philips TV')),
+                                model=str(tv.get('model', ''))))
+        _discovery.restore(tvs, max(0.0, time.time() - discovery['scannedAt']))
+    _log.write('state', 'Restored state', path=_state_store.path, tvs=counts[0],
+               credentials=counts[1], protocols=counts[2])
+
+
+def _verify_configured_tvs() -> None:
+    """Warm a connection to each configured TV and check that it still answers.
+
+    Runs in the background at startup, so requests can be proxied at once
+    with the restored (or TV_IP) settings while this confirms them.
+    """
+    with _config_lock:
+        targets = [dict(tv_config)] if tv_config['ip'] else []
+        targets += [dict(tv) for tv in _tv_registry.values()]
+    seen = set()
+    for cfg in targets:
+        key = (cfg['ip'], cfg['port'], cfg['apiVersion'], cfg.get('brand'))
+        if key in seen:
+            continue
+        seen.add(key)
+        _prewarm_tv(cfg)
+        if cfg.get('brand', 'philips') != 'philips':
+            continue  # the session reports its own connection errors
+        started = time.monotonic()
+        scheme  = _tv_scheme(cfg['apiVersion'])
+        tv = _probe_system(cfg['ip'], cfg['port'], cfg['apiVersion'], scheme, TV_REQUEST_TIMEOUT)
+        if tv is None:
+            _log.write('state', 'Configured TV is not answering', ip=cfg['ip'], port=cfg['port'],
+                       apiVersion=cfg['apiVersion'])
+            continue
+        _remember_protocol(tv)
+        _log.write('state', 'Configured TV verified', ip=cfg['ip'], port=cfg['port'],
+                   apiVersion=cfg['apiVersion'], ms=round((time.monotonic() - started) * 1000, 1))
+
+
+def _parse_digest_challenge(www_auth: str) -> dict[str, str]:
+    """Extract realm/nonce/opaque/qop/stale from a WWW-Authenticate: Digest value."""
+    def _extract(field: str) -> str:
+        m = re.search(rf'{field}="([^"]*)"', www_auth)
+        return m.group(1) if m else ''
+
+    # qop and stale may appear without quotes: qop=auth or qop="auth"
+    qop_m   = re.search(r'qop="?([^",\s]*)"?', www_auth)
+    stale_m = re.search(r'stale="?([^",\s]*)"?', www_auth, re.IGNORECASE)
+    return {
+        'realm':  _extract('realm'),
+        'nonce':  _extract('nonce'),
+        'opaque': _extract('opaque'),
+        'qop':    qop_m.group(1) if qop_m else '',
+        'stale':  stale_m.group(1).lower() if stale_m else '',
+    }
+
+
+def _build_digest_header(method: str, uri: str, user: str, ha1: str,
+                         challenge: dict[str, str], nc: int, cnonce: str) -> str:
+    """Build an Authorization: Digest header value from a parsed challenge.
+
+    Args:
+        method:    HTTP method ('GET', 'POST', …)
+        uri:       Request path+query (e.g. '/6/input/key')
+        user:      Digest username
+        ha1:       MD5(user:realm:password), precomputed per credential set
+        challenge: Output of _parse_digest_challenge()
+        nc:        Nonce count (integer, e.g. 1)
+        cnonce:    Client nonce (random hex string)
+
+    Returns:
+        Full value for the Authorization header (without 'Authorization: ' prefix).
+    """
+    realm  = challenge['realm']
+    nonce  = challenge['nonce']
+    opaque = challenge['opaque']
+    qop    = challenge['qop']
+
+    ha2 = hashlib.md5(f"{method}:{uri}".encode()).hexdigest()
+    nc_hex = format(nc, '08x')
+
+    if qop:
+        response = hashlib.md5(
+            f"{ha1}:{nonce}:{nc_hex}:{cnonce}:{qop}:{ha2}".encode()
+        ).hexdigest()
+    else:
+        response = hashlib.md5(f"{ha1}:{nonce}:{ha2}".encode()).hexdigest()
+
+    header = (
+        f'Digest username="{user}", realm="{realm}", nonce="{nonce}", '
+        f'uri="{uri}", response="{response}"'
+    )
+    if qop:
+        header += f', qop={qop}, nc={nc_hex}, cnonce="{cnonce}"'
+    if opaque:
+        header += f', opaque="{opaque}"'
+    return header
+
+
+class _DigestSession:
+    """Cached Digest Auth state for one TV and credential set.
+
+    Keeps the last challenge (realm/nonce/opaque/qop) so requests can be
+    signed up front with an incrementing nonce count, and computes HA1 only
+    when the realm or credentials change.
+    """
+
+    def __init__(self, user: str, password: str) -> None:
+        self.user      = user
+        self.password  = password
+        self._lock     = threading.Lock()
+        self._challenge: dict[str, str] | None = None
+        self._nc       = 0
+        self._ha1      = ''
+
+    def update(self, www_auth: str) -> None:
+        """Adopt a fresh challenge from a 401 response."""
+        challenge = _parse_digest_challenge(www_auth)
+        with self._lock:
+            if self._challenge is None or self._challenge['realm'] != challenge['realm']:
+                self._ha1 = hashlib.md5(
+                    f"{self.user}:{challenge['realm']}:{self.password}".encode()
+                ).hexdigest()
+            self._challenge = challenge
+            self._nc = 0
+
+    def authorization(self, method: str, uri: str) -> str | None:
+        """Return a signed Authorization value, or None before the first challenge."""
+        with self._lock:
+            if self._challenge is None:
+                return None
+            self._nc += 1
+            nc, challenge, ha1 = self._nc, self._challenge, self._ha1
+        return _build_digest_header(method, uri, self.user, ha1, challenge,
+                                    nc, secrets.token_hex(8))
+
+
+# Digest sessions per TV endpoint: { (ip, port): _DigestSession }
+_digest_sessions: dict[tuple[str, int], _DigestSession] = {}
+_digest_sessions_lock = threading.Lock()
+
+
+def _get_digest_session(host: str, port: int, creds: dict[str, str]) -> _DigestSession:
+    """Return the cached session for a TV, replacing it if credentials changed."""
+    with _digest_sessions_lock:
+        session = _digest_sessions.get((host, port))
+        if session is None or (session.user, session.password) != (creds['user'], creds['pass']):
+            session = _DigestSession(creds['user'], creds['pass'])
+            _digest_sessions[(host, port)] = session
+        return session
+
+
+def _proxy_with_digest(url: str, method: str, body: bytes | None,
                        creds: dict[str, str],
-                       ctx: ssl.SSLContext | None) -> bytes:
-    """Perform an HTTP request with Digest Auth challenge-response.
+                       stream: bool = False) -> bytes | _UpstreamStream:
+    """Perform an HTTP request with Digest Auth.
 
-    Sends the request once to obtain the 401 challenge, then retries
-    with the computed Authorization header.
+    Signs the request up front from the cached per-TV challenge. The
+    challenge round trip (unauthenticated request → 401 → signed retry) is
+    only paid for the first request to a TV, or when the TV rejects the
+    cached nonce (stale=true or any other 401).
 
     Args:
         url:    Full URL to request
         method: HTTP method
         body:   Request body bytes (may be None for GET)
         creds:  {'user': ..., 'pass': ...}
-        ctx:    SSL context (or None for plain HTTP)
+        stream: Return an _UpstreamStream instead of reading the body
 
     Returns:
-        Response body bytes.
+        Response body bytes (or the unread response with stream=True).
 
     Raises:
         urllib.error.HTTPError: if the authenticated request still fails
         Exception: on network / SSL errors
     """
-    parsed   = urllib.parse.urlparse(url)
-    uri      = parsed.path + (('?' + parsed.query) if parsed.query else '')
-    user     = creds['user']
-    password = creds['pass']
+    parsed  = urllib.parse.urlparse(url)
+    uri     = parsed.path + (('?' + parsed.query) if parsed.query else '')
+    session = _get_digest_session(parsed.hostname or '', parsed.port or 0, creds)
 
-    # Step 1 — unauthenticated probe to get the challenge
-    req1 = urllib.request.Request(url, data=body, method=method)
-    req1.add_header('Content-Type', 'application/json')
+    # Step 1 — signed request from the cached challenge, or an unauthenticated
+    # probe to obtain the first challenge
+    auth_value = session.authorization(method, uri)
     try:
-        with urllib.request.urlopen(req1, timeout=TV_REQUEST_TIMEOUT, context=ctx) as resp:
-            return resp.read()  # 200 without auth — return directly
+        if auth_value:
+            return _tv_urlopen(url, method, body, {'Authorization': auth_value}, stream=stream)
+        return _tv_urlopen(url, method, body, stream=stream)  # 200 without auth — return directly
     except urllib.error.HTTPError as e:
         if e.code != 401:
             raise
+        e.close()
         www_auth = e.headers.get('WWW-Authenticate', '')
         if not www_auth.lower().startswith('digest'):
             raise
 
-    # Step 2 — retry with Digest Authorization
-    cnonce     = secrets.token_hex(8)
-    auth_value = _build_digest_header(method, uri, user, password, www_auth, 1, cnonce)
-    req2 = urllib.request.Request(url, data=body, method=method)
-    req2.add_header('Content-Type',  'application/json')
-    req2.add_header('Authorization', auth_value)
-    with urllib.request.urlopen(req2, timeout=TV_REQUEST_TIMEOUT, context=ctx) as resp:
-        return resp.read()
+    # Step 2 — retry with Digest Authorization built from the new challenge
+    _metrics.inc('philips_remote_digest_challenges_total')
+    _trace('digest_challenge')
+    session.update(www_auth)
+    auth_value = session.authorization(method, uri)
+    return _tv_urlopen(url, method, body, {'Authorization': auth_value}, stream=stream)
+
+
+def _tv_scheme(api_version: int) -> str:
+    """v6+ uses HTTPS; older models use plain HTTP."""
+    return 'https' if api_version >= 6 else 'http'
+
+
+# Scheduling priorities for TV calls (lower runs first)
+PRIORITY_INTERACTIVE = 0  # commands a user is waiting on: keys, volume sets
+PRIORITY_NORMAL      = 1  # client reads
+PRIORITY_BACKGROUND  = 2  # server-side state polls
+
+
+class _TvBusy(Exception):
+    """A TV call was refused by its scheduler or circuit breaker instead of being sent."""
+
+    def __init__(self, status: int, reason: str, retry_after: int = 1) -> None:
+        super().__init__(reason)
+        self.status      = status
+        self.reason      = reason
+        self.retry_after = retry_after
+
+
+class _TvScheduler:
+    """Admission control for one TV: at most TV_MAX_IN_FLIGHT calls at once.
+
+    Callers beyond the limit wait in a priority queue (interactive commands
+    before client reads before background polls, FIFO within a priority).
+    A call still queued at its deadline is dropped with 503 rather than sent
+    late. With TV_QUEUE_MAX callers waiting, a new call evicts the newest
+    lower-priority waiter, or is refused with 429 if there is none.
+    """
+
+    def __init__(self, max_in_flight: int = TV_MAX_IN_FLIGHT,
+                 max_queue: int = TV_QUEUE_MAX) -> None:
+        self._cond          = threading.Condition()
+        self._max_in_flight = max_in_flight
+        self._max_queue     = max_queue
+        self._in_flight     = 0
+        self._queue: list[list] = []  # heap of [priority, seq, deadline, state]
+        self._seq           = 0
+
+    def run(self, send: Callable[[], bytes], priority: int, deadline: float) -> bytes:
+        """Call send() once a slot is free; raise _TvBusy if refused or stale."""
+        started = time.monotonic()
+        with self._cond:
+            if self._in_flight < self._max_in_flight and not self._queue:
+                self._in_flight += 1
+            else:
+                self._enqueue_and_wait(priority, deadline)
+        _metrics.observe('philips_remote_scheduler_wait_seconds', time.monotonic() - started)
+        _trace('scheduled')
+        try:
+            return send()
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._grant()
+
+    def _enqueue_and_wait(self, priority: int, deadline: float) -> None:
+        """Queue the caller and block until granted a slot. Caller holds _cond."""
+        if len(self._queue) >= self._max_queue:
+            victim = max(self._queue, key=lambda e: (e[0], e[1]))
+            if victim[0] <= priority:
+                self._reject('queue_full')
+                raise _TvBusy(429, 'Too many queued requests for this TV')
+            victim[3] = 'evicted'
+            self._queue.remove(victim)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+        self._seq += 1
+        entry = [priority, self._seq, deadline, 'waiting']
+        heapq.heappush(self._queue, entry)
+        while entry[3] == 'waiting':
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                entry[3] = 'expired'
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                break
+            self._cond.wait(remaining)
+        if entry[3] == 'evicted':
+            self._reject('evicted')
+            raise _TvBusy(429, 'Too many queued requests for this TV')
+        if entry[3] == 'expired':
+            self._reject('deadline')
+            raise _TvBusy(503, 'TV busy; request expired in queue')
+
+    def _grant(self) -> None:
+        """Hand free slots to the best live waiters. Caller holds _cond."""
+        now = time.monotonic()
+        while self._queue and self._in_flight < self._max_in_flight:
+            entry = heapq.heappop(self._queue)
+            entry[3] = 'granted' if entry[2] > now else 'expired'
+            if entry[3] == 'granted':
+                self._in_flight += 1
+        self._cond.notify_all()
+
+    @staticmethod
+    def _reject(reason: str) -> None:
+        _metrics.inc('philips_remote_scheduler_rejected_total', {'reason': reason})
+
+
+# One scheduler per TV endpoint: { (ip, port): _TvScheduler }
+_tv_schedulers: dict[tuple[str, int], _TvScheduler] = {}
+_tv_schedulers_lock = threading.Lock()
+
+
+def _get_tv_scheduler(cfg: dict) -> _TvScheduler:
+    with _tv_schedulers_lock:
+        return _tv_schedulers.setdefault((cfg['ip'], cfg['port']), _TvScheduler())
+
+
+class _TvCircuitOpen(_TvBusy):
+    """The TV's circuit is open: it recently stopped answering."""
+
+
+class _CircuitBreaker:
+    """Health state machine for one TV: closed, open, half-open.
+
+    closed     calls go through; CIRCUIT_FAILURE_THRESHOLD consecutive
+               calls that got no answer (timeout, refused, TLS) open it.
+    open       calls fail at once with 503 and Retry-After. A background
+               thread probes /{v}/system, first after CIRCUIT_RETRY_MIN,
+               then with a doubling delay up to CIRCUIT_RETRY_MAX.
+    half-open  that probe is in flight; calls still fail fast. An answer
+               closes the circuit, silence reopens it.
+
+    Any HTTP response counts as success: the TV is up, just unhappy with
+    the request. The probe thread stops after STATE_IDLE_TIMEOUT without
+    calls and is restarted by the next one.
+    """
+
+    def __init__(self, cfg: dict) -> None:
+        self.cfg = {k: cfg[k] for k in ('ip', 'port', 'apiVersion')}
+        self._lock        = threading.Lock()
+        self._state       = 'closed'
+        self._failures    = 0
+        self._retry_delay = CIRCUIT_RETRY_MIN
+        self._retry_at    = 0.0
+        self._last_demand = time.monotonic()
+        self._prober: threading.Thread | None = None
+
+    def check(self) -> None:
+        """Raise _TvCircuitOpen unless calls to the TV may go through."""
+        with self._lock:
+            self._last_demand = time.monotonic()
+            if self._state == 'closed':
+                return
+            if self._prober is None:
+                self._retry_at = min(self._retry_at, time.monotonic())
+                self._start_prober()
+            retry_after = max(1, round(self._retry_at - time.monotonic()))
+        raise _TvCircuitOpen(503, 'TV unreachable (circuit open)', retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def reset(self) -> None:
+        """Close the circuit: the TV is known to answer again (e.g. it just woke up)."""
+        with self._lock:
+            self._failures = 0
+            self._set_state('closed')
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == 'closed' and self._failures >= CIRCUIT_FAILURE_THRESHOLD:
+                self._retry_delay = CIRCUIT_RETRY_MIN
+                self._set_state('open')
+                self._start_prober()
+
+    def status(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self._retry_at - time.monotonic()) if self._state == 'open' else 0.0
+            return {'state': self._state, 'failures': self._failures,
+                    'retryIn': round(retry_in, 1)}
+
+    def _set_state(self, state: str) -> None:
+        """Caller holds _lock."""
+        if state == 'open':
+            self._retry_at = time.monotonic() + self._retry_delay
+        if state != self._state:
+            self._state = state
+            _metrics.inc('philips_remote_circuit_transitions_total', {'state': state})
+            _log.write('circuit', f'Circuit {state}', ip=self.cfg['ip'], port=self.cfg['port'])
+
+    def _start_prober(self) -> None:
+        """Caller holds _lock."""
+        self._prober = threading.Thread(target=self._probe_loop, daemon=True)
+        self._prober.start()
+
+    def _probe(self) -> bool:
+        """GET /{v}/system on a fresh connection; True for any HTTP status."""
+        cfg = self.cfg
+        if _tv_scheme(cfg['apiVersion']) == 'https':
+            conn = _TvHTTPSConnection(cfg['ip'], cfg['port'], TV_REQUEST_TIMEOUT, None)
+        else:
+            conn = http.client.HTTPConnection(cfg['ip'], cfg['port'], timeout=TV_REQUEST_TIMEOUT)
+        try:
+            conn.request('GET', f"/{cfg['apiVersion']}/system")
+            conn.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            conn.close()
+        return True
+
+    def _probe_loop(self) -> None:
+        while True:
+            with self._lock:
+                wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            with self._lock:
+                if self._state == 'closed' or time.monotonic() - self._last_demand > STATE_IDLE_TIMEOUT:
+                    self._prober = None
+                    return
+                self._set_state('half-open')
+            alive = self._probe()
+            with self._lock:
+                if alive:
+                    self._failures = 0
+                    self._set_state('closed')
+                    self._prober = None
+                    return
+                self._retry_delay = min(self._retry_delay * 2, CIRCUIT_RETRY_MAX)
+                self._set_state('open')
+
+
+# One circuit breaker per TV endpoint: { (ip, port): _CircuitBreaker }
+_circuit_breakers: dict[tuple[str, int], _CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def _get_circuit_breaker(cfg: dict, create: bool = True) -> _CircuitBreaker | None:
+    key = (cfg['ip'], cfg['port'])
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(key)
+        if breaker is None and create:
+            breaker = _circuit_breakers[key] = _CircuitBreaker(cfg)
+        return breaker
+
+
+def _circuit_status(cfg: dict) -> dict:
+    """Circuit state of a TV for /config and /tvs ('closed' if never called)."""
+    breaker = _get_circuit_breaker(cfg, create=False) if cfg.get('ip') else None
+    return breaker.status() if breaker else {'state': 'closed', 'failures': 0, 'retryIn': 0.0}
+
+
+def _tv_call(cfg: dict, creds: dict[str, str] | None, method: str, tv_path: str,
+             body: bytes | None = None, priority: int | None = None,
+             stream: bool = False) -> bytes | _UpstreamStream:
+    """Send one JointSpace request to the TV described by cfg (ip/port/apiVersion).
+
+    For API v6+, adds HTTP Digest Auth when credentials are stored.
+    The call goes through the TV's circuit breaker and scheduler: POSTs
+    default to interactive priority with a KEY_DEADLINE deadline, GETs to
+    normal priority with TV_REQUEST_TIMEOUT. Raises _TvCircuitOpen while
+    the TV is known to be down, _TvBusy if the scheduler refuses the call,
+    and urllib.error.HTTPError for status >= 400. A power key (Standby,
+    PowerOn) for a TV that is asleep wakes it instead and returns the
+    _PowerOn report. Calls made while a wake runs are held until it ends
+    and then sent one by one in the order they arrived; one still held
+    after WAKE_HOLD_TIMEOUT fails with 503 and Retry-After. With stream=True the
+    scheduler slot is freed once the headers are in, and the caller reads
+    the body from the returned _UpstreamStream.
+    """
+    power_on = _get_power_on(cfg, create=False)
+    if not (power_on and power_on.holding()):
+        return _dispatch_tv_call(cfg, creds, method, tv_path, body, priority, stream)
+    if not power_on.hold(WAKE_HOLD_TIMEOUT):
+        raise _TvBusy(503, 'TV is waking up', WAKE_PROBE_MAX)
+    try:
+        return _dispatch_tv_call(cfg, creds, method, tv_path, body, priority, stream)
+    finally:
+        power_on.release()
+
+
+def _dispatch_tv_call(cfg: dict, creds: dict[str, str] | None, method: str, tv_path: str,
+                      body: bytes | None, priority: int | None,
+                      stream: bool) -> bytes | _UpstreamStream:
+    """_tv_call once no wake is holding calls: power keys, breaker, scheduler."""
+    power_key = _power_key(tv_path, body) if method == 'POST' else None
+    if power_key and _power_key_wakes(cfg):
+        report = _get_power_on(cfg).wake(force_on=power_key == 'PowerOn')
+        if not report['ready']:
+            raise _TvBusy(504, report['error'], WAKE_RESEND_INTERVAL)
+        return json.dumps(report).encode()
+
+    if priority is None:
+        priority = PRIORITY_INTERACTIVE if method == 'POST' else PRIORITY_NORMAL
+    deadline = time.monotonic() + (KEY_DEADLINE if priority == PRIORITY_INTERACTIVE
+                                   else TV_REQUEST_TIMEOUT)
+    breaker = _get_circuit_breaker(cfg)
+    breaker.check()
+
+    def _send() -> bytes | _UpstreamStream:
+        breaker.check()  # the circuit may have opened while this call was queued
+        try:
+            data = _send_tv_call(cfg, creds, method, tv_path, body, stream)
+        except urllib.error.HTTPError:
+            breaker.record_success()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        finally:
+            if method == 'POST':
+                _response_cache.invalidate(cfg['ip'], cfg['port'], tv_path)
+        breaker.record_success()
+        return data
+
+    return _get_tv_scheduler(cfg).run(_send, priority, deadline)
+
+
+def _send_tv_call(cfg: dict, creds: dict[str, str] | None, method: str, tv_path: str,
+                  body: bytes | None, stream: bool = False) -> bytes | _UpstreamStream:
+    tv_url  = f"{_tv_scheme(cfg['apiVersion'])}://{cfg['ip']}:{cfg['port']}{tv_path}"
+    family  = _api_family(tv_path)
+    started = time.monotonic()
+    try:
+        if cfg['apiVersion'] >= 6 and creds:
+            return _proxy_with_digest(tv_url, method, body, creds, stream)
+        return _tv_urlopen(tv_url, method, body, stream=stream)
+    except Exception as e:
+        _metrics.inc('philips_remote_upstream_errors_total', {'class': _classify_upstream_error(e)})
+        raise
+    finally:
+        _metrics.observe('philips_remote_upstream_duration_seconds', time.monotonic() - started,
+                         {'family': family})
+
+
+def _send_magic_packet(mac: str, ip: str) -> None:
+    """Send one Wake-on-LAN packet to WOL_BROADCAST and to the TV's last IP.
+
+    The unicast copy gets through when the host still has the TV in its
+    neighbour table or the network does not pass broadcasts.
+    """
+    packet = b'\xff' * 6 + bytes.fromhex(mac.replace(':', '')) * 16
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        for target in (WOL_BROADCAST, ip):
+            try:
+                sock.sendto(packet, (target, WOL_PORT))
+            except OSError:
+                pass  # e.g. no route for broadcasts; the other copy may still arrive
+
+
+def _power_key(tv_path: str, body: bytes | None) -> str | None:
+    """'Standby' or 'PowerOn' if this call is that key press, else None."""
+    if not re.fullmatch(r'/\d+/input/key', tv_path) or not body:
+        return None
+    try:
+        key = json.loads(body).get('key')
+    except (ValueError, AttributeError):
+        return None
+    return key if key in ('Standby', 'PowerOn') else None
+
+
+def _power_key_wakes(cfg: dict) -> bool:
+    """Whether a power key should wake the TV rather than be sent to it.
+
+    True when the TV's MAC is known and the server already considers the TV
+    down: its circuit is open, or the state poller's last poll (no older
+    than two poll intervals) found it unreachable. Without such evidence
+    the key goes to the TV as usual, so a TV that is merely slow to answer
+    is never treated as asleep.
+    """
+    with _config_lock:
+        if cfg['ip'] not in _tv_macs:
+            return False
+    breaker = _get_circuit_breaker(cfg, create=False)
+    if breaker and breaker.status()['state'] != 'closed':
+        return True
+    poller = _get_state_poller(cfg, create=False)
+    state = poller.snapshot() if poller else None
+    return bool(state and not state['reachable'] and state['age'] <= STATE_POLL_INTERVAL * 2)
+
+
+class _PowerOn:
+    """Wake-on-LAN power-on of one TV, shared by everyone who asks meanwhile.
+
+    Sends a magic packet to the TV's MAC every WAKE_RESEND_INTERVAL and
+    probes the TV (/system, or a TCP connect to an LG/Samsung control port)
+    after WAKE_PROBE_MIN, doubling up to WAKE_PROBE_MAX, until it answers or
+    WAKE_TIMEOUT passes. A Philips TV whose API answers while it reports
+    Standby is then switched on through powerstate, if the TV was asleep
+    when the attempt started or the caller asked for power on explicitly.
+    """
+
+    def __init__(self, cfg: dict) -> None:
+        self.cfg = {k: cfg[k] for k in ('ip', 'port', 'apiVersion')}
+        self.cfg['brand'] = cfg.get('brand', 'philips')
+        self._lock = threading.Lock()
+        self._done: threading.Event | None = None  # set while an attempt runs
+        self._report: dict | None = None
+        self._held: list[threading.Event] = []  # calls held by a wake, in arrival order
+        self.last: dict | None = None  # report of the last finished attempt
+
+    def active(self) -> bool:
+        with self._lock:
+            return self._done is not None
+
+    def holding(self) -> bool:
+        """True while an attempt runs or the calls it held are still going out."""
+        with self._lock:
+            return self._done is not None or bool(self._held)
+
+    def hold(self, timeout: float) -> bool:
+        """Wait until the attempt has ended and every call held before this one is sent.
+
+        True when it is the caller's turn; the caller sends its call and then
+        calls release(). False if that took longer than timeout. Raises
+        _TvBusy once TV_QUEUE_MAX calls are already held.
+        """
+        turn = threading.Event()
+        with self._lock:
+            if len(self._held) >= TV_QUEUE_MAX:
+                raise _TvBusy(429, 'Too many queued requests for this TV')
+            self._held.append(turn)
+            if self._done is None and self._held[0] is turn:
+                turn.set()
+        if turn.wait(timeout):
+            return True
+        with self._lock:
+            if turn.is_set():
+                return True  # its turn came just as the wait timed out
+            self._held.remove(turn)
+            return False
+
+    def release(self) -> None:
+        """End the current held call's turn and start the next one's."""
+        with self._lock:
+            self._held.pop(0)
+            if self._held and self._done is None:
+                self._held[0].set()
+
+    def wake(self, force_on: bool = True) -> dict:
+        """Power the TV on; join the attempt already under way if there is one.
+
+        With force_on=False (a Standby key), a TV that answers the first
+        probe is left in whatever power state it reports. Returns {'ready',
+        'ms', 'packets', 'probes', 'mac', 'powerstate'?, 'error'?}, where ms
+        is the time until the TV answered (or gave up).
+        """
+        with self._lock:
+            done = self._done
+            if done is None:
+                done = self._done = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            done.wait()
+            return self._report
+        report = None
+        try:
+            report = self._run(force_on)
+        except Exception as e:
+            _log.write('power', 'Wake attempt failed', ip=self.cfg['ip'],
+                       error=f'{type(e).__name__}: {e}')
+        finally:
+            if report is None:
+                report = {'ready': False, 'ms': 0.0, 'packets': 0, 'probes': 0,
+                          'error': 'Wake attempt failed'}
+            with self._lock:
+                self._report = self.last = report
+                self._done = None
+                if self._held:
+                    self._held[0].set()
+            done.set()
+        return report
+
+    def _probe(self, timeout: float) -> bool:
+        cfg = self.cfg
+        if cfg['brand'] != 'philips':
+            try:
+                socket.create_connection((cfg['ip'], cfg['port']), timeout).close()
+                return True
+            except OSError:
+                return False
+        return _probe_system(cfg['ip'], cfg['port'], cfg['apiVersion'],
+                             _tv_scheme(cfg['apiVersion']), timeout) is not None
+
+    def _run(self, force_on: bool) -> dict:
+        cfg = self.cfg
+        with _config_lock:
+            mac   = _tv_macs.get(cfg['ip'])
+            creds = _tv_credentials.get(cfg['ip'])
+        report: dict = {'ready': False, 'ms': 0.0, 'packets': 0, 'probes': 0, 'mac': mac}
+        if not mac:
+            report['error'] = 'MAC address of the TV is not known'
+            _metrics.inc('philips_remote_wakes_total', {'result': 'no_mac'})
+            return report
+
+        started     = time.monotonic()
+        deadline    = started + WAKE_TIMEOUT
+        next_packet = started
+        interval    = WAKE_PROBE_MIN
+        while True:
+            now = time.monotonic()
+            if now >= next_packet:
+                _send_magic_packet(mac, cfg['ip'])
+                report['packets'] += 1
+                next_packet = now + WAKE_RESEND_INTERVAL
+            report['probes'] += 1
+            if self._probe(max(0.05, min(interval, deadline - now))):
+                report['ready'] = True
+                break
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(max(0.0, min(now + interval, deadline) - time.monotonic()))
+            interval = min(interval * 2, WAKE_PROBE_MAX)
+        report['ms'] = round((time.monotonic() - started) * 1000, 1)
+
+        if not report['ready']:
+            report['error'] = f'TV did not wake within {WAKE_TIMEOUT} s'
+            _log.write('power', 'TV did not wake', ip=cfg['ip'], ms=report['ms'],
+                       packets=report['packets'], probes=report['probes'])
+            _metrics.inc('philips_remote_wakes_total', {'result': 'timeout'})
+            return report
+
+        breaker = _get_circuit_breaker(cfg, create=False)
+        if breaker:
+            breaker.reset()
+        was_asleep = report['probes'] > 1
+        if cfg['brand'] == 'philips' and cfg['apiVersion'] >= 5 and (force_on or was_asleep):
+            report['powerstate'] = self._switch_on(creds)
+        _log.write('power', 'TV ready', ip=cfg['ip'], ms=report['ms'],
+                   packets=report['packets'], probes=report['probes'])
+        _metrics.inc('philips_remote_wakes_total', {'result': 'ready'})
+        _metrics.observe('philips_remote_wake_seconds', report['ms'] / 1000)
+        poller = _get_state_poller(cfg, create=False)
+        if poller:
+            poller.poke()
+        return report
+
+    def _switch_on(self, creds: dict[str, str] | None) -> str | None:
+        """Set powerstate On if the TV answers but is in standby; return the final powerstate."""
+        cfg  = self.cfg
+        path = f"/{cfg['apiVersion']}/powerstate"
+        try:
+            state = json.loads(_send_tv_call(cfg, creds, 'GET', path, None)).get('powerstate')
+            if state and state != 'On':
+                _send_tv_call(cfg, creds, 'POST', path, b'{"powerstate":"On"}')
+                state = 'On'
+            return state
+        except Exception as e:
+            _log.write('power', 'Cannot switch powerstate on', ip=cfg['ip'],
+                       error=f'{type(e).__name__}: {e}')
+            return None
+
+
+# One power-on pipeline per TV endpoint: { (ip, port): _PowerOn }
+_power_ons: dict[tuple[str, int], _PowerOn] = {}
+_power_ons_lock = threading.Lock()
+
+
+def _get_power_on(cfg: dict, create: bool = True) -> _PowerOn | None:
+    key = (cfg['ip'], cfg['port'])
+    with _power_ons_lock:
+        power_on = _power_ons.get(key)
+        if power_on is None and create:
+            power_on = _power_ons[key] = _PowerOn(cfg)
+        return power_on
+
+
+class _StatePoller:
+    """Single upstream poller for one TV's volume, mute and power state.
+
+    However many clients read /api/{v}/audio/volume or follow /state/stream,
+    the TV sees one poll every STATE_POLL_INTERVAL. Volume reads that find
+    no fresh result wait for the next poll instead of calling the TV
+    themselves, and while any of them waits the poll runs at client rather
+    than background priority. The poller only runs while someone is
+    reading and exits after STATE_IDLE_TIMEOUT without demand. Subscribers
+    receive the full state whenever it changes.
+    """
+
+    def __init__(self, cfg: dict) -> None:
+        self.cfg = {k: cfg[k] for k in ('ip', 'port', 'apiVersion')}
+        self._cond = threading.Condition()
+        self._state: dict | None = None
+        self._volume_raw: bytes | None = None
+        self._volume_at = 0.0       # monotonic time _volume_raw was polled
+        self._volume_polls = 0      # volume polls finished, successful or not
+        self._polling = False       # a poll is in flight
+        self._readers = 0           # read_volume() callers waiting for a poll
+        self._updated = 0.0
+        self._poke = False
+        self._last_demand = time.monotonic()
+        self._subscribers: list[queue.Queue] = []
+        self._thread: threading.Thread | None = None
+
+    def touch(self) -> None:
+        """Record demand and make sure the polling thread is running."""
+        with self._cond:
+            self._last_demand = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def poke(self) -> None:
+        """Re-poll now, e.g. right after a command changed the TV state."""
+        with self._cond:
+            self._poke = True
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict | None:
+        with self._cond:
+            return self._snapshot_locked()
+
+    def _snapshot_locked(self) -> dict | None:
+        if self._state is None:
+            return None
+        return dict(self._state, age=round(time.monotonic() - self._updated, 1))
+
+    def wait_first(self, timeout: float) -> dict | None:
+        """Return the state, waiting up to timeout for the first poll."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._state is not None, timeout)
+            return self._snapshot_locked()
+
+    def read_volume(self, timeout: float) -> tuple[bytes, float] | None:
+        """Return (raw /audio/volume body, age), waiting up to timeout for a poll.
+
+        Without a fresh result, the caller joins the next poll (starting it
+        if the poller is idle). None if that poll got no volume either.
+        """
+        with self._cond:
+            self.touch()
+            cached = self._cached_volume_locked()
+            if cached is not None:
+                return cached
+            polls = self._volume_polls
+            self._readers += 1
+            try:
+                if not self._polling:
+                    self._poke = True
+                    self._cond.notify_all()
+                self._cond.wait_for(lambda: self._volume_polls > polls, timeout)
+            finally:
+                self._readers -= 1
+            return self._cached_volume_locked()
+
+    def _cached_volume_locked(self) -> tuple[bytes, float] | None:
+        age = time.monotonic() - self._volume_at
+        if self._volume_raw is None or age > STATE_POLL_INTERVAL * 2:
+            return None
+        return self._volume_raw, age
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue()
+        with self._cond:
+            self._subscribers.append(q)
+            snap = self._snapshot_locked()
+        if snap is not None:
+            q.put(snap)
+        self.touch()
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._cond:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def stopped(self) -> bool:
+        """True when no thread is polling and nobody is subscribed."""
+        with self._cond:
+            return self._thread is None and not self._subscribers
+
+    def _run(self) -> None:
+        while True:
+            self._poll_once()
+            with self._cond:
+                self._cond.wait_for(lambda: self._poke, STATE_POLL_INTERVAL)
+                self._poke = False
+                idle = time.monotonic() - self._last_demand
+                if idle > STATE_IDLE_TIMEOUT and not self._subscribers:
+                    self._thread = None
+                    break
+        _prune_state_pollers()
+
+    def _poll_once(self) -> None:
+        cfg = self.cfg
+        with _config_lock:
+            creds = _tv_credentials.get(cfg['ip'])
+        with self._cond:
+            self._polling = True
+            self._poke    = False  # this poll answers every poke made before it
+            priority = PRIORITY_NORMAL if self._readers else PRIORITY_BACKGROUND
+        state: dict = {'reachable': False, 'volume': None, 'powerstate': None}
+        volume_raw = None
+        busy = False
+        try:
+            volume_raw = _tv_call(cfg, creds, 'GET', f"/{cfg['apiVersion']}/audio/volume",
+                                  priority=priority)
+            state['volume'] = json.loads(volume_raw)
+            state['reachable'] = True
+        except _TvCircuitOpen:
+            pass    # known to be down: report unreachable without waiting
+        except _TvBusy:
+            busy = True  # the TV is busy with client calls; keep the last state
+        except urllib.error.HTTPError:
+            state['reachable'] = True  # TV answered, just not with a volume
+        except Exception:
+            pass
+        with self._cond:
+            # Waiting volume readers get their answer before the power state is polled
+            if not busy:
+                self._volume_raw = volume_raw
+                self._volume_at  = time.monotonic()
+            self._volume_polls += 1
+            self._polling = not busy
+            self._cond.notify_all()
+        if busy:
+            return
+        if state['reachable'] and cfg['apiVersion'] >= 5:
+            try:
+                power = json.loads(_tv_call(cfg, creds, 'GET', f"/{cfg['apiVersion']}/powerstate",
+                                            priority=priority))
+                state['powerstate'] = power.get('powerstate')
+            except Exception:
+                pass
+        elif state['reachable']:
+            state['powerstate'] = 'On'  # v1 has no powerstate; answering means on
+        if state['reachable']:
+            _learn_mac(cfg, creds, ask_tv=True)
+
+        with self._cond:
+            changed = state != self._state
+            self._state    = state
+            self._updated  = time.monotonic()
+            self._polling  = False
+            self._cond.notify_all()
+            if changed:
+                snap = self._snapshot_locked()
+                for q in self._subscribers:
+                    q.put(snap)
+
+
+# One poller per TV endpoint: { (ip, port, apiVersion): _StatePoller }
+_state_pollers: dict[tuple[str, int, int], _StatePoller] = {}
+_state_pollers_lock = threading.Lock()
+
+
+def _get_state_poller(cfg: dict, create: bool = True) -> _StatePoller | None:
+    key = (cfg['ip'], cfg['port'], cfg['apiVersion'])
+    with _state_pollers_lock:
+        poller = _state_pollers.get(key)
+        if poller is None and create:
+            poller = _state_pollers[key] = _StatePoller(cfg)
+        return poller
+
+
+def _prune_state_pollers() -> None:
+    """Drop stopped pollers whose TV is neither tv_config nor in _tv_registry."""
+    with _config_lock:
+        configured = {(tv['ip'], tv['port'], tv['apiVersion'])
+                      for tv in (tv_config, *_tv_registry.values()) if tv['ip']}
+    with _state_pollers_lock:
+        for key, poller in list(_state_pollers.items()):
+            if key not in configured and poller.stopped():
+                del _state_pollers[key]
+
+
+def _parse_tv_fields(body: dict, current: dict) -> tuple[dict, str | None]:
+    """Validate ip/port/apiVersion/brand fields of a /config or /tvs body.
+
+    Switching brand without a port moves to that brand's default port. A
+    mac field is only checked here; callers store it per IP with
+    _store_tv_mac.
+
+    Returns (current updated with the valid fields, None) or
+    (current, error message) if any field is invalid.
+    """
+    updated = dict(current)
+    if 'ip' in body:
+        ip = str(body['ip'])
+        if not is_valid_tv_ip(ip):
+            return current, 'Invalid TV IP address'
+        updated['ip'] = ip
+
+    if 'port' in body:
+        try:
+            port = int(body['port'])
+        except (ValueError, TypeError):
+            return current, 'Invalid port'
+        if not (1 <= port <= 65535):
+            return current, 'Port must be 1–65535'
+        updated['port'] = port
+    if 'apiVersion' in body:
+        try:
+            api_version = int(body['apiVersion'])
+        except (ValueError, TypeError):
+            return current, 'Invalid apiVersion'
+        if api_version not in (1, 5, 6):
+            return current, 'apiVersion must be 1, 5, or 6'
+        updated['apiVersion'] = api_version
+    if 'brand' in body:
+        brand = str(body['brand']).lower()
+        if brand not in TV_BRAND_PORTS:
+            return current, 'brand must be philips, lg or samsung'
+        if brand != current.get('brand', 'philips') and 'port' not in body:
+            updated['port'] = TV_BRAND_PORTS[brand]
+        updated['brand'] = brand
+    if 'mac' in body and not _normalize_mac(body['mac']):
+        return current, 'Invalid MAC address'
+    return updated, None
+
+
+def _store_tv_credentials(ip: str, body: dict) -> None:
+    """Store digest credentials from tvUser/tvPass fields, if both are present.
+
+    Caller holds _config_lock.
+    """
+    tv_user = body.get('tvUser', '')
+    tv_pass = body.get('tvPass', '')
+    if tv_user and tv_pass and ip:
+        _tv_credentials[ip] = {'user': str(tv_user), 'pass': str(tv_pass)}
+        _log.write('config', 'Stored digest credentials', ip=ip)
+
+
+def _timed_tv_call(cfg: dict, creds: dict[str, str] | None, method: str,
+                   tv_path: str, body: bytes | None = None) -> dict:
+    """Run one TV call and describe the outcome for batch/broadcast replies.
+
+    Returns {'status', 'ms', 'body'?} — status 502 with 'error' if the TV
+    did not answer.
+    """
+    started = time.monotonic()
+    try:
+        if cfg.get('brand', 'philips') != 'philips':
+            data = json.dumps(_tv_session_command(cfg, method, tv_path, body)).encode()
+        else:
+            data = _tv_call(cfg, creds, method, tv_path, body)
+        result = {'status': 200}
+    except urllib.error.HTTPError as e:
+        data   = e.read()
+        result = {'status': e.code}
+    except _TvCommandError as e:
+        data   = b''
+        result = {'status': e.status, 'error': e.reason}
+    except _TvBusy as e:
+        data   = b''
+        result = {'status': e.status, 'error': e.reason}
+    except Exception as e:
+        _log.write('proxy', 'TV request failed', ip=cfg['ip'], path=tv_path,
+                   error=f'{type(e).__name__}: {e}')
+        data   = b''
+        result = {'status': 502, 'error': 'TV unreachable'}
+    result['ms'] = round((time.monotonic() - started) * 1000, 1)
+    if data:
+        try:
+            result['body'] = json.loads(data)
+        except ValueError:
+            pass
+    return result
+
+
+# Shared pool for /broadcast fan-out
+_BROADCAST_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    BROADCAST_MAX_PARALLEL, thread_name_prefix='broadcast')
+
+
+class _LatestWins:
+    """Serialize writes to one TV resource, dropping superseded ones.
+
+    Used for audio/volume sets: while one write is in flight, later writes
+    queue behind it, and when it completes only the newest queued write is
+    sent — intermediate slider positions are dropped (last write wins) and
+    writes can no longer reach the TV out of order.
+    """
+
+    def __init__(self) -> None:
+        self._lock       = threading.Lock()
+        self._send_lock  = threading.Lock()
+        self._generation = 0
+
+    def submit(self, send: Callable[[], bytes]) -> bytes | None:
+        """Run send() unless a newer write arrives first; None if superseded."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        with self._send_lock:
+            with self._lock:
+                if generation != self._generation:
+                    return None
+            return send()
+
+
+# Volume write coalescers per TV endpoint: { (ip, port): _LatestWins }
+_volume_writers: dict[tuple[str, int], _LatestWins] = {}
+_volume_writers_lock = threading.Lock()
+
+
+def _get_volume_writer(cfg: dict) -> _LatestWins:
+    with _volume_writers_lock:
+        return _volume_writers.setdefault((cfg['ip'], cfg['port']), _LatestWins())
+
+
+def _response_cache_ttl(tv_path: str) -> int:
+    """TTL for a GET of tv_path from the most specific RESPONSE_CACHE_TTLS entry (0 = not cached)."""
+    parts = [p for p in urllib.parse.urlparse(tv_path).path.split('/') if p]
+    if parts and parts[0].isdigit():
+        parts = parts[1:]
+    for n in range(len(parts), 0, -1):
+        ttl = RESPONSE_CACHE_TTLS.get('/'.join(parts[:n]))
+        if ttl is not None:
+            return ttl
+    return 0
+
+
+class _Flight:
+    """Outcome of one in-progress upstream fill, shared with the callers waiting on it."""
+
+    def __init__(self) -> None:
+        self.done  = threading.Event()
+        self.stale = False  # a related POST ran meanwhile; do not cache the result
+        self.data: bytes | None = None
+        self.error: BaseException | None = None
+        self.http_error: tuple | None = None  # (url, code, msg, hdrs, body)
+
+    def result(self) -> bytes:
+        if self.http_error:
+            url, code, msg, hdrs, body = self.http_error
+            raise urllib.error.HTTPError(url, code, msg, hdrs, io.BytesIO(body))
+        if self.error:
+            raise self.error
+        return self.data
+
+
+class _TooLargeToCache(Exception):
+    """A cacheable response outgrew the cache's per-entry limit while being filled.
+
+    The caller that ran the fill gets the bytes read so far and the open
+    upstream, and streams the rest to its client; callers that joined the
+    fill get one without an upstream and make their own request.
+    """
+
+    def __init__(self, prefix: bytes = b'', upstream: _UpstreamStream | None = None) -> None:
+        super().__init__('response too large to cache')
+        self.prefix   = prefix
+        self.upstream = upstream
+
+
+def _read_for_cache(upstream: _UpstreamStream, limit: int) -> bytes:
+    """Read a whole response, or raise _TooLargeToCache once it passes limit bytes."""
+    if upstream.length is not None and upstream.length > limit:
+        raise _TooLargeToCache(b'', upstream)
+    data = bytearray()
+    while chunk := upstream.read(STREAM_CHUNK_SIZE):
+        data += chunk
+        if len(data) > limit:
+            raise _TooLargeToCache(bytes(data), upstream)
+    return bytes(data)
+
+
+class _ResponseCache:
+    """TTL cache for read-only TV resources, with single-flight fills.
+
+    Keyed by (ip, port, path). Concurrent misses for one key share a single
+    upstream call; its outcome, including an error, is handed to every
+    waiter. Only 200 responses are stored. A POST to a TV drops its cached
+    entries under the same top-level path (POST sources/current drops
+    sources), including fills still in flight. Bodies are capped at
+    RESPONSE_CACHE_MAX_BYTES in total, evicting least recently used first.
+    A single body larger than max_entry (an eighth of that) is not stored;
+    load() may raise _TooLargeToCache for it, which passes through fetch().
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES) -> None:
+        self._lock      = threading.Lock()
+        self._entries: dict[tuple[str, int, str], tuple[bytes, float]] = {}  # LRU first
+        self._inflight: dict[tuple[str, int, str], _Flight] = {}
+        self._bytes     = 0
+        self._max_bytes = max_bytes
+        self.max_entry  = max_bytes // 8  # one huge channel list should not flush everything else
+
+    def fetch(self, key: tuple[str, int, str], ttl: float,
+              load: Callable[[], bytes]) -> tuple[bytes, str]:
+        """Return (body, 'HIT' | 'MISS' | 'COLLAPSED'), calling load() on a miss."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry and entry[1] > time.monotonic():
+                self._entries[key] = entry  # re-insert as most recently used
+                outcome = 'hit'
+            else:
+                if entry:
+                    self._bytes -= len(entry[0])
+                flight = self._inflight.get(key)
+                outcome = 'miss' if flight is None else 'collapsed'
+                if flight is None:
+                    flight = self._inflight[key] = _Flight()
+        _metrics.inc('philips_remote_response_cache_total', {'result': outcome})
+        if outcome == 'hit':
+            return entry[0], 'HIT'
+        if outcome == 'collapsed':
+            flight.done.wait()
+            return flight.result(), 'COLLAPSED'
+
+        try:
+            flight.data = load()
+        except urllib.error.HTTPError as e:
+            flight.http_error = (e.filename, e.code, e.msg, e.hdrs, e.read())
+        except _TooLargeToCache:
+            flight.error = _TooLargeToCache()
+            raise
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if flight.data is not None and not flight.stale:
+                    self._store(key, flight.data, time.monotonic() + ttl)
+            flight.done.set()
+        return flight.result(), 'MISS'
+
+    def invalidate(self, ip: str, port: int, tv_path: str) -> None:
+        """Drop entries of one TV under the top-level path of tv_path."""
+        section = _api_family(tv_path).split('/')[0]
+        with self._lock:
+            for key in [k for k in list(self._entries) + list(self._inflight)
+                        if k[0] == ip and k[1] == port
+                        and _api_family(k[2]).split('/')[0] == section]:
+                if key in self._inflight:
+                    self._inflight[key].stale = True
+                entry = self._entries.pop(key, None)
+                if entry:
+                    self._bytes -= len(entry[0])
+
+    def size(self) -> int:
+        with self._lock:
+            return self._bytes
+
+    def _store(self, key: tuple[str, int, str], data: bytes, expires: float) -> None:
+        """Caller holds _lock."""
+        if len(data) > self.max_entry:
+            return
+        self._entries[key] = (data, expires)
+        self._bytes += len(data)
+        while self._bytes > self._max_bytes:
+            old_key = next(iter(self._entries))
+            self._bytes -= len(self._entries.pop(old_key)[0])
+
+
+_response_cache = _ResponseCache()
+_metrics.gauge_callback('philips_remote_response_cache_bytes',
+                        'Bytes of TV responses held in the response cache.', _response_cache.size)
+
+
+class _StaticAsset:
+    """One file from WWW_DIR held in memory with precompressed variants."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        st = os.stat(path)
+        self.stamp = (st.st_mtime_ns, st.st_size)
+        self.checked = time.monotonic()
+        self.last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+        self.mtime = int(st.st_mtime)
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        etag = hashlib.sha1(data).hexdigest()[:20]
+        # encoding -> (body, etag); '' is the identity encoding
+        self.variants: dict[str, tuple[bytes, str]] = {'': (data, f'"{etag}"')}
+        if self._compressible():
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < len(data):
+                self.variants['gzip'] = (gz, f'"{etag}-gz"')
+            if brotli is not None:
+                br = brotli.compress(data)
+                if len(br) < len(data):
+                    self.variants['br'] = (br, f'"{etag}-br"')
+
+    def _compressible(self) -> bool:
+        ctype = self.content_type
+        return (ctype.startswith('text/') or ctype.endswith(('json', 'javascript', 'xml'))
+                or ctype == 'image/svg+xml')
+
+    def select(self, accept_encoding: str) -> tuple[str, bytes, str]:
+        """Pick the best variant for an Accept-Encoding header: (encoding, body, etag)."""
+        accepted = set()
+        for part in accept_encoding.split(','):
+            token, _, params = part.strip().partition(';')
+            if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            accepted.add(token.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                body, etag = self.variants[encoding]
+                return encoding, body, etag
+        body, etag = self.variants['']
+        return '', body, etag
+
+    def matches(self, if_none_match: str) -> bool:
+        """True if an If-None-Match header matches any variant of this file."""
+        tags = {t.strip().removeprefix('W/') for t in if_none_match.split(',')}
+        return '*' in tags or any(etag in tags for _, etag in self.variants.values())
+
+
+class _StaticCache:
+    """In-memory copy of WWW_DIR, loaded at startup and reloaded on change.
+
+    Each file is revalidated against its mtime/size at most once every
+    STATIC_RECHECK_INTERVAL seconds, so edits (e.g. a redeployed
+    index.html) are picked up without a restart.
+    """
+
+    def __init__(self, root: str) -> None:
+        self._root  = os.path.realpath(root)
+        self._lock  = threading.Lock()
+        self._files: dict[str, _StaticAsset] = {}
+
+    def preload(self) -> None:
+        for dirpath, dirnames, filenames in os.walk(self._root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if not name.startswith('.'):
+                    self.get('/' + os.path.relpath(os.path.join(dirpath, name), self._root))
+
+    def get(self, url_path: str) -> _StaticAsset | None:
+        """Return the asset for a URL path, or None if it is not a regular file."""
+        rel = posixpath.normpath(urllib.parse.unquote(url_path)).lstrip('/')
+        if rel in ('', '.') or rel.startswith('..') or '\0' in rel:
+            return None
+        with self._lock:
+            asset = self._files.get(rel)
+        if asset is not None and time.monotonic() - asset.checked < STATIC_RECHECK_INTERVAL:
+            return asset
+
+        path = os.path.realpath(os.path.join(self._root, rel))
+        if not path.startswith(self._root + os.sep):
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is None or not os.path.isfile(path):
+            with self._lock:
+                self._files.pop(rel, None)
+            return None
+        if asset is not None and asset.stamp == (st.st_mtime_ns, st.st_size):
+            asset.checked = time.monotonic()
+            return asset
+        try:
+            asset = _StaticAsset(path)
+        except OSError:
+            return None
+        with self._lock:
+            self._files[rel] = asset
+        return asset
+
+
+_static_cache = _StaticCache(WWW_DIR)
+
+
+# Registration sent to LG webOS TVs (same manifest as the web UI's LG driver)
+LG_REGISTRATION = {
+    'forcePairing': False,
+    'pairingType': 'PROMPT',
+    'manifest': {
+        'manifestVersion': 1,
+        'appVersion': '1.1',
+        'signed': {
+            'created': '20140509',
+            'appId': 'com.lge.test',
+            'vendorId': 'com.lge',
+            'localizedAppNames': {'': 'LG Remote App', 'ko-KR': '리모컨 앱', 'zxx-XX': 'ЛГ Rэмotэ AПП'},
+            'localizedVendorNames': {'': 'LG Electronics'},
+            'permissions': [
+                'TEST_SECURE', 'CONTROL_INPUT_TEXT', 'CONTROL_MOUSE_AND_KEYBOARD',
+                'READ_INSTALLED_APPS', 'READ_LGE_SDX', 'READ_NOTIFICATIONS', 'SEARCH',
+                'WRITE_SETTINGS', 'WRITE_NOTIFICATION_ALERT', 'CONTROL_POWER',
+                'READ_CURRENT_CHANNEL', 'READ_RUNNING_APPS', 'READ_UPDATE_INFO',
+                'UPDATE_FROM_REMOTE_APP', 'READ_LGE_TV_INPUT_EVENTS', 'READ_TV_CURRENT_TIME',
+            ],
+            'serial': '2f930e2d2cfe083771f68e4fe7bb07',
+        },
+        'permissions': [
+            'LAUNCH', 'LAUNCH_WEBAPP', 'APP_TO_APP', 'CLOSE', 'TEST_OPEN', 'TEST_PROTECTED',
+            'CONTROL_AUDIO', 'CONTROL_DISPLAY', 'CONTROL_INPUT_JOYSTICK',
+            'CONTROL_INPUT_MEDIA_RECORDING', 'CONTROL_INPUT_MEDIA_PLAYBACK',
+            'CONTROL_INPUT_TV', 'CONTROL_POWER', 'READ_APP_STATUS', 'READ_CURRENT_CHANNEL',
+            'READ_INPUT_DEVICE_LIST', 'READ_NETWORK_STATE', 'READ_RUNNING_APPS',
+            'READ_TV_CHANNEL_LIST', 'WRITE_NOTIFICATION_TOAST', 'READ_POWER_STATE',
+            'READ_COUNTRY_INFO', 'READ_SETTINGS', 'CONTROL_TV_SCREEN', 'CONTROL_TV_STANBY',
+            'CONTROL_FAVORITE_GROUP', 'CONTROL_USER_INFO', 'CHECK_BLUETOOTH_DEVICE',
+            'CONTROL_BLUETOOTH', 'CONTROL_TIMER_INFO', 'STB_INTERNAL_CONNECTION',
+            'CONTROL_RECORDING', 'READ_RECORDING_STATE', 'WRITE_RECORDING_LIST',
+            'READ_RECORDING_LIST', 'READ_RECORDING_SCHEDULE', 'WRITE_RECORDING_SCHEDULE',
+            'READ_STORAGE_DEVICE_LIST', 'READ_TV_PROGRAM_INFO', 'CONTROL_BOX_CHANNEL',
+            'READ_TV_ACR_AUTH_TOKEN', 'READ_TV_CONTENT_STATE', 'READ_TV_CURRENT_TIME',
+            'ADD_LAUNCHER_CHANNEL', 'SET_CHANNEL_SKIP', 'RELEASE_CHANNEL_SKIP',
+            'CONTROL_CHANNEL_BLOCK', 'DELETE_SELECT_CHANNEL', 'CONTROL_CHANNEL_GROUP',
+            'SCAN_TV_CHANNELS', 'CONTROL_TV_POWER', 'CONTROL_WOL',
+        ],
+        'signatures': [{
+            'signatureVersion': 1,
+            'signature': (
+                'eyJhbGdvcml0aG0iOiJSU0EtU0hBMjU2Iiwia2V5SWQiOiJ0ZXN0LXNpZ25pbmct'
+                'Y2VydCIsInNpZ25hdHVyZVZlcnNpb24iOjF9.hrVRgjCwXVvE2OOSpDZ58hR+59a'
+                'FNwYDyjQgKk3auukd7pcegmE2CzPCa0bJ0ZsRAcKkCTJrWo5iDzNhMBWRyaMOv5z'
+                'WSrthlf7G128qvIlpMT0YNY+n/FaOHE73uLrS/g7swl3/qH/BGFG2Hu4RlL48eb3'
+                'lLKqTt2xKHdCs6Cd4RMfJPYnzgvI4BNrFUKsjkcu+WD4OO2A27Pq1n50cMchmcaX'
+                'adJhGrOqH5YmHdOCj5NSHzJYrsW0HPlpuAx/ECMeIZYDh6RMqaFM2DXzdKX9Nmmy'
+                'qzJ3o/0lkk/N97gfVRLW5hA29yeAwaCViZNCP8iC9aO0q9fQojoa7NQnAtw=='
+            ),
+        }],
+    },
+}
+
+
+class _WebSocketClosed(Exception):
+    """The /ws peer closed the connection or broke the protocol (close code)."""
+
+    def __init__(self, code: int = 1000) -> None:
+        super().__init__(code)
+        self.code = code
+
+
+# /ws and /tv/{id}/ws — the routes that authenticate after the upgrade
+_WS_ROUTE = re.compile(r'(/tv/[A-Za-z0-9_-]{1,64})?/ws')
+
+
+def _ws_accept_key(key: str) -> str:
+    """Sec-WebSocket-Accept value answering a client's Sec-WebSocket-Key."""
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def _ws_unmask(data: bytes, mask: bytes) -> bytes:
+    if not data:
+        return data
+    pad = (mask * (len(data) // 4 + 1))[:len(data)]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(pad, 'big')).to_bytes(len(data), 'big')
+
+
+class _WebSocket:
+    """One end of an RFC 6455 connection over a pair of binary file objects.
+
+    The server side (a handler's rfile/wfile) expects masked frames; with
+    client=True outgoing frames are masked instead, as for the sessions to
+    LG and Samsung TVs. Carries text messages of up to max_message bytes.
+    Pings are answered and fragmented messages reassembled inside
+    receive(); sends are serialized so several threads can share a socket.
+    """
+
+    def __init__(self, rfile, wfile, client: bool = False,
+                 max_message: int = WS_MAX_MESSAGE) -> None:
+        self._rfile = rfile
+        self._wfile = wfile
+        self._client = client
+        self._max_message = max_message
+        self._send_lock = threading.Lock()
+
+    def send_text(self, text: str) -> None:
+        self._send(0x1, text.encode())
+
+    def send_ping(self) -> None:
+        self._send(0x9, b'')
+
+    def close(self, code: int = 1000) -> None:
+        try:
+            self._send(0x8, struct.pack('!H', code))
+        except OSError:
+            pass
+
+    def _send(self, opcode: int, payload: bytes) -> None:
+        length = len(payload)
+        mask_bit = 0x80 if self._client else 0
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+        if self._client:
+            mask = os.urandom(4)
+            header += mask
+            payload = _ws_unmask(payload, mask)
+        with self._send_lock:
+            self._wfile.write(header + payload)
+            self._wfile.flush()
+
+    def _read(self, n: int) -> bytes:
+        data = b''
+        while len(data) < n:
+            chunk = self._rfile.read(n - len(data))
+            if not chunk:
+                raise _WebSocketClosed(1006)
+            data += chunk
+        return data
+
+    def receive(self, control: bool = False) -> str | None:
+        """Return the next text message; raise _WebSocketClosed at the end.
+
+        With control=True, also return None after each ping or pong, so a
+        caller waiting with select() can keep its own keep-alive timers.
+        """
+        message = b''
+        kind = None
+        while True:
+            b0, b1 = self._read(2)
+            opcode = b0 & 0x0F
+            masked = b1 & 0x80
+            if not masked and not self._client:
+                raise _WebSocketClosed(1002)  # client frames must be masked
+            length = b1 & 0x7F
+            if length == 126:
+                length, = struct.unpack('!H', self._read(2))
+            elif length == 127:
+                length, = struct.unpack('!Q', self._read(8))
+            if len(message) + length > self._max_message:
+                raise _WebSocketClosed(1009)
+            mask = self._read(4) if masked else b''
+            payload = self._read(length)
+            if masked:
+                payload = _ws_unmask(payload, mask)
+
+            if opcode == 0x8:
+                raise _WebSocketClosed(1000)
+            if opcode == 0x9:
+                self._send(0xA, payload)
+                if control:
+                    return None
+                continue
+            if opcode == 0xA:
+                if control:
+                    return None
+                continue
+            if opcode in (0x1, 0x2) and kind is None:
+                kind = opcode
+            elif opcode != 0x0 or kind is None:
+                raise _WebSocketClosed(1002)
+            message += payload
+            if not b0 & 0x80:
+                continue
+            if kind != 0x1:
+                raise _WebSocketClosed(1003)  # binary messages are not supported
+            try:
+                return message.decode()
+            except UnicodeDecodeError:
+                raise _WebSocketClosed(1007)
+
+
+class _TvCommandError(Exception):
+    """An LG/Samsung command failed; status is the HTTP status to answer with."""
+
+    def __init__(self, status: int, reason: str) -> None:
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+def _ws_connect(ip: str, port: int, path: str, timeout: float) -> tuple[_WebSocket, socket.socket]:
+    """Open a client WebSocket to ws(s)://ip:port/path (wss on TV_TLS_PORTS)."""
+    sock = socket.create_connection((ip, port), timeout)
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if port in TV_TLS_PORTS:
+            sock = _SHARED_SSL_CTX.wrap_socket(sock, server_hostname=ip)
+        key = base64.b64encode(os.urandom(16)).decode()
+        sock.sendall((f'GET {path} HTTP/1.1\r\n'
+                      f'Host: {ip}:{port}\r\n'
+                      'Upgrade: websocket\r\n'
+                      'Connection: Upgrade\r\n'
+                      f'Sec-WebSocket-Key: {key}\r\n'
+                      'Sec-WebSocket-Version: 13\r\n\r\n').encode())
+        # Byte by byte: the TV may send its first frame right behind the headers
+        head = b''
+        while not head.endswith(b'\r\n\r\n'):
+            byte = sock.recv(1)
+            if not byte or len(head) > 8192:
+                raise ConnectionError('WebSocket handshake failed')
+            head += byte
+        status, _, header_block = head.decode('latin-1').partition('\r\n')
+        headers = dict(line.split(':', 1) for line in header_block.split('\r\n') if ':' in line)
+        accept = {k.strip().lower(): v.strip() for k, v in headers.items()}.get('sec-websocket-accept')
+        if status.split()[1:2] != ['101'] or accept != _ws_accept_key(key):
+            raise ConnectionError(f'WebSocket upgrade refused: {status.strip()}')
+    except BaseException:
+        sock.close()
+        raise
+    ws = _WebSocket(sock.makefile('rb', buffering=0), sock.makefile('wb'),
+                    client=True, max_message=TV_WS_MAX_MESSAGE)
+    return ws, sock
+
+
+class _TvSocketSession(abc.ABC):
+    """One long-lived WebSocket session to an LG webOS or Samsung Tizen TV.
+
+    Shared by every client, so the TV sees one connection and one pairing
+    instead of one per browser tab. The session connects on first use and
+    reconnects after a drop, waiting CIRCUIT_RETRY_MIN doubling up to
+    CIRCUIT_RETRY_MAX between failed attempts, until nobody has used it for
+    TV_SESSION_IDLE_TIMEOUT. A command waits up to TV_REQUEST_TIMEOUT for
+    the connection (longer while a pairing prompt is showing) and fails at
+    once with 503 during the retry delay. Subclasses implement the
+    handshake (_open), incoming messages (_on_message) and commands.
+    """
+
+    brand = ''
+
+    def __init__(self, cfg: dict) -> None:
+        self.cfg = {k: cfg[k] for k in ('ip', 'port', 'brand')}
+        self._cond = threading.Condition()
+        self._ws: _WebSocket | None = None
+        self._sock: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+        self._pairing = False
+        self._error = ''
+        self._retry_at = 0.0
+        self._retry_delay = CIRCUIT_RETRY_MIN
+        self._last_used = time.monotonic()
+
+    def touch(self) -> None:
+        """Record demand and make sure the connection thread is running."""
+        with self._cond:
+            self._last_used = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def status(self) -> dict:
+        with self._cond:
+            state = 'connected' if self._ws else 'pairing' if self._pairing else 'disconnected'
+            return {'state': state, 'error': self._error}
+
+    def _socket(self) -> _WebSocket:
+        """Return the open socket, waiting for a connection if needed."""
+        self.touch()
+        with self._cond:
+            if self._ws is None and time.monotonic() < self._retry_at:
+                raise _TvBusy(503, f'TV connection failed: {self._error}',
+                              max(1, round(self._retry_at - time.monotonic())))
+            self._cond.wait_for(lambda: self._ws is not None or self._retry_at > time.monotonic(),
+                                TV_REQUEST_TIMEOUT)
+            if self._ws is None:
+                if self._pairing:
+                    raise _TvCommandError(504, 'Waiting for the pairing prompt to be accepted on the TV')
+                raise _TvCommandError(502, f'TV unreachable: {self._error}' if self._error
+                                      else 'TV unreachable')
+            return self._ws
+
+    def _run(self) -> None:
+        while True:
+            try:
+                ws, sock = _ws_connect(self.cfg['ip'], self.cfg['port'], self._path(),
+                                       TV_REQUEST_TIMEOUT)
+            except (OSError, _WebSocketClosed) as e:
+                self._connect_failed(e)
+            else:
+                try:
+                    sock.settimeout(TV_PAIRING_TIMEOUT)
+                    with self._cond:
+                        self._pairing = True
+                    self._open(ws)
+                except Exception as e:  # anything but a completed handshake drops the socket
+                    sock.close()
+                    self._connect_failed(e)
+                else:
+                    _metrics.inc('philips_remote_tv_session_connects_total',
+                                 {'brand': self.brand, 'result': 'ok'})
+                    with self._cond:
+                        self._ws, self._sock = ws, sock
+                        self._pairing = False
+                        self._error = ''
+                        self._retry_delay = CIRCUIT_RETRY_MIN
+                        self._cond.notify_all()
+                    self._read_loop(ws, sock)
+                    with self._cond:
+                        self._ws = self._sock = None
+                    self._closed()
+            with self._cond:
+                self._pairing = False
+                idle = time.monotonic() - self._last_used
+                if idle > TV_SESSION_IDLE_TIMEOUT:
+                    self._thread = None
+                    return
+                self._cond.wait_for(lambda: time.monotonic() >= self._retry_at,
+                                    max(0.0, self._retry_at - time.monotonic()))
+
+    def _connect_failed(self, exc: BaseException) -> None:
+        _metrics.inc('philips_remote_tv_session_connects_total',
+                     {'brand': self.brand, 'result': 'error'})
+        with self._cond:
+            self._error = str(exc) or type(exc).__name__
+            self._retry_at = time.monotonic() + self._retry_delay
+            self._retry_delay = min(self._retry_delay * 2, CIRCUIT_RETRY_MAX)
+            self._cond.notify_all()
+        _log.write(self.brand, 'Connect failed', ip=self.cfg['ip'], port=self.cfg['port'],
+                   error=self._error)
+
+    def _read_loop(self, ws: _WebSocket, sock: socket.socket) -> None:
+        """Dispatch incoming messages; ping when quiet, close when idle or dead."""
+        sock.settimeout(TV_REQUEST_TIMEOUT)  # bounds a frame that stops halfway
+        last_heard = time.monotonic()
+        try:
+            while True:
+                pending = isinstance(sock, ssl.SSLSocket) and sock.pending()
+                if not pending and not select.select([sock], [], [], SSE_KEEPALIVE)[0]:
+                    now = time.monotonic()
+                    with self._cond:
+                        idle = now - self._last_used
+                    if idle > TV_SESSION_IDLE_TIMEOUT or now - last_heard > SSE_KEEPALIVE * 2:
+                        ws.close()
+                        return
+                    ws.send_ping()
+                    continue
+                message = ws.receive(control=True)
+                last_heard = time.monotonic()
+                if message is None:
+                    continue
+                try:
+                    self._on_message(message)
+                except (ValueError, AttributeError):
+                    pass  # not a message this session understands
+        except (OSError, ValueError, _WebSocketClosed):
+            pass
+        finally:
+            sock.close()
+
+    @abc.abstractmethod
+    def _path(self) -> str:
+        """Request path of the WebSocket upgrade."""
+
+    @abc.abstractmethod
+    def _open(self, ws: _WebSocket) -> None:
+        """Handshake/pair on a fresh socket; raise to reject it."""
+
+    def _on_message(self, message: str) -> None:
+        pass
+
+    def _closed(self) -> None:
+        """The socket dropped; fail whatever was waiting on it."""
+
+    @abc.abstractmethod
+    def command(self, method: str, tv_path: str, body: dict) -> dict:
+        """Run one /api call over the session and return its JSON reply."""
+
+
+def _store_pairing_key(ip: str, key: str) -> None:
+    with _config_lock:
+        changed = _tv_pairing_keys.get(ip) != key
+        _tv_pairing_keys[ip] = key
+    if changed:
+        _state_store.save()
+
+
+class _LgSession(_TvSocketSession):
+    """SSAP session to an LG webOS TV plus its pointer-input socket for keys.
+
+    Registers with the stored client-key (the TV shows a pairing prompt
+    the first time and returns a key to keep). Commands:
+      POST input/key {"key": "UP"}          — a button on the pointer socket
+      POST input/pointer {"type": "move", "dx": 5, "dy": 0}
+                                            — touchpad move, scroll or click
+      GET  audio/volume                     — {"current", "muted", "min", "max"}
+      POST audio/volume {"current": 20}     — ssap://audio/setVolume (+ setMute)
+      GET|POST ssap/<service/method> {…}    — any SSAP request, payload as body
+    """
+
+    brand = 'lg'
+
+    def __init__(self, cfg: dict) -> None:
+        super().__init__(cfg)
+        self._pending: dict[str, _Flight] = {}
+        self._next_id = 0
+        self._pointer: tuple[_WebSocket, socket.socket] | None = None
+        self._pointer_lock = threading.Lock()
+
+    def _path(self) -> str:
+        return '/'
+
+    def _open(self, ws: _WebSocket) -> None:
+        payload = dict(LG_REGISTRATION)
+        with _config_lock:
+            client_key = _tv_pairing_keys.get(self.cfg['ip'])
+        if client_key:
+            payload['client-key'] = client_key
+        ws.send_text(json.dumps({'type': 'register', 'id': 'register_0', 'payload': payload}))
+        while True:
+            msg = json.loads(ws.receive())
+            if msg.get('id') != 'register_0':
+                continue
+            if msg.get('type') == 'registered':
+                key = (msg.get('payload') or {}).get('client-key')
+                if key:
+                    _store_pairing_key(self.cfg['ip'], str(key))
+                return
+            if msg.get('type') == 'error':
+                raise _TvCommandError(403, f"LG registration rejected: {msg.get('error', '')}")
+            # type 'response': the pairing prompt is on screen; keep waiting
+
+    def _on_message(self, message: str) -> None:
+        msg = json.loads(message)
+        with self._cond:
+            flight = self._pending.pop(str(msg.get('id')), None)
+        if flight is None:
+            return
+        if msg.get('type') == 'error':
+            flight.error = _TvCommandError(502, f"TV error: {msg.get('error', 'unknown')}")
+        else:
+            flight.data = msg.get('payload') or {}
+        flight.done.set()
+
+    def _closed(self) -> None:
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        for flight in pending.values():
+            flight.error = _TvCommandError(502, 'TV connection closed')
+            flight.done.set()
+        with self._pointer_lock:
+            if self._pointer:
+                self._pointer[1].close()
+                self._pointer = None
+
+    def request(self, uri: str, payload: dict | None = None) -> dict:
+        """Send one SSAP request and return the TV's response payload."""
+        ws = self._socket()
+        flight = _Flight()
+        with self._cond:
+            self._next_id += 1
+            req_id = str(self._next_id)
+            self._pending[req_id] = flight
+        try:
+            ws.send_text(json.dumps({'type': 'request', 'id': req_id, 'uri': uri,
+                                     'payload': payload or {}}))
+            if not flight.done.wait(TV_REQUEST_TIMEOUT):
+                raise _TvCommandError(504, 'TV did not answer')
+        except OSError:
+            raise _TvCommandError(502, 'TV connection closed')
+        finally:
+            with self._cond:
+                self._pending.pop(req_id, None)
+        if flight.error:
+            raise flight.error
+        return flight.data
+
+    def _pointer_socket(self) -> _WebSocket:
+        # Caller holds self._pointer_lock
+        if self._pointer is None:
+            socket_path = self.request(
+                'ssap://com.webos.service.networkinput/getPointerInputSocket').get('socketPath', '')
+            url = urllib.parse.urlparse(socket_path)
+            if url.hostname != self.cfg['ip'] or url.scheme not in ('ws', 'wss'):
+                raise _TvCommandError(502, 'TV returned an unexpected pointer socket URL')
+            self._pointer = _ws_connect(self.cfg['ip'], url.port or self.cfg['port'],
+                                        url.path or '/', TV_REQUEST_TIMEOUT)
+        return self._pointer[0]
+
+    def key(self, name: str) -> None:
+        self._pointer_send(f'type:button\nname:{name}\n\n')
+
+    def pointer(self, kind: str, dx: int = 0, dy: int = 0, down: int = 0) -> None:
+        if kind == 'move':
+            self._pointer_send(f'type:move\ndx:{dx}\ndy:{dy}\ndown:{down}\n\n')
+        elif kind == 'scroll':
+            self._pointer_send(f'type:scroll\ndx:{dx}\ndy:{dy}\n\n')
+        elif kind == 'click':
+            self._pointer_send('type:click\n\n')
+        else:
+            raise _TvCommandError(400, 'Pointer type must be move, scroll or click')
+
+    def _pointer_send(self, frame: str) -> None:
+        with self._pointer_lock:
+            for attempt in (1, 2):
+                try:
+                    self._pointer_socket().send_text(frame)
+                    return
+                except (OSError, _WebSocketClosed):
+                    if self._pointer:
+                        self._pointer[1].close()
+                    self._pointer = None  # reopen once: the TV drops idle pointer sockets
+                    if attempt == 2:
+                        raise _TvCommandError(502, 'Pointer input socket unavailable')
+
+    def command(self, method: str, tv_path: str, body: dict) -> dict:
+        if method == 'POST' and tv_path == '/input/key':
+            self.key(str(body.get('key', '')))
+            return {}
+        if method == 'POST' and tv_path == '/input/pointer':
+            self.pointer(str(body.get('type', '')), int(body.get('dx', 0)),
+                         int(body.get('dy', 0)), int(body.get('down', 0)))
+            return {}
+        if tv_path == '/audio/volume':
+            if method == 'GET':
+                state = self.request('ssap://audio/getVolume')
+                return {'current': state.get('volume'), 'muted': state.get('muted'),
+                        'min': 0, 'max': 100}
+            if 'current' in body:
+                self.request('ssap://audio/setVolume', {'volume': int(body['current'])})
+            if 'muted' in body:
+                self.request('ssap://audio/setMute', {'mute': bool(body['muted'])})
+            return {}
+        if tv_path.startswith('/ssap/') and len(tv_path) > len('/ssap/'):
+            return self.request('ssap://' + tv_path[len('/ssap/'):], body)
+        raise _TvCommandError(404, 'Not supported by this TV')
+
+
+class _SamsungSession(_TvSocketSession):
+    """samsung.remote.control channel to a Samsung Tizen TV.
+
+    Connects with the stored token (port 8002 needs one; the TV shows a
+    prompt the first time and sends it in ms.channel.connect). Commands:
+      POST input/key {"key": "KEY_VOLUP"}   — a remote key click
+      POST apps/launch {"appId": "…"}       — open an app (deep link)
+    The TV does not acknowledge these, so the reply comes once the frame is
+    written.
+    """
+
+    brand = 'samsung'
+
+    def _path(self) -> str:
+        name = base64.b64encode(SAMSUNG_REMOTE_NAME.encode()).decode()
+        path = f'/api/v2/channels/samsung.remote.control?name={urllib.parse.quote(name)}'
+        with _config_lock:
+            token = _tv_pairing_keys.get(self.cfg['ip'])
+        if token:
+            path += f'&token={urllib.parse.quote(token)}'
+        return path
+
+    def _open(self, ws: _WebSocket) -> None:
+        while True:
+            msg = json.loads(ws.receive())
+            if msg.get('event') == 'ms.channel.connect':
+                token = (msg.get('data') or {}).get('token')
+                if token:
+                    _store_pairing_key(self.cfg['ip'], str(token))
+                return
+            if msg.get('event') == 'ms.channel.unauthorized':
+                raise _TvCommandError(403, 'Samsung TV denied the connection')
+
+    def command(self, method: str, tv_path: str, body: dict) -> dict:
+        if method == 'POST' and tv_path == '/input/key':
+            self._send({'method': 'ms.remote.control',
+                        'params': {'Cmd': 'Click', 'DataOfCmd': str(body.get('key', '')),
+                                   'Option': 'false', 'TypeOfRemote': 'SendRemoteKey'}})
+            return {}
+        if method == 'POST' and tv_path == '/apps/launch' and body.get('appId'):
+            self._send({'method': 'ms.channel.emit',
+                        'params': {'event': 'ed.apps.launch', 'to': 'host',
+                                   'data': {'appId': str(body['appId']),
+                                            'action_type': 'DEEP_LINK'}}})
+            return {}
+        raise _TvCommandError(404, 'Not supported by this TV')
+
+    def _send(self, message: dict) -> None:
+        try:
+            self._socket().send_text(json.dumps(message))
+        except OSError:
+            raise _TvCommandError(502, 'TV connection closed')
+
+
+# One session per LG/Samsung TV endpoint: { (brand, ip, port): _TvSocketSession }
+_tv_sessions: dict[tuple[str, str, int], _TvSocketSession] = {}
+_tv_sessions_lock = threading.Lock()
+_TV_SESSION_TYPES = {'lg': _LgSession, 'samsung': _SamsungSession}
+
+
+def _get_tv_session(cfg: dict, create: bool = True) -> _TvSocketSession | None:
+    key = (cfg['brand'], cfg['ip'], cfg['port'])
+    with _tv_sessions_lock:
+        session = _tv_sessions.get(key)
+        if session is None and create:
+            session = _tv_sessions[key] = _TV_SESSION_TYPES[cfg['brand']](cfg)
+        return session
+
+
+def _tv_session_command(cfg: dict, method: str, tv_path: str, body: bytes | None) -> dict:
+    """Run an /api-style command on an LG/Samsung TV's session.
+
+    tv_path may carry a JointSpace-style version prefix (/6/input/key), so
+    /broadcast and /api/batch calls work across brands. Raises
+    _TvCommandError (or _TvBusy while the TV is unreachable).
+    """
+    tv_path = re.sub(r'^/\d+(?=/)', '', urllib.parse.urlparse(tv_path).path)
+    try:
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        raise _TvCommandError(400, 'Invalid JSON')
+    if not isinstance(payload, dict):
+        raise _TvCommandError(400, 'Body must be a JSON object')
+    try:
+        return _get_tv_session(cfg).command(method, tv_path, payload)
+    except (ValueError, TypeError):
+        raise _TvCommandError(400, 'Invalid command body')
+
+
+def _prewarm_tv(cfg: dict) -> None:
+    """Open a connection to the TV ahead of the first command."""
+    if cfg.get('brand', 'philips') == 'philips':
+        _UPSTREAM_POOL.prewarm(_tv_scheme(cfg['apiVersion']), cfg['ip'], cfg['port'])
+    else:
+        _get_tv_session(cfg).touch()
 
 
 class ProxyHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP handler that proxies TV API calls, serves static files,
     and provides TV discovery and configuration endpoints."""
 
+    # Registered TV addressed by a /tv/{id}/… request; None = default TV
+    _tv_id: str | None = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=WWW_DIR, **kwargs)
 
+    # ------------------------------------------------------------------
+    # Request timing
+    # ------------------------------------------------------------------
+
+    _request_started: float | None = None
+    _status: int | str = '-'
+
+    def parse_request(self) -> bool:
+        self._request_started = time.monotonic()
+        self._status = '-'
+        self._tv_id = None  # the connection may have addressed another TV before
+        _trace_local.marks = {}
+        _metrics.inc('philips_remote_requests_in_flight')
+        return super().parse_request()
+
+    def handle_one_request(self) -> None:
+        self._request_started = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self._request_started is not None:
+                elapsed = time.monotonic() - self._request_started
+                _metrics.inc('philips_remote_requests_in_flight', value=-1)
+                _metrics.observe('philips_remote_request_duration_seconds', elapsed,
+                                 {'route': self._route_family()})
+                self._log_access(elapsed)
+            _trace_local.marks = None
+
+    def _log_access(self, elapsed: float) -> None:
+        """Write the access record, with the request's stage timings in ms."""
+        started = self._request_started
+        marks   = getattr(_trace_local, 'marks', None) or {}
+        parts   = getattr(self, 'requestline', '').split()
+        record  = {
+            'ts':        time.time() - elapsed,
+            'component': 'access',
+            'client':    self.client_address[0] if self.client_address else '',
+            'method':    getattr(self, 'command', None) or '-',
+            'path':      parts[1] if len(parts) > 1 else '-',
+            'status':    self._status,
+            'ms':        round(elapsed * 1000, 2),
+            'trace':     {stage: round((at - started) * 1000, 2)
+                          for stage, at in sorted(marks.items(), key=lambda m: m[1])},
+        }
+        if self._tv_id:
+            record['tv'] = self._tv_id
+        _log.put(record)
+
+    def _route_family(self) -> str:
+        """Low-cardinality label for the request path."""
+        route = urllib.parse.urlparse(getattr(self, 'path', '')).path
+        if route.startswith(API_PREFIX + '/'):
+            return 'api/' + _api_family(route[len(API_PREFIX):])
+        if route.startswith('/tvs/'):
+            return '/tvs/{id}'
+        if route in ('/discover', '/discover/stream', '/config', '/probe', '/state',
+                     '/state/stream', '/tvs', '/broadcast', '/metrics', '/ws', '/wake'):
+            return route
+        return 'static'
+
     # ------------------------------------------------------------------
     # Security headers
     # ------------------------------------------------------------------
@@ -329,6 +3918,7 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
         Uses hmac.compare_digest to prevent timing attacks.
         Returns True if auth passes (or if no token is configured).
         """
+        _trace('auth')
         if not API_TOKEN:
             return True
         token = self.headers.get('X-API-Token', '')
@@ -339,7 +3929,7 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
     # ------------------------------------------------------------------
 
     def _send_json(self, data: dict, status: int = 200, cors: bool = False,
-                   no_store: bool = False) -> None:
+                   no_store: bool = False, headers: dict[str, str] | None = None) -> None:
         body = json.dumps(data).encode()
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
@@ -348,9 +3938,65 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Access-Control-Allow-Origin', '*')
         if no_store:
             self.send_header('Cache-Control', 'no-store')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(body)
 
+    def _target(self) -> tuple[dict, dict[str, str] | None]:
+        """Snapshot (config, digest credentials) of the TV this request addresses.
+
+        /tv/{id}/… requests address a registered TV, everything else the
+        default TV from /config. A TV removed mid-request yields an empty ip.
+        """
+        with _config_lock:
+            if self._tv_id is None:
+                cfg = dict(tv_config)
+            else:
+                cfg = dict(_tv_registry.get(self._tv_id) or {'ip': '', 'port': 0, 'apiVersion': 1})
+            creds = _tv_credentials.get(cfg['ip'])
+        _trace('config')
+        return cfg, creds
+
+    def _serve_static(self, head_only: bool = False) -> bool:
+        """Serve a file from the in-memory static cache.
+
+        Picks a precompressed variant per Accept-Encoding and answers
+        If-None-Match / If-Modified-Since with 304. Returns False if the
+        path is not a cached file (the caller falls back to the default
+        SimpleHTTPRequestHandler behaviour).
+        """
+        asset = _static_cache.get(urllib.parse.urlparse(self.path).path)
+        if asset is None:
+            return False
+        encoding, body, etag = asset.select(self.headers.get('Accept-Encoding', ''))
+
+        not_modified = False
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            not_modified = asset.matches(if_none_match)
+        elif self.headers.get('If-Modified-Since'):
+            try:
+                since = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since'])
+                not_modified = int(since.timestamp()) >= asset.mtime
+            except (TypeError, ValueError, IndexError, OverflowError):
+                pass
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if not not_modified:
+            self.send_header('Content-Type', asset.content_type)
+            self.send_header('Content-Length', len(body))
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if not (not_modified or head_only):
+            self.wfile.write(body)
+        return True
+
     def _read_body(self) -> bytes:
         try:
             content_length = int(self.headers.get('Content-Length', 0))
@@ -363,43 +4009,113 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
     # Routing
     # ------------------------------------------------------------------
 
+    def _strip_tv_prefix(self) -> bool:
+        """Route /tv/{id}/api/…, /tv/{id}/state…, /tv/{id}/ws and /tv/{id}/wake to a registered TV.
+
+        Rewrites self.path to the per-TV route and sets self._tv_id.
+        Returns False after sending 404 for an unknown id or route.
+        """
+        m = re.match(r'^/tv/([A-Za-z0-9_-]{1,64})(/.*)$', self.path)
+        if not m or not (m.group(2).startswith((API_PREFIX + '/', '/state'))
+                         or m.group(2) in ('/ws', '/wake')):
+            self._send_json({'error': 'Not found'}, 404)
+            return False
+        with _config_lock:
+            known = m.group(1) in _tv_registry
+        if not known:
+            self._send_json({'error': 'Unknown TV'}, 404)
+            return False
+        self._tv_id = m.group(1)
+        self.path   = m.group(2)
+        return True
+
     def do_GET(self) -> None:
         if self.path == '/':
             self.path = '/index.html'
 
         # Static files do not require authentication
-        if not self.path.startswith((API_PREFIX + '/', '/discover', '/config', '/probe')):
-            super().do_GET()
+        if not self.path.startswith((API_PREFIX + '/', '/discover', '/config', '/probe', '/state',
+                                     '/tv/', '/tvs', '/metrics', '/ws')):
+            if not self._serve_static():
+                super().do_GET()
             return
 
-        if not self._check_auth():
+        # Browsers cannot set headers on a WebSocket; /ws checks the token itself
+        is_ws = _WS_ROUTE.fullmatch(urllib.parse.urlparse(self.path).path) is not None
+        if not is_ws and not self._check_auth():
             self._send_json({'error': 'Unauthorized'}, 401)
             return
 
-        if self.path == '/discover':
+        if self.path.startswith('/tv/') and not self._strip_tv_prefix():
+            return
+
+        route = urllib.parse.urlparse(self.path).path
+        if route == '/discover':
             self._handle_discover()
+        elif route == '/discover/stream':
+            self._handle_discover_stream()
         elif self.path == '/config':
             self._handle_get_config()
         elif self.path.startswith('/probe'):
             self._handle_probe()
+        elif route == '/state':
+            self._handle_state()
+        elif route == '/state/stream':
+            self._handle_state_stream()
+        elif route == '/tvs':
+            self._handle_list_tvs()
+        elif route == '/metrics':
+            self._handle_metrics()
+        elif route == '/ws':
+            self._handle_ws()
         elif self.path.startswith(API_PREFIX + '/'):
             self._proxy_tv('GET')
+        else:
+            self.send_error(404)
+
+    def do_HEAD(self) -> None:
+        if self.path == '/':
+            self.path = '/index.html'
+        if not self._serve_static(head_only=True):
+            super().do_HEAD()
 
     def do_POST(self) -> None:
         if not self._check_auth():
             self._send_json({'error': 'Unauthorized'}, 401)
             return
 
+        if self.path.startswith('/tv/') and not self._strip_tv_prefix():
+            return
+
         if self.path == '/config':
             self._handle_set_config()
+        elif self.path == '/tvs':
+            self._handle_set_tv()
+        elif self.path == '/broadcast':
+            self._handle_broadcast()
+        elif self.path == API_PREFIX + '/batch':
+            self._handle_batch()
+        elif self.path == '/wake':
+            self._handle_wake()
         elif self.path.startswith(API_PREFIX + '/'):
             self._proxy_tv('POST')
         else:
             self.send_error(404)
 
+    def do_DELETE(self) -> None:
+        if not self._check_auth():
+            self._send_json({'error': 'Unauthorized'}, 401)
+            return
+
+        m = re.match(r'^/tvs/([A-Za-z0-9_-]{1,64})$', self.path)
+        if m:
+            self._handle_delete_tv(m.group(1))
+        else:
+            self.send_error(404)
+
     def do_OPTIONS(self) -> None:
         self.send_response(200)
-        if self.path.startswith(API_PREFIX + '/'):
+        if self.path.startswith((API_PREFIX + '/', '/tv/')):
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-API-Token')
@@ -410,25 +4126,109 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
     # ------------------------------------------------------------------
 
     def _handle_discover(self) -> None:
-        """Scan local network for Philips TVs on JointSpace port.
+        """Return discovered Philips TVs from the shared discovery cache.
 
-        Only one scan runs at a time; concurrent requests get 429.
-        Response intentionally omits subnet and local IP to avoid
-        leaking network topology to the client.
+        Query params (all optional):
+          maxAge  — oldest acceptable result in seconds; an older cache
+                    waits for a fresh scan
+          refresh — '1' forces a fresh scan and waits for it
+          cidr    — private network(s) to cover instead of the default,
+                    repeated or comma-separated (e.g. 10.20.0.0/22)
+        Without them the cached list is returned at once, and a background
+        refresh starts if it is older than DISCOVERY_TTL. Concurrent callers
+        share one scan. A first scan still running after DISCOVERY_WAIT
+        answers with the TVs confirmed so far and scanning: true. Response
+        intentionally omits subnet and local IP to avoid leaking network
+        topology to the client.
         """
-        acquired = _discover_lock.acquire(blocking=False)
-        if not acquired:
-            self._send_json({'error': 'Scan already in progress'}, 429)
+        params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        discovery = self._requested_discovery(params)
+        if discovery is None:
             return
-        try:
-            subnet, _local_ip = get_local_subnet()
-            if not subnet:
-                self._send_json({'error': 'Cannot determine local network', 'tvs': []}, 500)
+        force  = (params.get('refresh') or [''])[0] in ('1', 'true')
+        max_age = None
+        if params.get('maxAge'):
+            try:
+                max_age = float(params['maxAge'][0])
+            except ValueError:
+                self._send_json({'error': 'Invalid maxAge'}, 400)
                 return
-            tvs = scan_network(subnet)
-            self._send_json({'tvs': tvs}, no_store=True)
+
+        snap = discovery.snapshot()
+        age  = snap['age']
+        must_wait = force or age is None or (max_age is not None and age > max_age)
+        if must_wait or age > DISCOVERY_TTL:
+            done = discovery.refresh()
+            if must_wait:
+                done.wait(DISCOVERY_WAIT)
+                snap = discovery.snapshot()
+
+        if snap['age'] is None and snap['scanning']:
+            self._send_json({'tvs': snap['found'], 'devices': snap['devices'],
+                             'age': None, 'scanning': True}, no_store=True)
+            return
+        if snap['age'] is None:
+            error = snap['error'] or 'Scan did not finish in time'
+            self._send_json({'error': error, 'tvs': []}, 500)
+            return
+        self._send_json({
+            'tvs':      snap['tvs'],
+            'devices':  snap['devices'],
+            'age':      round(snap['age'], 1),
+            'scanning': snap['scanning'],
+        }, no_store=True)
+
+    def _handle_discover_stream(self) -> None:
+        """Stream discovery results as Server-Sent Events.
+
+        Joins the running scan (or starts one) and sends an `event: tv` for
+        each TV as soon as it is confirmed, then a final `event: done` with
+        scan stats (tvs, durationMs, method, responders, hostsProbed,
+        hostsOpen, optional error). Accepts the same cidr param as
+        /discover; large sweeps send keep-alive comments while they run.
+        """
+        discovery = self._requested_discovery(
+            urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query))
+        if discovery is None:
+            return
+        events = discovery.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            while True:
+                try:
+                    kind, data = events.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(b': keep-alive\n\n')
+                    continue
+                self.wfile.write(f"event: {kind}\ndata: {json.dumps(data)}\n\n".encode())
+                if kind == 'done':
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
         finally:
-            _discover_lock.release()
+            discovery.unsubscribe(events)
+
+    def _requested_discovery(self, params: dict[str, list[str]]) -> _DiscoveryRegistry | None:
+        """Registry for the request's cidr params, or send 400 and return None."""
+        try:
+            cidrs = [parse_scan_cidr(c) for value in params.get('cidr', [])
+                     for c in value.split(',') if c.strip()]
+        except ValueError as e:
+            self._send_json({'error': str(e)}, 400)
+            return None
+        hosts = sum(n.num_addresses for n in ipaddress.collapse_addresses(cidrs))
+        if hosts > DISCOVERY_MAX_HOSTS:
+            self._send_json({'error': f'cidr covers {hosts} addresses; the limit is '
+                                      f'{DISCOVERY_MAX_HOSTS}'}, 400)
+            return None
+        registry = _get_discovery(cidrs)
+        if registry is None:
+            self._send_json({'error': 'Too many network scans running'}, 503,
+                            headers={'Retry-After': str(DISCOVERY_WAIT)})
+        return registry
 
     def _handle_probe(self) -> None:
         """Probe a specific IP for a Philips TV and return its API version/port.
@@ -448,10 +4248,247 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
         else:
             self._send_json({'error': 'TV not found'}, 404)
 
+    def _configured_state_poller(self) -> _StatePoller | None:
+        """Return the poller for the addressed TV, or send 503 and return None."""
+        cfg, _creds = self._target()
+        if not cfg['ip']:
+            self._send_json({
+                'error': 'TV not configured. Use discovery or set IP manually.'
+            }, 503, cors=True)
+            return None
+        if cfg.get('brand', 'philips') != 'philips':
+            self._send_json({'error': 'Not supported for this TV brand'}, 501, cors=True)
+            return None
+        return _get_state_poller(cfg)
+
+    def _handle_state(self) -> None:
+        """Return the cached volume/mute/power state of the configured TV.
+
+        Served from the shared state poller; the first request after the
+        poller starts waits for one poll (at most TV_REQUEST_TIMEOUT).
+        """
+        poller = self._configured_state_poller()
+        if poller is None:
+            return
+        poller.touch()
+        state = poller.wait_first(TV_REQUEST_TIMEOUT)
+        if state is None:
+            self._send_json({'error': 'TV state not available yet'}, 504, cors=True)
+            return
+        self._send_json(state, cors=True, no_store=True)
+
+    def _handle_state_stream(self) -> None:
+        """Stream TV state changes as Server-Sent Events.
+
+        Sends an `event: state` with the current state, then one per change
+        ({volume, powerstate, reachable, age}). Clients following this feed
+        do not need to poll /api/{v}/audio/volume at all.
+        """
+        poller = self._configured_state_poller()
+        if poller is None:
+            return
+        events = poller.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            while True:
+                try:
+                    state = events.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    poller.touch()
+                    self.wfile.write(b': keep-alive\n\n')
+                    continue
+                self.wfile.write(f"event: state\ndata: {json.dumps(state)}\n\n".encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            poller.unsubscribe(events)
+
+    def _handle_ws(self) -> None:
+        """Control channel: key and volume commands over one WebSocket.
+
+        Authenticates once — with the X-API-Token header on the upgrade or,
+        for browsers, a first message {"token": "…"} — then takes messages
+        {"id": 1, "key": "VolumeUp"} and {"id": 2, "volume": 20, "muted": false}
+        and answers each with {"id", "s": status, "ms"} ("c": 1 if a newer
+        volume replaced it, "e" on errors). TV state changes are pushed as
+        {"state": {…}}. A session addresses the TV it opened with and is
+        closed with 1012 if /config points elsewhere. The server pings every
+        SSE_KEEPALIVE seconds and drops a client that sends nothing, not even
+        the pong, for WS_IDLE_TIMEOUT.
+        """
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        if (self.headers.get('Upgrade', '').lower() != 'websocket'
+                or self.headers.get('Sec-WebSocket-Version') != '13' or not key):
+            self._send_json({'error': 'Expected a WebSocket upgrade'}, 426,
+                            headers={'Sec-WebSocket-Version': '13'})
+            return
+        if 'X-API-Token' in self.headers and not self._check_auth():
+            self._send_json({'error': 'Unauthorized'}, 401)
+            return
+        poller = self._configured_state_poller()
+        if poller is None:
+            return
+        cfg, _creds = self._target()
+
+        # HTTP/1.1 status line: browsers reject a 101 from an HTTP/1.0 server
+        self.close_connection = True
+        self.wfile.write(('HTTP/1.1 101 Switching Protocols\r\n'
+                          'Upgrade: websocket\r\n'
+                          'Connection: Upgrade\r\n'
+                          f'Sec-WebSocket-Accept: {_ws_accept_key(key)}\r\n\r\n').encode())
+        self.log_request(101)
+        ws = _WebSocket(self.rfile, self.wfile)
+        try:
+            if 'X-API-Token' not in self.headers and API_TOKEN:
+                self.connection.settimeout(WS_AUTH_TIMEOUT)
+                try:
+                    token = json.loads(ws.receive()).get('token')
+                except (ValueError, AttributeError, OSError):
+                    token = None
+                if not isinstance(token, str) or not hmac.compare_digest(token, API_TOKEN):
+                    raise _WebSocketClosed(1008)
+            # A peer that vanished without a FIN would otherwise hold this thread forever
+            self.connection.settimeout(WS_IDLE_TIMEOUT)
+            _UPSTREAM_POOL.prewarm(_tv_scheme(cfg['apiVersion']), cfg['ip'], cfg['port'])
+            _metrics.inc('philips_remote_ws_sessions')
+            try:
+                self._ws_session(ws, cfg, poller)
+            finally:
+                _metrics.inc('philips_remote_ws_sessions', value=-1)
+        except _WebSocketClosed as e:
+            ws.close(e.code)
+        except OSError:
+            pass
+
+    def _ws_session(self, ws: _WebSocket, cfg: dict, poller: _StatePoller) -> None:
+        """Read and answer /ws commands until the client goes away."""
+        closed = threading.Event()
+        events = poller.subscribe()
+
+        def push_state() -> None:
+            # Pings go out on schedule even while state keeps changing: the
+            # client's pongs are what keeps its read timeout from expiring.
+            next_ping = time.monotonic() + SSE_KEEPALIVE
+            try:
+                while not closed.is_set():
+                    try:
+                        state = events.get(timeout=max(0.0, next_ping - time.monotonic()))
+                    except queue.Empty:
+                        state = False
+                    if state is None:
+                        return
+                    if state:
+                        ws.send_text(json.dumps({'state': state}, separators=(',', ':')))
+                    if time.monotonic() >= next_ping:
+                        poller.touch()
+                        ws.send_ping()
+                        next_ping = time.monotonic() + SSE_KEEPALIVE
+            except OSError:
+                pass
+
+        # Volume sets run on their own thread so a slider drag is coalesced:
+        # only the newest unsent value is kept, replaced ones are acked with c=1.
+        volume_cond = threading.Condition()
+        pending_volume: list = []  # [(id, body, received)] of at most one entry
+
+        def send_volumes() -> None:
+            while True:
+                with volume_cond:
+                    volume_cond.wait_for(lambda: pending_volume or closed.is_set())
+                    if not pending_volume:
+                        return
+                    msg_id, body, received = pending_volume.pop()
+                reply = self._ws_tv_call(cfg, 'POST', f"/{cfg['apiVersion']}/audio/volume",
+                                         body, poller, received, volume=True)
+                self._ws_ack(ws, msg_id, reply)
+
+        ws.send_text('{"ready":true}')
+        threading.Thread(target=push_state, daemon=True).start()
+        threading.Thread(target=send_volumes, daemon=True).start()
+        try:
+            while True:
+                text = ws.receive()
+                received = time.monotonic()
+                if self._target()[0] != cfg:
+                    raise _WebSocketClosed(1012)  # TV changed: reconnect to follow it
+                try:
+                    msg = json.loads(text)
+                except ValueError:
+                    msg = None
+                if not isinstance(msg, dict):
+                    self._ws_ack(ws, None, {'s': 400, 'e': 'Invalid JSON'})
+                    continue
+                msg_id = msg.get('id')
+                if isinstance(msg.get('key'), str):
+                    _metrics.inc('philips_remote_ws_messages_total', {'type': 'key'})
+                    body = json.dumps({'key': msg['key']}).encode()
+                    self._ws_ack(ws, msg_id, self._ws_tv_call(
+                        cfg, 'POST', f"/{cfg['apiVersion']}/input/key", body, poller, received))
+                elif isinstance(msg.get('volume'), int) and not isinstance(msg['volume'], bool):
+                    _metrics.inc('philips_remote_ws_messages_total', {'type': 'volume'})
+                    body = json.dumps({'muted': bool(msg.get('muted', False)),
+                                       'current': msg['volume']}).encode()
+                    with volume_cond:
+                        if pending_volume:
+                            replaced = pending_volume.pop()
+                            self._ws_ack(ws, replaced[0], {'s': 200, 'c': 1, 'ms': 0})
+                        pending_volume.append((msg_id, body, received))
+                        volume_cond.notify_all()
+                else:
+                    self._ws_ack(ws, msg_id, {'s': 400, 'e': 'Expected "key" or "volume"'})
+        finally:
+            closed.set()
+            with volume_cond:
+                volume_cond.notify_all()
+            poller.unsubscribe(events)
+            events.put(None)
+
+    def _ws_tv_call(self, cfg: dict, method: str, tv_path: str, body: bytes,
+                    poller: _StatePoller, received: float, volume: bool = False) -> dict:
+        """Run one /ws command against the TV and describe it for the ack."""
+        with _config_lock:
+            creds = _tv_credentials.get(cfg['ip'])
+        reply: dict = {'s': 200}
+        try:
+            if volume:
+                if _get_volume_writer(cfg).submit(
+                        lambda: _tv_call(cfg, creds, method, tv_path, body)) is None:
+                    reply['c'] = 1
+            else:
+                _tv_call(cfg, creds, method, tv_path, body)
+            poller.poke()
+        except urllib.error.HTTPError as e:
+            reply['s'] = e.code
+        except _TvBusy as e:
+            reply.update(s=e.status, e=e.reason)
+        except Exception as e:
+            _log.write('ws', 'TV request failed', ip=cfg['ip'], path=tv_path,
+                       error=f'{type(e).__name__}: {e}')
+            reply.update(s=502, e='TV unreachable')
+        reply['ms'] = round((time.monotonic() - received) * 1000, 1)
+        return reply
+
+    @staticmethod
+    def _ws_ack(ws: _WebSocket, msg_id, reply: dict) -> None:
+        try:
+            ws.send_text(json.dumps({'id': msg_id, **reply}, separators=(',', ':')))
+        except OSError:
+            pass
+
     def _handle_get_config(self) -> None:
         """Return current TV configuration."""
         with _config_lock:
             result = dict(tv_config)
+            result['mac'] = _tv_macs.get(result['ip'])
+        if result['brand'] == 'philips':
+            result['circuit'] = _circuit_status(result)
+        else:
+            session = _get_tv_session(result, create=False)
+            result['session'] = session.status() if session else {'state': 'disconnected', 'error': ''}
         self._send_json(result, no_store=True)
 
     def _handle_set_config(self) -> None:
@@ -461,90 +4498,357 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
         except json.JSONDecodeError:
             self._send_json({'error': 'Invalid JSON'}, 400)
             return
+        if not isinstance(body, dict):
+            self._send_json({'error': 'Body must be a JSON object'}, 400)
+            return
 
         with _config_lock:
-            if 'ip' in body:
-                ip = str(body['ip'])
-                if not is_valid_tv_ip(ip):
-                    self._send_json({'error': 'Invalid TV IP address'}, 400)
-                    return
-                tv_config['ip'] = ip
-
-            if 'port' in body:
-                try:
-                    port = int(body['port'])
-                except (ValueError, TypeError):
-                    self._send_json({'error': 'Invalid port'}, 400)
-                    return
-                if not (1 <= port <= 65535):
-                    self._send_json({'error': 'Port must be 1–65535'}, 400)
-                    return
-                tv_config['port'] = port
-            if 'apiVersion' in body:
-                try:
-                    api_version = int(body['apiVersion'])
-                except (ValueError, TypeError):
-                    self._send_json({'error': 'Invalid apiVersion'}, 400)
-                    return
-                if api_version not in (1, 5, 6):
-                    self._send_json({'error': 'apiVersion must be 1, 5, or 6'}, 400)
-                    return
-                tv_config['apiVersion'] = api_version
+            previous = dict(tv_config)
+            updated, error = _parse_tv_fields(body, previous)
+            if error:
+                self._send_json({'error': error}, 400)
+                return
+            tv_config.update(updated)
 
             # Optional: store digest credentials for v6 TV proxy auth.
-            tv_user = body.get('tvUser', '')
-            tv_pass = body.get('tvPass', '')
-            if tv_user and tv_pass and tv_config['ip']:
-                _tv_credentials[tv_config['ip']] = {'user': str(tv_user), 'pass': str(tv_pass)}
-                print(f"[config] Stored digest credentials for {tv_config['ip']}")
+            _store_tv_credentials(tv_config['ip'], body)
 
             result = dict(tv_config)
 
+        if 'mac' in body and result['ip']:
+            _store_tv_mac(result['ip'], _normalize_mac(body['mac']))
+        # New target: open (and TLS-handshake) a connection before the first command
+        if result['ip'] and result != previous:
+            _prewarm_tv(result)
+        if result != previous:
+            _prune_state_pollers()
+        _state_store.save()
+
+        self._send_json(result)
+
+    def _handle_wake(self) -> None:
+        """Power the TV on with Wake-on-LAN and answer once it responds.
+
+        Body (optional): {"mac": "aa:bb:cc:dd:ee:ff"} stores the MAC first.
+        Replies with the _PowerOn report: 200 when the TV is ready, 409 if
+        its MAC is not known, 504 if it did not answer within WAKE_TIMEOUT.
+        """
+        cfg, _ = self._target()
+        if not cfg['ip']:
+            self._send_json({'error': 'TV not configured. Use discovery or set IP manually.'},
+                            503, cors=True)
+            return
+        raw = self._read_body()
+        if raw:
+            try:
+                body = json.loads(raw)
+            except json.JSONDecodeError:
+                self._send_json({'error': 'Invalid JSON'}, 400, cors=True)
+                return
+            if isinstance(body, dict) and 'mac' in body:
+                mac = _normalize_mac(body['mac'])
+                if not mac:
+                    self._send_json({'error': 'Invalid MAC address'}, 400, cors=True)
+                    return
+                _store_tv_mac(cfg['ip'], mac)
+        report = _get_power_on(cfg).wake()
+        status = 200 if report['ready'] else 409 if not report['mac'] else 504
+        self._send_json(report, status, cors=True)
+
+    def _handle_metrics(self) -> None:
+        """Expose server metrics in Prometheus text format."""
+        body = _metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', len(body))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_list_tvs(self) -> None:
+        """List registered TVs with their last known state (if polled)."""
+        with _config_lock:
+            tvs = [dict(tv, mac=_tv_macs.get(tv['ip'])) for tv in _tv_registry.values()]
+        for tv in tvs:
+            if tv.get('brand', 'philips') != 'philips':
+                session = _get_tv_session(tv, create=False)
+                tv['session'] = session.status() if session else {'state': 'disconnected', 'error': ''}
+                continue
+            poller = _get_state_poller(tv, create=False)
+            tv['state'] = poller.snapshot() if poller else None
+            tv['circuit'] = _circuit_status(tv)
+        self._send_json({'tvs': tvs}, no_store=True)
+
+    def _handle_set_tv(self) -> None:
+        """Register or update a named TV.
+
+        Body: {"id": "living-room", "ip": "…", "port": 1926, "apiVersion": 6,
+               "name": "…", "tvUser": "…", "tvPass": "…", "mac": "…"} — ip is required
+        for a new id; other fields default like /config.
+        """
+        try:
+            body = json.loads(self._read_body())
+        except json.JSONDecodeError:
+            self._send_json({'error': 'Invalid JSON'}, 400)
+            return
+        if not isinstance(body, dict):
+            self._send_json({'error': 'Body must be a JSON object'}, 400)
+            return
+        tv_id = str(body.get('id', ''))
+        if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', tv_id):
+            self._send_json({'error': 'id must be 1–64 letters, digits, - or _'}, 400)
+            return
+
+        with _config_lock:
+            current = _tv_registry.get(tv_id) or {
+                'id': tv_id, 'ip': '', 'port': JOINTSPACE_PORT, 'apiVersion': 1,
+                'brand': 'philips', 'name': tv_id,
+            }
+            updated, error = _parse_tv_fields(body, current)
+            if not error and not updated['ip']:
+                error = 'Invalid TV IP address'
+            if error:
+                self._send_json({'error': error}, 400)
+                return
+            if 'name' in body:
+                updated['name'] = str(body['name'])[:64]
+            _tv_registry[tv_id] = updated
+            _store_tv_credentials(updated['ip'], body)
+            result = dict(updated)
+
+        if 'mac' in body:
+            _store_tv_mac(result['ip'], _normalize_mac(body['mac']))
+        if result != current:
+            _prewarm_tv(result)
+            _prune_state_pollers()
+        _state_store.save()
         self._send_json(result)
 
+    def _handle_delete_tv(self, tv_id: str) -> None:
+        with _config_lock:
+            removed = _tv_registry.pop(tv_id, None)
+        if removed is None:
+            self._send_json({'error': 'Unknown TV'}, 404)
+            return
+        _prune_state_pollers()
+        _state_store.save()
+        self._send_json({'deleted': tv_id})
+
+    def _handle_broadcast(self) -> None:
+        """Send one JointSpace call to many registered TVs in parallel.
+
+        Body: {"tvs": ["a", "b"], "method": "POST", "path": "input/key",
+               "body": {"key": "Standby"}}
+        path is relative to each TV's API version ("input/key" becomes
+        "/6/input/key" on a v6 TV); omitting "tvs" targets every registered
+        TV, an empty list none. Returns {"results": {id: {"status", "ms", "body"?}}, "ms": total}
+        — total time is that of the slowest TV.
+        """
+        try:
+            request = json.loads(self._read_body())
+        except json.JSONDecodeError:
+            self._send_json({'error': 'Invalid JSON'}, 400, cors=True)
+            return
+        if not isinstance(request, dict):
+            self._send_json({'error': 'Body must be a JSON object'}, 400, cors=True)
+            return
+        method = str(request.get('method', 'POST')).upper()
+        path   = request.get('path')
+        if method not in ('GET', 'POST') or not isinstance(path, str) or not path.strip('/'):
+            self._send_json({'error': 'Need method GET/POST and a path like input/key'},
+                            400, cors=True)
+            return
+        body = request.get('body')
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+        body_bytes = body.encode() if body is not None else None
+
+        ids = request.get('tvs')
+        if ids is not None and not (isinstance(ids, list) and all(isinstance(i, str) for i in ids)):
+            self._send_json({'error': 'tvs must be a list of TV ids'}, 400, cors=True)
+            return
+
+        with _config_lock:
+            if ids is None:
+                ids = list(_tv_registry)
+            unknown = [i for i in ids if i not in _tv_registry]
+            targets = {i: (dict(_tv_registry[i]), _tv_credentials.get(_tv_registry[i]['ip']))
+                       for i in ids if i in _tv_registry}
+        if unknown:
+            self._send_json({'error': 'Unknown TV', 'tvs': unknown}, 400, cors=True)
+            return
+
+        started = time.monotonic()
+        futures = {
+            tv_id: _BROADCAST_EXECUTOR.submit(
+                _timed_tv_call, cfg, creds, method,
+                f"/{cfg['apiVersion']}/{path.lstrip('/')}", body_bytes)
+            for tv_id, (cfg, creds) in targets.items()
+        }
+        results = {tv_id: fut.result() for tv_id, fut in futures.items()}
+        self._send_json({
+            'results': results,
+            'ms':      round((time.monotonic() - started) * 1000, 1),
+        }, cors=True)
+
+    def _handle_batch(self) -> None:
+        """Run an ordered list of JointSpace calls over one upstream connection.
+
+        Body: {"calls": [{"method": "POST", "path": "/6/input/key",
+                          "body": {"key": "CursorDown"}}, ...],
+               "delayMs": 150}
+        Calls run in order with delayMs between them. A run of consecutive
+        audio/volume sets is collapsed to its last value. Returns
+        {"results": [{"status", "ms", "body"?, "coalesced"?, "error"?}]};
+        execution stops at the first call the TV does not answer.
+        """
+        try:
+            request = json.loads(self._read_body())
+        except json.JSONDecodeError:
+            self._send_json({'error': 'Invalid JSON'}, 400, cors=True)
+            return
+        calls = request.get('calls') if isinstance(request, dict) else None
+        if not isinstance(calls, list) or not calls or len(calls) > BATCH_MAX_CALLS:
+            self._send_json({'error': f'calls must be a list of 1–{BATCH_MAX_CALLS} items'},
+                            400, cors=True)
+            return
+        try:
+            delay_ms = int(request.get('delayMs', 0))
+        except (ValueError, TypeError):
+            delay_ms = -1
+        if not (0 <= delay_ms <= BATCH_MAX_DELAY_MS):
+            self._send_json({'error': f'delayMs must be 0–{BATCH_MAX_DELAY_MS}'}, 400, cors=True)
+            return
+
+        parsed_calls = []
+        for call in calls:
+            method = str(call.get('method', 'POST')).upper() if isinstance(call, dict) else ''
+            path   = call.get('path') if isinstance(call, dict) else None
+            if method not in ('GET', 'POST') or not isinstance(path, str) or not path.startswith('/'):
+                self._send_json({'error': 'Each call needs method GET/POST and a path like /6/input/key'},
+                                400, cors=True)
+                return
+            body = call.get('body')
+            if body is not None and not isinstance(body, str):
+                body = json.dumps(body)
+            parsed_calls.append((method, path, body.encode() if body is not None else None))
+
+        cfg, creds = self._target()
+        if not cfg['ip']:
+            self._send_json({
+                'error': 'TV not configured. Use discovery or set IP manually.'
+            }, 503, cors=True)
+            return
+
+        def _is_volume_set(method: str, path: str) -> bool:
+            return method == 'POST' and path.endswith('/audio/volume')
+
+        results: list[dict] = []
+        sent = False
+        for i, (method, path, body) in enumerate(parsed_calls):
+            nxt = parsed_calls[i + 1] if i + 1 < len(parsed_calls) else None
+            if _is_volume_set(method, path) and nxt and _is_volume_set(nxt[0], nxt[1]):
+                results.append({'status': 200, 'ms': 0, 'coalesced': True})
+                continue
+            if sent and delay_ms:
+                time.sleep(delay_ms / 1000)
+            sent   = True
+            result = _timed_tv_call(cfg, creds, method, path, body)
+            results.append(result)
+            if result['status'] == 502:
+                break  # TV unreachable — do not wait on the remaining calls
+
+        poller = _get_state_poller(cfg, create=False)
+        if poller:
+            poller.poke()
+        self._send_json({'results': results}, cors=True)
+
     def _proxy_tv(self, method: str) -> None:
         """Proxy an HTTP/HTTPS request to the Philips TV JointSpace API.
 
         For API v6+, automatically adds HTTP Digest Auth if credentials are
         stored (via /config tvUser/tvPass fields or in _tv_credentials).
         """
-        # Snapshot config under lock for thread safety
-        with _config_lock:
-            cfg = dict(tv_config)
-            creds = _tv_credentials.get(cfg['ip'])
+        cfg, creds = self._target()
 
         if not cfg['ip']:
             self._send_json({
                 'error': 'TV not configured. Use discovery or set IP manually.'
             }, 503, cors=True)
             return
+        if cfg.get('brand', 'philips') != 'philips':
+            self._proxy_tv_session(cfg, method)
+            return
 
-        # v6+ uses HTTPS; older models use plain HTTP
-        scheme  = 'https' if cfg['apiVersion'] >= 6 else 'http'
         tv_path = self.path[len(API_PREFIX):]
-        tv_url  = f"{scheme}://{cfg['ip']}:{cfg['port']}{tv_path}"
-        ctx     = _SHARED_SSL_CTX if scheme == 'https' else None
+        is_volume = tv_path == f"/{cfg['apiVersion']}/audio/volume"
+
+        # Volume reads are answered from the shared state poller when fresh
+        if method == 'GET' and is_volume:
+            cached = _get_state_poller(cfg).read_volume(TV_REQUEST_TIMEOUT)
+            if cached:
+                data, age = cached
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', len(data))
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('X-State-Age', f'{age:.1f}')
+                self.end_headers()
+                self.wfile.write(data)
+                return
 
+        cache_state = ''
+        prefix = b''
         try:
             body = self._read_body() if method == 'POST' else None
-
-            # For v6+ with stored credentials, use Digest Auth via urllib opener.
-            if cfg['apiVersion'] >= 6 and creds:
-                data = _proxy_with_digest(tv_url, method, body, creds, ctx)
+            if method == 'POST' and is_volume:
+                data = _get_volume_writer(cfg).submit(
+                    lambda: _tv_call(cfg, creds, method, tv_path, body))
+                if data is None:
+                    # A newer volume set replaced this one before it was sent
+                    self.send_response(200)
+                    self.send_header('Content-Length', 0)
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                    self.send_header('X-Coalesced', '1')
+                    self.end_headers()
+                    return
+            elif method == 'GET' and _response_cache_ttl(tv_path):
+                try:
+                    data, cache_state = _response_cache.fetch(
+                        (cfg['ip'], cfg['port'], tv_path), _response_cache_ttl(tv_path),
+                        lambda: _read_for_cache(_tv_call(cfg, creds, method, tv_path, body, stream=True),
+                                                _response_cache.max_entry))
+                except _TooLargeToCache as e:
+                    prefix, cache_state = e.prefix, 'MISS'
+                    data = e.upstream or _tv_call(cfg, creds, method, tv_path, body, stream=True)
+            elif method == 'GET':
+                # Channel lists, app lists and icons can be large: relay them as they arrive
+                data = _tv_call(cfg, creds, method, tv_path, body, stream=True)
             else:
-                req = urllib.request.Request(tv_url, data=body, method=method)
-                req.add_header('Content-Type', 'application/json')
-                with urllib.request.urlopen(req, timeout=TV_REQUEST_TIMEOUT, context=ctx) as resp:
-                    data = resp.read()
+                data = _tv_call(cfg, creds, method, tv_path, body)
 
+            # Commands that change volume/power: let followers see it now
+            if method == 'POST' and (is_volume or tv_path.endswith('/input/key')):
+                poller = _get_state_poller(cfg, create=False)
+                if poller:
+                    poller.poke()
+
+            if isinstance(data, _UpstreamStream):
+                self._relay_upstream(data, 200, prefix, cache_state)
+                return
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Content-Length', len(data))
             self.send_header('Access-Control-Allow-Origin', '*')
+            if cache_state:
+                self.send_header('X-Cache', cache_state)
             self.end_headers()
             self.wfile.write(data)
 
         except urllib.error.HTTPError as e:
+            if isinstance(e.fp, _UpstreamStream):
+                self._relay_upstream(e.fp, e.code)
+                return
             error_body = e.read()
             self.send_response(e.code)
             self.send_header('Content-Type', 'application/json')
@@ -552,24 +4856,269 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             self.wfile.write(error_body)
+        except _TvBusy as e:
+            self._send_json({'error': e.reason}, e.status, cors=True,
+                            headers={'Retry-After': str(e.retry_after)})
         except Exception as e:
-            print(f"[proxy] TV request failed: {type(e).__name__}: {e}")
+            _log.write('proxy', 'TV request failed', ip=cfg['ip'], path=tv_path,
+                       error=f'{type(e).__name__}: {e}')
             self._send_json({'error': 'TV unreachable'}, 502, cors=True)
 
+    def _relay_upstream(self, upstream: _UpstreamStream, status: int,
+                        prefix: bytes = b'', cache_state: str = '') -> None:
+        """Copy a TV response to the client STREAM_CHUNK_SIZE bytes at a time.
+
+        At most one chunk per request is held in memory, and a client that
+        reads slowly holds back reads from the TV through the socket
+        buffers. The TV's Content-Length is passed through when it sent
+        one. Otherwise the body goes out chunked if both this handler's
+        protocol_version and the client are HTTP/1.1, and close-delimited
+        if either is HTTP/1.0. A client that accepts nothing for
+        TV_REQUEST_TIMEOUT is dropped, releasing the TV connection.
+        """
+        with upstream:
+            self.send_response(status)
+            self.send_header('Content-Type', upstream.headers.get('Content-Type', 'application/json'))
+            chunked = False
+            if upstream.length is not None:
+                self.send_header('Content-Length', upstream.length)
+            elif self.protocol_version == 'HTTP/1.1' and self.request_version == 'HTTP/1.1':
+                chunked = True
+                self.send_header('Transfer-Encoding', 'chunked')
+            else:
+                self.close_connection = True
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if cache_state:
+                self.send_header('X-Cache', cache_state)
+            self.end_headers()
+
+            self.connection.settimeout(TV_REQUEST_TIMEOUT)
+            try:
+                chunk = prefix
+                while True:
+                    if chunk:
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk) if chunked else chunk)
+                    try:
+                        chunk = upstream.read(STREAM_CHUNK_SIZE)
+                    except (OSError, http.client.HTTPException) as e:
+                        _log.write('proxy', 'TV response cut off', path=self.path,
+                                   error=f'{type(e).__name__}: {e}')
+                        self.close_connection = True  # the client sees a truncated body
+                        return
+                    if not chunk:
+                        break
+                if chunked:
+                    self.wfile.write(b'0\r\n\r\n')
+            except OSError:
+                self.close_connection = True  # client went away or stopped reading
+            finally:
+                self.connection.settimeout(self.timeout)
+
+    def _proxy_tv_session(self, cfg: dict, method: str) -> None:
+        """Send an /api/… command to an LG/Samsung TV over its shared session."""
+        body = self._read_body() if method == 'POST' else None
+        try:
+            result = _tv_session_command(cfg, method, self.path[len(API_PREFIX):], body)
+        except _TvBusy as e:
+            self._send_json({'error': e.reason}, e.status, cors=True,
+                            headers={'Retry-After': str(e.retry_after)})
+        except _TvCommandError as e:
+            self._send_json({'error': e.reason}, e.status, cors=True)
+        else:
+            self._send_json(result, cors=True)
+
+    def log_request(self, code='-', size='-') -> None:
+        """Called by send_response; the access record is written when the request ends."""
+        self._status = int(code) if isinstance(code, int) else code
+        _trace('respond')
+
     def log_message(self, format, *args):
-        print(f"[{self.log_date_time_string()}] {format % args}")
+        _log.write('http', format % args,
+                   client=self.client_address[0] if self.client_address else '')
+
+
+class ThreadingProxyServer(http.server.ThreadingHTTPServer):
+    """Thread-per-connection server (SERVER_ENGINE=threading).
+
+    socketserver listens with a backlog of 5, so a burst of new clients is
+    refused or stalled in SYN retries before a thread ever sees it.
+    """
+
+    request_queue_size = SERVER_BACKLOG
+
+
+# Request lines of routes whose handler stays until the client leaves
+_LONG_LIVED_REQUEST = re.compile(
+    rb'GET (?:/tv/[A-Za-z0-9_-]{1,64})?/(?:ws|state/stream|discover/stream)[? ]')
+
+
+class AsyncioHTTPServer:
+    """Asyncio front end for ProxyHandler (SERVER_ENGINE=asyncio).
+
+    Accepting connections and reading request headers/bodies happens on the
+    event loop, so idle, slow, or queued clients cost a few KB of buffers
+    instead of a parked OS thread. A complete request is then handed to
+    ProxyHandler on one of ASYNC_MAX_WORKERS threads over a socketpair, which
+    keeps every route, header, and auth check in a single implementation.
+    Upstream TV calls still run on the shared keep-alive pool, so at most
+    ASYNC_MAX_WORKERS of them are in flight; further requests wait on the
+    loop, and beyond ASYNC_MAX_PENDING they get an immediate 503.
+
+    /ws and the event streams hold their handler for as long as the client
+    stays, so they run on a separate pool of up to ASYNC_MAX_STREAMS threads
+    instead; open browser tabs never starve ordinary requests of workers.
+    """
+
+    def __init__(self, server_address: tuple[str, int],
+                 handler_class: type[http.server.BaseHTTPRequestHandler],
+                 max_workers: int = ASYNC_MAX_WORKERS,
+                 max_pending: int = ASYNC_MAX_PENDING,
+                 max_streams: int = ASYNC_MAX_STREAMS) -> None:
+        self.server_address      = server_address
+        self.RequestHandlerClass = handler_class
+        self._max_pending        = max_pending
+        self._pending            = 0
+        self._max_streams        = max_streams
+        self._streams            = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix='handler')
+        self._stream_executor = concurrent.futures.ThreadPoolExecutor(
+            max_streams, thread_name_prefix='stream')
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop: asyncio.Event | None = None
+
+    def serve_forever(self) -> None:
+        asyncio.run(self._serve())
+
+    def shutdown(self) -> None:
+        if self._loop is not None and self._stop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stop.set)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._stream_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        host, port = self.server_address
+        server = await asyncio.start_server(self._handle_client, host, port,
+                                            limit=MAX_BODY_SIZE, backlog=SERVER_BACKLOG)
+        async with server:
+            await self._stop.wait()
+
+    @staticmethod
+    def _raw_json_response(status: int, reason: str, data: dict,
+                           extra_headers: list[tuple[str, str]] = ()) -> bytes:
+        body  = json.dumps(data).encode()
+        lines = [f'HTTP/1.0 {status} {reason}',
+                 'Content-Type: application/json',
+                 f'Content-Length: {len(body)}',
+                 'Connection: close']
+        lines += [f'{name}: {value}' for name, value in list(extra_headers) + _SECURITY_HEADERS]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> bytes | None:
+        """Read the request line, headers and body (capped at MAX_BODY_SIZE)."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                          REQUEST_HEAD_TIMEOUT)
+            m = re.search(rb'\r\ncontent-length:\s*(\d+)', head, re.IGNORECASE)
+            length = min(int(m.group(1)), MAX_BODY_SIZE) if m else 0
+            body = await asyncio.wait_for(reader.readexactly(length),
+                                          REQUEST_HEAD_TIMEOUT) if length else b''
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ConnectionError):
+            return None
+        return head + body
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            if _LONG_LIVED_REQUEST.match(request):
+                if self._streams >= self._max_streams:
+                    await self._busy(writer)
+                    return
+                self._streams += 1
+                try:
+                    await self._bridge(request, reader, writer, self._stream_executor)
+                finally:
+                    self._streams -= 1
+                return
+            if self._pending >= self._max_pending:
+                await self._busy(writer)
+                return
+            self._pending += 1
+            try:
+                await self._bridge(request, reader, writer, self._executor)
+            finally:
+                self._pending -= 1
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _busy(self, writer: asyncio.StreamWriter) -> None:
+        writer.write(self._raw_json_response(
+            503, 'Service Unavailable', {'error': 'Server busy'}, [('Retry-After', '1')]))
+        await writer.drain()
+
+    async def _bridge(self, request: bytes, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter,
+                      executor: concurrent.futures.ThreadPoolExecutor) -> None:
+        """Run ProxyHandler for one request and relay bytes in both directions."""
+        loop_side, handler_side = socket.socketpair()
+        peer = writer.get_extra_info('peername') or ('', 0)
+        done = self._loop.run_in_executor(executor, self._run_handler,
+                                          handler_side, peer[:2])
+        up_reader, up_writer = await asyncio.open_connection(sock=loop_side)
+        up_writer.write(request)
+
+        async def _client_to_handler() -> None:
+            # Only carries data for upgraded connections; plain requests were read in full
+            while data := await reader.read(65536):
+                up_writer.write(data)
+                await up_writer.drain()
+            up_writer.write_eof()  # client went away: let a long-lived handler see EOF
+
+        upstream = asyncio.ensure_future(_client_to_handler())
+        try:
+            while data := await up_reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        finally:
+            upstream.cancel()
+            up_writer.close()
+            await asyncio.gather(done, return_exceptions=True)
+
+    def _run_handler(self, sock: socket.socket, client_address: tuple) -> None:
+        try:
+            self.RequestHandlerClass(sock, client_address, self)
+        except Exception as e:
+            _log.write('asyncio', 'Handler failed', error=f'{type(e).__name__}: {e}')
+        finally:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
 
 
 def main() -> None:
-    server = http.server.ThreadingHTTPServer(('0.0.0.0', SERVER_PORT), ProxyHandler)
+    if SERVER_ENGINE == 'asyncio':
+        server = AsyncioHTTPServer(('0.0.0.0', SERVER_PORT), ProxyHandler)
+    else:
+        server = ThreadingProxyServer(('0.0.0.0', SERVER_PORT), ProxyHandler)
 
     print("Philips TV Remote Server")
     print("========================")
+    _restore_state()
     if tv_config['ip']:
         print(f"TV: {tv_config['ip']}:{tv_config['port']} (API v{tv_config['apiVersion']})")
     else:
         print("TV: not configured (use web UI to discover)")
-    print(f"Server: http://localhost:{SERVER_PORT}")
+    print(f"Server: http://localhost:{SERVER_PORT} ({SERVER_ENGINE} engine)")
 
     if not API_TOKEN:
         print("WARNING: API_TOKEN is not set — server is running without authentication.")
@@ -578,11 +5127,19 @@ def main() -> None:
     print("Press Ctrl+C to stop")
     print()
 
+    _static_cache.preload()
+
+    if tv_config['ip'] or _tv_registry:
+        threading.Thread(target=_verify_configured_tvs, daemon=True).start()
+
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down...")
         server.shutdown()
+    finally:
+        _state_store.flush()
+        _log.flush()
 
 
 if __name__ == '__main__':
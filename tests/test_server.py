@@ -0,0 +1,204 @@
+"""Regression tests for server.py.
+
+Run from the repository root:
+  python3 -m unittest discover -s tests
+"""
+
+import concurrent.futures
+import http.client
+import http.server
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import server
+
+# Stand-in TVs live on loopback, which the SSRF guard rejects for real TVs
+_guard = server.is_valid_tv_ip
+server.is_valid_tv_ip = lambda ip: ip.startswith('127.') or _guard(ip)
+server._log.put = lambda record: None
+
+
+class CountingTVHandler(http.server.BaseHTTPRequestHandler):
+    """JointSpace v5 stand-in that counts the requests it answers per path."""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.02
+    counts: dict = {}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        with self.lock:
+            self.counts[self.path] = self.counts.get(self.path, 0) + 1
+        time.sleep(self.latency)
+        if self.path == '/5/audio/volume':
+            data = {'muted': False, 'current': 12, 'min': 0, 'max': 60}
+        elif self.path == '/5/powerstate':
+            data = {'powerstate': 'On'}
+        else:
+            data = {'name': 'Test TV'}
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _start(httpd) -> None:
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+
+def _request(port: int, method: str, path: str, body: bytes | None = None) -> tuple[int, bytes]:
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request(method, path, body)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+class ProxyTestCase(unittest.TestCase):
+    """Runs the proxy on a free loopback port for each test."""
+
+    def setUp(self) -> None:
+        self.httpd = server.ThreadingProxyServer(('127.0.0.1', 0), server.ProxyHandler)
+        self.port = self.httpd.server_address[1]
+        _start(self.httpd)
+        self.addCleanup(self.httpd.server_close)
+        self.addCleanup(self.httpd.shutdown)
+        saved = dict(server.tv_config)
+        self.addCleanup(server.tv_config.update, saved)
+
+
+class StatePollerTest(ProxyTestCase):
+
+    def test_cold_volume_reads_share_one_poll(self) -> None:
+        tv_ip = '127.0.0.71'
+        handler = type('Handler', (CountingTVHandler,), {'counts': {}})
+        tv = http.server.ThreadingHTTPServer((tv_ip, server.JOINTSPACE_PORT), handler)
+        _start(tv)
+        self.addCleanup(tv.server_close)
+        self.addCleanup(tv.shutdown)
+        server.tv_config.update(ip=tv_ip, port=server.JOINTSPACE_PORT, apiVersion=5)
+
+        with concurrent.futures.ThreadPoolExecutor(50) as pool:
+            results = list(pool.map(lambda _: _request(self.port, 'GET', '/api/5/audio/volume'),
+                                    range(200)))
+
+        self.assertEqual([status for status, _ in results], [200] * 200)
+        self.assertEqual(json.loads(results[0][1])['current'], 12)
+        self.assertEqual(handler.counts.get('/5/audio/volume'), 1)
+        poller = server._get_state_poller(server.tv_config, create=False)
+        self.assertEqual(poller.wait_first(5)['powerstate'], 'On')
+
+
+class RequestValidationTest(ProxyTestCase):
+
+    def test_non_object_bodies_get_400(self) -> None:
+        for path in ('/config', '/tvs'):
+            for body in (b'[]', b'"x"', b'1'):
+                with self.subTest(path=path, body=body):
+                    status, data = _request(self.port, 'POST', path, body)
+                    self.assertEqual(status, 400)
+                    self.assertEqual(json.loads(data)['error'], 'Body must be a JSON object')
+
+
+class RoutingTest(ProxyTestCase):
+
+    def test_unrouted_authenticated_paths_get_404(self) -> None:
+        for path in ('/tvs/x', '/wsX', '/state/foo', '/metricsX', '/discoverX'):
+            with self.subTest(path=path):
+                self.assertEqual(_request(self.port, 'GET', path)[0], 404)
+
+
+class UnsizedTVHandler(CountingTVHandler):
+    """Answers every GET with a body framed by closing the connection."""
+
+    protocol_version = 'HTTP/1.0'
+    body = b'{"items": [' + b'"x", ' * 50000 + b'"x"]}'
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+class RelayTest(ProxyTestCase):
+
+    def test_unsized_tv_response_is_close_delimited_over_http_1_0(self) -> None:
+        tv_ip = '127.0.0.72'
+        tv = http.server.ThreadingHTTPServer((tv_ip, server.JOINTSPACE_PORT), UnsizedTVHandler)
+        _start(tv)
+        self.addCleanup(tv.server_close)
+        self.addCleanup(tv.shutdown)
+        server.tv_config.update(ip=tv_ip, port=server.JOINTSPACE_PORT, apiVersion=5)
+
+        with socket.create_connection(('127.0.0.1', self.port), timeout=10) as sock:
+            sock.sendall(b'GET /api/5/recordings/list HTTP/1.1\r\nHost: test\r\n\r\n')
+            raw = b''
+            while chunk := sock.recv(65536):
+                raw += chunk
+        head, _, body = raw.partition(b'\r\n\r\n')
+        self.assertTrue(head.startswith(b'HTTP/1.0 200'), head)
+        self.assertNotIn(b'transfer-encoding', head.lower())
+        self.assertEqual(body, UnsizedTVHandler.body)
+
+
+class TvSessionTest(unittest.TestCase):
+
+    def test_session_subclass_must_implement_the_protocol(self) -> None:
+        incomplete = type('Incomplete', (server._TvSocketSession,),
+                          {'_path': lambda self: '/', '_open': lambda self, ws: None})
+        with self.assertRaises(TypeError):
+            incomplete({'ip': '192.168.1.20', 'port': 3000, 'brand': 'lg'})
+        for session in (server._LgSession, server._SamsungSession):
+            session({'ip': '192.168.1.20', 'port': 3000, 'brand': session.brand})
+
+
+class EnvironmentTest(unittest.TestCase):
+
+    def _run(self, code: str, **env: str) -> str:
+        """Import server in a fresh interpreter with env set and return code's output."""
+        code = 'import server\nserver._log.put = lambda record: None\n' + code
+        result = subprocess.run([sys.executable, '-c', code],
+                                cwd=ROOT, env=dict(os.environ, **env),
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout
+
+    def test_tv_ip_from_environment_wins_over_saved_default(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'state.json')
+            with open(path, 'w') as f:
+                json.dump({'schema': server.STATE_SCHEMA_VERSION,
+                           'config': {'ip': '192.168.1.9', 'port': 1925, 'apiVersion': 1},
+                           'tvs': [{'id': 'den', 'ip': '192.168.1.10'}]}, f)
+            os.chmod(path, 0o600)
+            out = self._run("server._restore_state()\n"
+                            "print(server.tv_config['ip'], server._tv_registry['den']['ip'])",
+                            TV_IP='192.168.1.5', STATE_FILE=path)
+        self.assertEqual(out.split()[-2:], ['192.168.1.5', '192.168.1.10'])
+
+    def test_public_tv_ip_is_ignored(self) -> None:
+        out = self._run("print(repr(server.tv_config['ip']))", TV_IP='8.8.8.8')
+        self.assertIn('is not a valid RFC-1918 address', out)
+        self.assertEqual(out.splitlines()[-1], "''")
+
+
+if __name__ == '__main__':
+    unittest.main()